@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Time running many :func:`pypuppetdbquery.aio.query_facts` calls at once
+through a :class:`pypuppetdbquery.aio.Client` with different concurrency
+limits, against a fake PuppetDB server in the same event loop that takes a
+fixed time to answer each request.
+"""
+
+import asyncio
+import json
+import time
+
+from pypuppetdbquery.aio import Client, query_facts
+
+QUERIES = 200
+DELAY = 0.02
+BODY = json.dumps([
+    {'certname': 'node{0}'.format(i), 'name': 'kernel', 'value': 'Linux'}
+    for i in range(100)]).encode()
+
+
+async def handle(reader, writer):
+    while (await reader.readline()) not in (b'\r\n', b''):
+        pass
+    await asyncio.sleep(DELAY)
+    writer.write('HTTP/1.1 200 OK\r\nContent-Length: {0}\r\n\r\n'.format(
+        len(BODY)).encode() + BODY)
+    await writer.drain()
+    writer.close()
+
+
+async def main():
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    print('{0} queries, {1:.0f} ms per request'.format(QUERIES, DELAY * 1e3))
+    print('{0:>6} {1:>10}'.format('limit', 'queries/s'))
+    for limit in (1, 4, 16, 64):
+        client = Client('127.0.0.1', port, limit=limit)
+        start = time.time()
+        await asyncio.gather(*[
+            query_facts(client, 'role=r{0}'.format(i), ['kernel'])
+            for i in range(QUERIES)])
+        print('{0:>6} {1:>10.0f}'.format(
+            limit, QUERIES / (time.time() - start)))
+
+    server.close()
+    await server.wait_closed()
+
+
+asyncio.run(main())
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measure the memory used by the :mod:`pypuppetdbquery.ast` tree of a generated
+query with 10000 terms, using :mod:`tracemalloc`, compared to the same tree
+built from plain objects with a ``__dict__`` and lists of path components (as
+the AST classes used to be). Both trees share the same strings and numbers, so
+only the nodes themselves are counted.
+"""
+
+import time
+import tracemalloc
+
+from pypuppetdbquery import ast
+from pypuppetdbquery.parser import Parser
+
+TERMS = 10000
+
+
+class DictNode(object):
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def rebuild(tree, make_node, make_path):
+    # Copy a tree bottom-up using an explicit stack, as it is very deep
+    stack = [(tree, iter(tree._values()), [])]
+    while True:
+        node, children, values = stack[-1]
+        for child in children:
+            if isinstance(child, ast.Node):
+                stack.append((child, iter(child._values()), []))
+                break
+            elif isinstance(child, tuple):
+                values.append(make_path(
+                    rebuild(x, make_node, make_path) for x in child))
+            else:
+                values.append(child)
+        else:
+            stack.pop()
+            ret = make_node(node, values)
+            if not stack:
+                return ret
+            stack[-1][2].append(ret)
+
+
+def measure(make_node, make_path):
+    tracemalloc.start()
+    start = time.time()
+    tree = rebuild(source, make_node, make_path)
+    elapsed = time.time() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tree
+    return size, elapsed
+
+
+query = ' or '.join('os.family=Debian{0} and processorcount={1}'.format(
+    i, i % 64) for i in range(TERMS // 2))
+source = Parser().parse(query)
+
+print('{0:>8} {1:>12} {2:>10} {3:>10}'.format(
+    'nodes', 'bytes', 'per term', 'seconds'))
+for name, make_node, make_path in (
+        ('dict', lambda n, v: DictNode(**dict(zip(n._fields, v))), list),
+        ('slots', lambda n, v: type(n)(*v), tuple)):
+    size, elapsed = measure(make_node, make_path)
+    print('{0:>8} {1:>12} {2:>10.1f} {3:>10.3f}'.format(
+        name, size, float(size) / TERMS, elapsed))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare the parsing throughput of the :mod:`ply.yacc`-based
+:class:`pypuppetdbquery.parser.Parser` with the hand-written
+:class:`pypuppetdbquery.pratt.PrattParser`.
+"""
+
+import timeit
+
+from pypuppetdbquery.pool import BACKENDS
+
+QUERIES = (
+    'foo=bar',
+    '(processorcount=4 or processorcount=8) and kernel=Linux',
+    '#node.catalog_environment=production and @@file[foo]{bar=baz}',
+    'not os.family~"^Red" and system_uptime.days>=30',
+    ' or '.join('certname="host{0}.example.com"'.format(i) for i in range(50)),
+)
+NUMBER = 200
+
+parsers = dict((name, factory()) for name, factory in BACKENDS.items())
+
+print('{0:>6} {1:>12} {2:>12} {3:>8}'.format(
+    'length', 'ply q/s', 'pratt q/s', 'speedup'))
+for query in QUERIES:
+    rate = {}
+    for name, parser in parsers.items():
+        elapsed = min(timeit.repeat(
+            lambda: parser.parse(query), number=NUMBER, repeat=3))
+        rate[name] = NUMBER / elapsed
+    print('{0:>6} {1:>12.0f} {2:>12.0f} {3:>7.2f}x'.format(
+        len(query), rate['ply'], rate['pratt'], rate['pratt'] / rate['ply']))
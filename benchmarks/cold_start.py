@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measure the time taken by the first call to :func:`pypuppetdbquery.parse` in
+a fresh interpreter, using the prebuilt tables from
+:mod:`pypuppetdbquery.tables` and generating the tables in memory instead.
+"""
+
+import subprocess
+import sys
+
+RUNS = 10
+
+SCRIPT = '''
+import time
+import pypuppetdbquery
+start = time.time()
+pypuppetdbquery.parse('foo=bar', lex_options={lex}, yacc_options={yacc})
+print(time.time() - start)
+'''
+
+VARIANTS = (
+    ('prebuilt tables', None, None),
+    ('generated tables', {'optimize': False},
+     {'optimize': False, 'tabmodule': 'pypuppetdbquery_no_such_tables'}),
+)
+
+
+def first_parse(lex, yacc):
+    script = SCRIPT.format(lex=lex, yacc=yacc)
+    return float(subprocess.check_output([sys.executable, '-c', script]))
+
+
+for name, lex, yacc in VARIANTS:
+    times = sorted(first_parse(lex, yacc) for _ in range(RUNS))
+    print('{0:>17}: median {1:.2f} ms'.format(name, times[RUNS // 2] * 1000))
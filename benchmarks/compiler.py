@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Time matching the nodes of a synthetic snapshot of facts against queries
+compiled into predicates with :func:`pypuppetdbquery.compile_predicate`,
+and compare with evaluating the same queries with
+:class:`pypuppetdbquery.local.LocalEvaluator`.
+"""
+
+import random
+import time
+
+from pypuppetdbquery import compile_predicate, parser_pool
+from pypuppetdbquery.local import LocalEvaluator
+
+NODES = 50000
+QUERIES = [
+    'kernel=Linux',
+    'role=web and processorcount>=8',
+    'os.family=Debian and not os.release.major="11"',
+    'role in [db, cache] or ~"db1"',
+    'networking.interfaces.~"^eth".ip~"^10[.]1[.]"',
+]
+
+
+def snapshot():
+    rand = random.Random(42)
+    facts = {}
+    for i in range(NODES):
+        facts['node{0}.example.com'.format(i)] = {
+            'kernel': rand.choice(['Linux', 'Linux', 'windows']),
+            'role': rand.choice(['web', 'db', 'cache', 'app']),
+            'processorcount': rand.choice([2, 4, 8, 16]),
+            'os': {
+                'family': rand.choice(['Debian', 'RedHat']),
+                'release': {'major': rand.choice(['10', '11', '12'])},
+            },
+            'networking': {'interfaces': {
+                'eth{0}'.format(n): {'ip': '10.{0}.{1}.{2}'.format(
+                    rand.randrange(4), n, i % 250)}
+                for n in range(rand.randrange(1, 4))}},
+        }
+    return facts
+
+
+facts = snapshot()
+evaluator = LocalEvaluator(facts)
+parser = parser_pool.get()
+evaluator._endpoint_rows('fact_contents')
+
+print('{0} nodes'.format(NODES))
+print('{0:>10} {1:>8} {2:>8}  {3}'.format(
+    'preds/s', 'ms', 'scan ms', 'query'))
+for s in QUERIES:
+    start = time.time()
+    predicate = compile_predicate(s)
+    count = sum(1 for name, node in facts.items() if predicate(node, name))
+    elapsed = time.time() - start
+
+    tree = parser.parse(s)
+    start = time.time()
+    assert len(evaluator.evaluate(tree)) == count
+    scan = time.time() - start
+
+    print('{0:>10.0f} {1:>8.0f} {2:>8.0f}  {3}'.format(
+        NODES / elapsed, elapsed * 1e3, scan * 1e3, s))
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measure the time taken by :class:`pypuppetdbquery.evaluator.Evaluator` over
+a corpus of parsed queries, compared with looking up the visitor method by
+name for every node as the evaluator used to.
+"""
+
+import timeit
+
+from pypuppetdbquery import ast
+from pypuppetdbquery.evaluator import Evaluator
+from pypuppetdbquery.pratt import PrattParser
+
+CORPUS = (
+    'foo=bar',
+    '(processorcount=4 or processorcount=8) and kernel=Linux',
+    '#node.catalog_environment=production and @@file[foo]{bar=baz}',
+    'not os.family~"^Red" and system_uptime.days>=30',
+    'class[apache] and apache::vhost[~"^www"]{port=443}',
+    'networking.interfaces.*.ip~"^10\\." and #node.facts_environment=prod',
+    ' or '.join('certname="host{0}.example.com"'.format(i) for i in range(50)),
+    ' and '.join('fact{0}.value{0}={0}'.format(i) for i in range(50)),
+)
+NUMBER = 200
+
+
+class NameDispatchEvaluator(Evaluator):
+    """
+    Evaluator that finds the visitor for each node from the names of its
+    class and base classes, as :class:`pypuppetdbquery.evaluator.Evaluator`
+    used to.
+    """
+    def _visit(self, node, path):
+        if isinstance(node, list):
+            return [self._visit(x, path) for x in node]
+
+        # Binary expressions are visited by the method named after their
+        # base class
+        for klass in type(node).__mro__:
+            underscore = self.DECAMEL_RE.sub(r'_\1', klass.__name__).lower()
+            visitor = getattr(self, '_visit_{0}'.format(underscore), None)
+            if visitor is not None:
+                return visitor(node, path)
+
+
+def count_nodes(node):
+    if isinstance(node, (list, tuple)):
+        return sum(count_nodes(x) for x in node)
+    elif isinstance(node, ast.Node):
+        return 1 + sum(count_nodes(x) for x in node._values())
+    return 0
+
+
+def evaluate_corpus(factory, trees):
+    for tree in trees:
+        factory().evaluate(tree)
+
+
+parser = PrattParser()
+trees = [parser.parse(query) for query in CORPUS]
+nodes = sum(count_nodes(tree) for tree in trees)
+
+print('{0:>10} {1:>12} {2:>12}'.format('', 'us/corpus', 'ns/node'))
+for name, factory in (('by name', NameDispatchEvaluator),
+                      ('table', Evaluator)):
+    elapsed = min(timeit.repeat(
+        lambda: evaluate_corpus(factory, trees),
+        number=NUMBER, repeat=5)) / NUMBER
+    print('{0:>10} {1:>12.1f} {2:>12.0f}'.format(
+        name, elapsed * 1e6, elapsed * 1e9 / nodes))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare the size and decoding time of fact-contents responses from PuppetDB
+with and without the ``extract`` added by
+:func:`pypuppetdbquery.query_fact_contents` when called with `extract`.
+
+The responses are made up by a stand-in for PuppetDB, which returns the
+fields requested by the ``extract`` in the query, or all of them.
+"""
+
+import json
+import time
+
+from pypuppetdbquery import query_fact_contents
+
+NODES = 4000
+FACTS = 50
+ALL_FIELDS = ('certname', 'environment', 'name', 'path', 'value')
+
+
+class FakePuppetDB(object):
+    def __init__(self):
+        self.size = 0
+        self.decode = 0
+
+    def fact_contents(self, query):
+        query = json.loads(query)
+        fields = query[1] if query[0] == 'extract' else ALL_FIELDS
+        body = json.dumps([
+            dict((k, v) for k, v in self._row(node, fact).items()
+                 if k in fields)
+            for node in range(NODES) for fact in range(FACTS)])
+
+        self.size = len(body)
+        start = time.time()
+        ret = json.loads(body)
+        self.decode = time.time() - start
+        return ret
+
+    def _row(self, node, fact):
+        return {
+            'certname': 'node{0}.example.com'.format(node),
+            'environment': 'production',
+            'name': 'fact{0}'.format(fact),
+            'path': ['fact{0}'.format(fact), 'key'],
+            'value': fact,
+        }
+
+
+pdb = FakePuppetDB()
+print('{0} rows'.format(NODES * FACTS))
+print('{0:>8} {1:>12} {2:>10}'.format('extract', 'bytes', 'decode ms'))
+for extract in (False, True):
+    out = query_fact_contents(pdb, '', ['fact1.key'], extract=extract)
+    print('{0!s:>8} {1:>12} {2:>10.1f}'.format(
+        extract, pdb.size, pdb.decode * 1e3))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Time calls to :func:`pypuppetdbquery.query_fact_contents` with a list of fact
+paths, against the previous implementation which built a new parser starting
+with ``identifier_path`` (and its LALR tables) on every call.
+"""
+
+import time
+
+from ply.yacc import NullLogger
+
+from pypuppetdbquery import fact_path_cache, query_fact_contents
+from pypuppetdbquery.evaluator import Evaluator
+from pypuppetdbquery.parser import Parser
+
+QUERY = 'kernel=Linux'
+FACTS = ['os.family', 'os.release.major', 'networking.interfaces.*.ip',
+         'memory.system.~"avail.*"', 'processors.count']
+CALLS = 200
+
+
+class FakePuppetDB(object):
+    def fact_contents(self, query):
+        return []
+
+
+def old_fact_paths(facts):
+    yacc_options = {'errorlog': NullLogger(), 'start': 'identifier_path'}
+    parser = Parser(yacc_options=yacc_options)
+    evaluator = Evaluator()
+    return ['or'] + [evaluator.evaluate(parser.parse(fact), mode='facts')
+                     for fact in facts]
+
+
+def timed(func):
+    start = time.time()
+    for _ in range(CALLS):
+        func()
+    return (time.time() - start) / CALLS * 1e3
+
+
+pdb = FakePuppetDB()
+query_fact_contents(pdb, QUERY, FACTS)
+
+print('{0:>28} {1:>10}'.format('', 'ms/call'))
+print('{0:>28} {1:>10.3f}'.format(
+    'parser built per call', timed(lambda: old_fact_paths(FACTS))))
+print('{0:>28} {1:>10.3f}'.format(
+    'query_fact_contents', timed(
+        lambda: query_fact_contents(pdb, QUERY, FACTS))))
+
+
+def uncached():
+    fact_path_cache.clear()
+    query_fact_contents(pdb, QUERY, FACTS)
+
+
+print('{0:>28} {1:>10.3f}'.format(
+    'query_fact_contents, no memo', timed(uncached)))
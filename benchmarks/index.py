@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Time evaluating queries of increasing complexity with
+:class:`pypuppetdbquery.index.IndexEvaluator` on synthetic snapshots of
+increasing numbers of nodes, against scanning the snapshot with
+:class:`pypuppetdbquery.local.LocalEvaluator` (on the smaller snapshots
+only). Times for the index are to find the bitset of matching nodes, and to
+also convert it to a set of node names.
+"""
+
+import random
+import time
+
+from pypuppetdbquery import parser_pool
+from pypuppetdbquery.index import FactIndex, IndexEvaluator
+from pypuppetdbquery.local import LocalEvaluator
+
+SIZES = (1000, 10000, 50000, 100000)
+SCAN_SIZES = (1000, 10000)
+QUERIES = [
+    ('1 term', 'kernel=Linux'),
+    ('range', 'processorcount>=8'),
+    ('3 terms', 'role=web and processorcount>=8 and not kernel=windows'),
+    ('8 terms', '(role=web or role=db) and os.family=Debian and '
+                'os.release.major in ["11", "12"] and processorcount>2 and '
+                'not uptime_days<1 and kernel~"^Lin"'),
+    ('path regexp', 'networking.interfaces.*.ip~"^10[.]1[.]"'),
+]
+
+
+def snapshot(count):
+    rand = random.Random(42)
+    facts = {}
+    for i in range(count):
+        facts['node{0}.example.com'.format(i)] = {
+            'kernel': rand.choice(['Linux', 'Linux', 'windows']),
+            'role': rand.choice(['web', 'db', 'cache', 'app']),
+            'processorcount': rand.choice([2, 4, 8, 16]),
+            'uptime_days': rand.random() * 100,
+            'os': {
+                'family': rand.choice(['Debian', 'RedHat']),
+                'release': {'major': rand.choice(['10', '11', '12'])},
+            },
+            'networking': {'interfaces': {
+                'eth{0}'.format(n): {'ip': '10.{0}.{1}.{2}'.format(
+                    rand.randrange(4), n, i % 250)}
+                for n in range(rand.randrange(1, 4))}},
+        }
+    return facts
+
+
+def best(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times) * 1e3
+
+
+parser = parser_pool.get()
+trees = [(name, parser.parse(s)) for name, s in QUERIES]
+
+print('{0:>7} {1:>12} {2:>9} {3:>9} {4:>9} {5:>8}'.format(
+    'nodes', 'query', 'scan ms', 'bits ms', 'names ms', 'matches'))
+for count in SIZES:
+    facts = snapshot(count)
+    start = time.time()
+    index = FactIndex(facts)
+    print('{0:>7} index built in {1:.2f}s'.format(
+        count, time.time() - start))
+
+    evaluator = IndexEvaluator(facts, index)
+    scan = LocalEvaluator(facts) if count in SCAN_SIZES else None
+    for name, tree in trees:
+        matches = len(evaluator.evaluate(tree))
+        if scan is not None:
+            assert scan.evaluate(tree) == evaluator.evaluate(tree)
+            scan_ms = '{0:>9.1f}'.format(
+                best(lambda: scan.evaluate(tree), 1))
+        else:
+            scan_ms = '{0:>9}'.format('-')
+        print('{0:>7} {1:>12} {2} {3:>9.3f} {4:>9.3f} {5:>8}'.format(
+            count, name, scan_ms,
+            best(lambda: evaluator.evaluate_bits(tree), 20),
+            best(lambda: evaluator.evaluate(tree), 5), matches))
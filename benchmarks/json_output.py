@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare evaluating a query into nested lists with
+:class:`pypuppetdbquery.evaluator.Evaluator` and then encoding them with
+:func:`json.dumps`, against writing the JSON directly with
+:class:`pypuppetdbquery.evaluator.JSONEvaluator`. Queries are generated with
+an increasing number of fact comparisons; the time taken and the peak memory
+allocated (measured separately using :mod:`tracemalloc`) are shown for each.
+"""
+
+import json
+import timeit
+import tracemalloc
+
+from pypuppetdbquery.evaluator import Evaluator, JSONEvaluator
+from pypuppetdbquery.parser import Parser
+
+TERMS = (10, 1000, 10000)
+
+
+def query(terms):
+    return ' or '.join('(os.family=Debian and processorcount>{0})'.format(i)
+                       for i in range(terms // 2))
+
+
+def lists(tree):
+    return json.dumps(Evaluator().evaluate(tree))
+
+
+def direct(tree):
+    return JSONEvaluator().evaluate(tree)
+
+
+def peak(func, tree):
+    tracemalloc.start()
+    func(tree)
+    ret = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return ret
+
+
+parser = Parser()
+print('{0:>6} {1:>7} {2:>14} {3:>12}'.format(
+    'terms', 'method', 'us per query', 'peak bytes'))
+for terms in TERMS:
+    tree = parser.parse(query(terms))
+    assert lists(tree) == direct(tree)
+    number = max(1, 20000 // terms)
+    for func in (lists, direct):
+        elapsed = min(timeit.repeat(
+            lambda: func(tree), number=number, repeat=7)) / number
+        print('{0:>6} {1:>7} {2:>14.1f} {3:>12}'.format(
+            terms, func.__name__, elapsed * 1e6, peak(func, tree)))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Time evaluating queries with :class:`pypuppetdbquery.local.LocalEvaluator`
+against a synthetic snapshot of the facts of many nodes. The first query on
+fact contents also builds the rows of the snapshot, which is timed
+separately.
+"""
+
+import random
+import time
+
+from pypuppetdbquery import parser_pool
+from pypuppetdbquery.local import LocalEvaluator
+
+NODES = 50000
+QUERIES = [
+    'kernel=Linux',
+    'role=web and processorcount>=8',
+    'os.family=Debian and not os.release.major="11"',
+    'role in [db, cache] or ~"db1"',
+    'networking.interfaces.~"^eth".ip~"^10[.]1[.]"',
+]
+
+
+def snapshot():
+    rand = random.Random(42)
+    facts = {}
+    for i in range(NODES):
+        facts['node{0}.example.com'.format(i)] = {
+            'kernel': rand.choice(['Linux', 'Linux', 'windows']),
+            'role': rand.choice(['web', 'db', 'cache', 'app']),
+            'processorcount': rand.choice([2, 4, 8, 16]),
+            'os': {
+                'family': rand.choice(['Debian', 'RedHat']),
+                'release': {'major': rand.choice(['10', '11', '12'])},
+            },
+            'networking': {'interfaces': {
+                'eth{0}'.format(n): {'ip': '10.{0}.{1}.{2}'.format(
+                    rand.randrange(4), n, i % 250)}
+                for n in range(rand.randrange(1, 4))}},
+        }
+    return facts
+
+
+evaluator = LocalEvaluator(snapshot())
+parser = parser_pool.get()
+
+start = time.time()
+evaluator._endpoint_rows('fact_contents')
+print('{0} nodes; rows built in {1:.2f}s'.format(NODES, time.time() - start))
+print('{0:>6} {1:>8}  {2}'.format('ms', 'matches', 'query'))
+for s in QUERIES:
+    tree = parser.parse(s)
+    start = time.time()
+    count = len(evaluator.evaluate(tree))
+    print('{0:>6.0f} {1:>8}  {2}'.format(
+        (time.time() - start) * 1e3, count, s))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Time :func:`pypuppetdbquery.parse` on generated queries of the form
+``certname=host0 or certname=host1 or ...`` with an increasing number of
+terms, to show that the cost per term stays constant. Without flattening,
+queries this long nest far deeper than Python's recursion limit.
+"""
+
+import sys
+import timeit
+
+from pypuppetdbquery import parse
+
+TERMS = (100, 1000, 10000, 100000)
+
+
+def query(terms):
+    return ' or '.join('certname=host{0}'.format(i) for i in range(terms))
+
+
+print('recursion limit: {0}'.format(sys.getrecursionlimit()))
+print('{0:>8} {1:>7} {2:>8} {3:>10} {4:>12} {5:>12}'.format(
+    'terms', 'backend', 'flatten', 'seconds', 'us per term', 'JSON bytes'))
+for terms in TERMS:
+    s = query(terms)
+    number = max(1, 1000 // terms)
+    for backend in ('ply', 'pratt'):
+        for flatten in (False, True):
+            elapsed = min(timeit.repeat(
+                lambda: parse(s, backend=backend, cache=False,
+                              flatten=flatten),
+                number=number, repeat=3)) / number
+            size = len(parse(s, backend=backend, cache=False,
+                             flatten=flatten))
+            print('{0:>8} {1:>7} {2!s:>8} {3:>10.3f} {4:>12.1f} '
+                  '{5:>12}'.format(terms, backend, flatten, elapsed,
+                                   elapsed * 1e6 / terms, size))
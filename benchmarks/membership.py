@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare queries for long lists of hosts and fact values written as chains of
+``or`` with the same queries written as lists: ``[host0, host1, ...]`` and
+``role in [role0, role1, ...]``. The time taken by
+:func:`pypuppetdbquery.parse` and the size of the JSON query sent to PuppetDB
+are shown for each.
+"""
+
+import timeit
+
+from pypuppetdbquery import parse
+
+SIZES = (100, 1000, 10000)
+
+FORMS = (
+    ('certname=', lambda names: ' or '.join(
+        'certname={0}'.format(x) for x in names)),
+    ('[hosts]', lambda names: '[{0}]'.format(', '.join(names))),
+    ('role=', lambda names: ' or '.join(
+        'role={0}'.format(x) for x in names)),
+    ('role in', lambda names: 'role in [{0}]'.format(', '.join(names))),
+)
+
+print('{0:>6} {1:>10} {2:>12} {3:>12}'.format(
+    'items', 'form', 'ms', 'JSON bytes'))
+for size in SIZES:
+    names = ['host{0}'.format(i) for i in range(size)]
+    for name, form in FORMS:
+        s = form(names)
+        elapsed = min(timeit.repeat(
+            lambda: parse(s, cache=False), number=3, repeat=3)) / 3
+        print('{0:>6} {1:>10} {2:>12.2f} {3:>12}'.format(
+            size, name, elapsed * 1e3, len(parse(s, cache=False))))
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measure the throughput of :func:`pypuppetdbquery.query_fact_contents` when
+fetching results in pages of different sizes with different numbers of
+workers, against a fake PuppetDB HTTP server running in another process.
+
+The server answers after a delay made up of a fixed cost per request and a
+cost per row returned, standing in for the work PuppetDB does to run a query.
+"""
+
+import json
+import multiprocessing
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlencode, urlparse
+    from urllib.request import urlopen
+except ImportError:
+    raise SystemExit('This benchmark requires Python 3.7 or later')
+
+from pypuppetdbquery import query_fact_contents
+
+NODES = 2000
+FACTS = 20
+REQUEST_COST = 0.02
+ROW_COST = 0.00001
+
+
+def serve(queue):
+    rows = [json.dumps({
+        'certname': 'node{0:05d}.example.com'.format(node),
+        'environment': 'production',
+        'name': 'os',
+        'path': ['os', 'key{0:02d}'.format(fact)],
+        'value': 'value {0} {1}'.format(node, fact),
+    }) for node in range(NODES) for fact in range(FACTS)]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = parse_qs(urlparse(self.path).query)
+            offset = int(params.get('offset', ['0'])[0])
+            limit = int(params.get('limit', [str(len(rows))])[0])
+            page = rows[offset:offset + limit]
+            time.sleep(REQUEST_COST + ROW_COST * len(page))
+
+            body = '[{0}]'.format(','.join(page)).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+class PuppetDB(object):
+    """
+    Minimal stand-in for :class:`pypuppetdb.api.BaseAPI`.
+    """
+    def __init__(self, port):
+        self.url = 'http://127.0.0.1:{0}/pdb/query/v4/fact-contents'.format(
+            port)
+
+    def fact_contents(self, **params):
+        url = '{0}?{1}'.format(self.url, urlencode(params))
+        with urlopen(url) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+
+def run(pdb, **kwargs):
+    start = time.time()
+    out = query_fact_contents(pdb, '', ['os.*'], **kwargs)
+    elapsed = time.time() - start
+    assert sum(len(x) for x in out.values()) == NODES * FACTS
+    return NODES * FACTS / elapsed
+
+
+if __name__ == '__main__':
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(queue,))
+    server.daemon = True
+    server.start()
+    pdb = PuppetDB(queue.get())
+
+    print('{0} rows; one request: {1:.0f} rows/s'.format(
+        NODES * FACTS, run(pdb)))
+    print('{0:>10} {1:>8} {2:>10}'.format('page size', 'workers', 'rows/s'))
+    for page_size in (1000, 4000, 16000):
+        for workers in (1, 2, 4, 8):
+            print('{0:>10} {1:>8} {2:>10.0f}'.format(
+                page_size, workers,
+                run(pdb, page_size=page_size, workers=workers)))
+    server.terminate()
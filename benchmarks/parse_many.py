@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare compiling a batch of distinct queries with a serial loop over
+:func:`pypuppetdbquery.parse` against :func:`pypuppetdbquery.parse_many` with
+different numbers of worker processes. One query in every hundred is invalid,
+as saved queries sometimes are.
+"""
+
+import os
+import time
+
+from pypuppetdbquery import parse, parse_many
+
+COUNT = 20000
+QUERIES = [
+    '(role=web{0} or role=app{0}) and kernel=Linux and '
+    'file["/etc/app{0}.conf"] and not processorcount<{1}'.format(
+        i, i % 16) if i % 100 else 'role={0} and'.format(i)
+    for i in range(COUNT)]
+
+
+def serial():
+    ret = []
+    for s in QUERIES:
+        try:
+            ret.append(parse(s, cache=False))
+        except Exception as e:
+            ret.append(e)
+    return ret
+
+
+if __name__ == '__main__':
+    print('{0} queries, {1} CPUs'.format(COUNT, os.cpu_count()))
+    print('{0:>16} {1:>10} {2:>10}'.format('', 'seconds', 'queries/s'))
+
+    start = time.time()
+    expect = serial()
+    elapsed = time.time() - start
+    print('{0:>16} {1:>10.2f} {2:>10.0f}'.format(
+        'parse() loop', elapsed, COUNT / elapsed))
+
+    for workers in (1, 2, 4, 8):
+        start = time.time()
+        out = parse_many(QUERIES, workers=workers)
+        elapsed = time.time() - start
+        assert [str(x) for x in out] == [str(x) for x in expect]
+        print('{0:>16} {1:>10.2f} {2:>10.0f}'.format(
+            'workers={0}'.format(workers), elapsed, COUNT / elapsed))
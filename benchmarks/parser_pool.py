@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare query parsing throughput when a new parser is built for every call
+against parsers obtained from :class:`pypuppetdbquery.pool.ParserPool`, on 1,
+4 and 16 threads.
+"""
+
+import threading
+import time
+
+from pypuppetdbquery.evaluator import Evaluator
+from pypuppetdbquery.parser import Parser
+from pypuppetdbquery.pool import ParserPool
+
+QUERY = '(processorcount=4 or processorcount=8) and kernel=Linux'
+CALLS = 400
+
+LEX_OPTIONS = {'debug': False, 'optimize': False}
+YACC_OPTIONS = {'debug': False, 'optimize': False, 'write_tables': False}
+
+
+def fresh_parser():
+    return Parser(lex_options=dict(LEX_OPTIONS),
+                  yacc_options=dict(YACC_OPTIONS))
+
+
+def run(get_parser, threads):
+    def worker():
+        evaluator = Evaluator()
+        for _ in range(CALLS // threads):
+            evaluator.evaluate(get_parser().parse(QUERY))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.time()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return CALLS / (time.time() - start)
+
+
+pool = ParserPool()
+pooled = lambda: pool.get(LEX_OPTIONS, YACC_OPTIONS)  # noqa: E731
+
+print('{0:>8} {1:>14} {2:>14}'.format(
+    'threads', 'fresh calls/s', 'pool calls/s'))
+for threads in (1, 4, 16):
+    print('{0:>8} {1:>14.0f} {2:>14.0f}'.format(
+        threads, run(fresh_parser, threads), run(pooled, threads)))
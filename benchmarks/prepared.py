@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare running the same query shape with different values through
+:func:`pypuppetdbquery.parse` (with the query cache disabled, as every query
+string is different) with binding the values into a query compiled once by
+:func:`pypuppetdbquery.prepare`.
+"""
+
+import timeit
+
+from pypuppetdbquery import parse, prepare
+
+NUMBER = 2000
+TEMPLATE = 'role=$role and datacenter=$dc and facts.$fact.~".*"=$value'
+VALUES = [{'role': 'web{0}'.format(i), 'dc': 'ams{0}'.format(i % 3),
+           'fact': 'os.{0}'.format(i), 'value': i} for i in range(NUMBER)]
+
+
+def literal(values):
+    return ('role="{role}" and datacenter="{dc}" and '
+            'facts."{fact}".~".*"={value}').format(**values)
+
+
+queries = [literal(x) for x in VALUES]
+for json in (True, False):
+    prepared = prepare(TEMPLATE, json=json)
+    assert prepared.bind(VALUES[0]) == parse(queries[0], json=json,
+                                             cache=False)
+
+    parsing = min(timeit.repeat(
+        lambda: [parse(q, json=json, cache=False) for q in queries],
+        number=1, repeat=3))
+    binding = min(timeit.repeat(
+        lambda: [prepared.bind(x) for x in VALUES],
+        number=1, repeat=3))
+    print('json={0!s:<5} parse: {1:8.1f} us/query  bind: {2:6.1f} us/query  '
+          '({3:.0f}x)'.format(json, parsing * 1e6 / NUMBER,
+                              binding * 1e6 / NUMBER, parsing / binding))
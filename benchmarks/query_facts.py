@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare the fact name filters built by :func:`pypuppetdbquery.query_facts`
+with those it used to build, with one term per fact name. Queries are sent to
+a stand-in for PuppetDB that evaluates them row by row over an in-memory
+table of facts, the way a database would without indexes. The size of the
+query and the time the stand-in takes to run it are shown.
+"""
+
+import json
+import re
+import time
+
+from pypuppetdbquery import query_facts
+
+NODES = 100
+FACTS = 400
+NAMES = ['fact{0}'.format(i) for i in range(0, FACTS, 2)]
+REGEXPS = ['/^os_{0}/'.format(i) for i in range(5)]
+
+
+class FakePuppetDB(object):
+    """
+    Stand-in for :class:`pypuppetdb.api.BaseAPI` that answers queries on the
+    ``facts`` endpoint.
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self.elapsed = 0
+        self.size = 0
+
+    def facts(self, query):
+        self.size = len(query)
+        start = time.time()
+        match = self._compile(json.loads(query))
+        ret = [row for row in self.rows if match(row)]
+        self.elapsed = time.time() - start
+        return ret
+
+    def _compile(self, term):
+        op = term[0]
+        if op == 'or':
+            terms = [self._compile(x) for x in term[1:]]
+            return lambda row: any(x(row) for x in terms)
+        elif op == '=':
+            return lambda row: row.name == term[2]
+        elif op == '~':
+            regexp = re.compile(term[2])
+            return lambda row: regexp.search(row.name) is not None
+        elif op == 'in':
+            values = frozenset(term[2][1])
+            return lambda row: row.name in values
+        raise ValueError(op)
+
+
+class Fact(object):
+    def __init__(self, node, name, value):
+        self.node = node
+        self.name = name
+        self.value = value
+
+
+def old_query_facts(pdb, facts):
+    factquery = ['or']
+    for fact in facts:
+        if fact[0] == fact[-1] == '/':
+            factquery.append(['~', 'name', fact[1:-1]])
+        else:
+            factquery.append(['=', 'name', fact])
+    return pdb.facts(query=json.dumps(factquery))
+
+
+rows = [Fact('node{0}'.format(n), 'fact{0}'.format(f), f)
+        for n in range(NODES) for f in range(FACTS)]
+rows.extend(Fact('node{0}'.format(n), 'os_{0}_x'.format(f), f)
+            for n in range(NODES) for f in range(10))
+pdb = FakePuppetDB(rows)
+
+print('{0} rows, {1} names, {2} regexps'.format(
+    len(rows), len(NAMES), len(REGEXPS)))
+print('{0:>8} {1:>12} {2:>10} {3:>8}'.format(
+    'filter', 'query bytes', 'server ms', 'rows'))
+for name, func in (
+        ('terms', lambda: old_query_facts(pdb, NAMES + REGEXPS)),
+        ('arrays', lambda: query_facts(pdb, '', NAMES + REGEXPS, raw=True))):
+    best = None
+    for _ in range(3):
+        count = len(func())
+        best = min(best or pdb.elapsed, pdb.elapsed)
+    print('{0:>8} {1:>12} {2:>10.1f} {3:>8}'.format(
+        name, pdb.size, best * 1e3, count))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare the output of :func:`pypuppetdbquery.parse` with and without the
+:class:`pypuppetdbquery.optimizer.Simplifier` on generated queries where a
+fraction of the terms are repeated, as happens when queries are built up from
+several overlapping selections. Subqueries are merged by the
+:class:`pypuppetdbquery.optimizer.Optimizer` in both cases. The size of the
+JSON query sent to PuppetDB and the number of subqueries in it are shown along
+with the time to compile the query.
+"""
+
+import random
+import timeit
+
+from pypuppetdbquery import _json_dumps
+from pypuppetdbquery.evaluator import Evaluator
+from pypuppetdbquery.optimizer import Optimizer, Simplifier
+from pypuppetdbquery.parser import Parser
+
+TERMS = 1000
+REPEATED = (0.0, 0.25, 0.5, 0.9)
+
+
+def query(terms, repeated):
+    rnd = random.Random(42)
+    distinct = max(1, int(terms * (1 - repeated)))
+    roles = ['role=web{0}'.format(rnd.randrange(distinct))
+             for _ in range(terms)]
+    return 'not not ({0}) and kernel=Linux and kernel=Linux'.format(
+        ' or '.join(roles))
+
+
+parser = Parser()
+
+
+def compile(s, simplify):
+    # The same steps as parse(), with the subqueries merged either way
+    tree = parser.parse(s)
+    if simplify:
+        tree = Simplifier().simplify(tree)
+    return _json_dumps(Optimizer().optimize(Evaluator().evaluate(tree)))
+
+
+print('{0:>8} {1:>9} {2:>10} {3:>12} {4:>11}'.format(
+    'repeated', 'simplify', 'seconds', 'JSON bytes', 'subqueries'))
+for repeated in REPEATED:
+    s = query(TERMS, repeated)
+    for simplify in (False, True):
+        elapsed = min(timeit.repeat(
+            lambda: compile(s, simplify), number=5, repeat=3)) / 5
+        out = compile(s, simplify)
+        print('{0:>8.0%} {1!s:>9} {2:>10.4f} {3:>12} {4:>11}'.format(
+            repeated, simplify, elapsed, len(out),
+            out.count('"select_')))
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare the peak memory used by :func:`pypuppetdbquery.query_facts` when
+building a :class:`dict` of the facts of every node against streaming them one
+node at a time with `stream`, with and without `page_size`. The facts come
+from a stand-in for :class:`pypuppetdb.api.BaseAPI` which, like pypuppetdb,
+builds the whole of each response before returning it.
+"""
+
+import time
+import tracemalloc
+
+from pypuppetdbquery import query_facts
+
+NODES = 5000
+FACTS = 50
+
+
+class Fact(object):
+    __slots__ = ('node', 'name', 'value')
+
+    def __init__(self, node, name, value):
+        self.node = node
+        self.name = name
+        self.value = value
+
+
+class FakePuppetDB(object):
+    def facts(self, query, order_by=None, limit=None, offset=0):
+        end = NODES * FACTS
+        if limit is not None:
+            end = min(end, offset + limit)
+        return iter([
+            Fact('node{0}.example.com'.format(i // FACTS),
+                 'fact{0}'.format(i % FACTS),
+                 'value {0} {1}'.format(i // FACTS, i % FACTS))
+            for i in range(offset, end)])
+
+
+def export(stream, page_size):
+    # Consume the result the way an exporter would, one node at a time
+    out = query_facts(FakePuppetDB(), '', ['/fact/'], stream=stream,
+                      page_size=page_size)
+    count = 0
+    for node, facts in (out if stream else out.items()):
+        count += len(facts)
+    return count
+
+
+print('{0} nodes x {1} facts'.format(NODES, FACTS))
+print('{0:>8} {1:>10} {2:>10} {3:>8}'.format(
+    'stream', 'page size', 'peak MB', 'seconds'))
+for stream, page_size in ((False, None), (True, None), (True, 1000)):
+    tracemalloc.start()
+    start = time.time()
+    export(stream, page_size)
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('{0!s:>8} {1!s:>10} {2:>10.2f} {3:>8.2f}'.format(
+        stream, page_size, peak / 1e6, elapsed))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Stress the lexers with 1 MB inputs made of long quoted strings, both
+well-formed and malformed, and compare them with the quoted string regex the
+lexer used to have. Also shows the effect of the `max_length` option, which
+rejects such inputs up front.
+"""
+
+import timeit
+
+from pypuppetdbquery.lexer import LexException, Lexer, Tokenizer
+
+SIZE = 1024 * 1024
+
+INPUTS = (
+    ('long string', 'certname="' + 'x' * SIZE + '"'),
+    ('unterminated', 'certname="' + 'x' * SIZE),
+    ('escapes', 'certname="' + '\\"' * (SIZE // 2) + '"'),
+    ('unterminated escapes', 'certname="' + 'ab\\"' * (SIZE // 4)),
+    ('many strings', ' or '.join(['certname="host.example.com"'] * (
+        SIZE // 30))),
+)
+
+
+class OldLexer(Lexer):
+    """
+    The lexer with the quoted string regexes it used to have, for comparison.
+    Being defined in this file, ply tries these rules first just like the
+    current ones, so only the regexes differ.
+    """
+    def t_STRING_double_quoted(self, t):
+        r'"(\\.|[^\\"])*"'
+        t.type = 'STRING'
+        t.value = t.value[1:-1]
+        return t
+
+    def t_STRING_single_quoted(self, t):
+        r"'(\\.|[^\\'])*'"
+        t.type = 'STRING'
+        t.value = t.value[1:-1]
+        return t
+
+
+def tokenize(lexer, s):
+    try:
+        lexer.input(s)
+        for _ in lexer:
+            pass
+    except LexException:
+        pass
+
+
+def bench(func):
+    return min(timeit.repeat(func, number=1, repeat=3)) * 1000
+
+
+LEXERS = (
+    ('old regexes', OldLexer(optimize=False)),
+    ('ply.lex', Lexer()),
+    ('Tokenizer', Tokenizer()),
+)
+
+print('ms per 1 MB input')
+print('{0:>20} {1:>11} {2:>11} {3:>11}'.format(
+    '', *[name for name, _ in LEXERS]))
+for name, s in INPUTS:
+    times = [bench(lambda: tokenize(lexer, s)) for _, lexer in LEXERS]
+    print('{0:>20} {1:>11.1f} {2:>11.1f} {3:>11.1f}'.format(name, *times))
+
+print('')
+print('with max_length=65536')
+for lexer_name, lexer in (('ply.lex', Lexer(max_length=65536)),
+                          ('Tokenizer', Tokenizer(max_length=65536))):
+    s = INPUTS[1][1]
+    print('{0:>20} {1:>11.3f}'.format(
+        lexer_name, bench(lambda: tokenize(lexer, s))))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare the throughput of the :mod:`ply.lex`-based
+:class:`pypuppetdbquery.lexer.Lexer` with the single-regex
+:class:`pypuppetdbquery.lexer.Tokenizer`, re-tokenizing every prefix of a
+query as a query builder would on each keystroke.
+"""
+
+import timeit
+
+from pypuppetdbquery.lexer import LexException, Lexer, Tokenizer
+
+QUERY = ('(processorcount=4 or processorcount=8) and kernel=Linux and '
+         'not os.family~"^Red" and @@file["/etc/motd"]{ensure=present} and '
+         '#node.report_timestamp<@"Sep 9, 2014" and memorysize_mb>=1024.5')
+
+
+def tokenize(lexer, s):
+    lexer.input(s)
+    try:
+        for _ in lexer:
+            pass
+    except LexException:
+        # Partially typed queries may be invalid
+        pass
+
+
+def keystrokes(lexer):
+    for end in range(1, len(QUERY) + 1):
+        tokenize(lexer, QUERY[:end])
+
+
+print('{0:>9} {1:>14} {2:>16}'.format('', 'us per query', 'us per keystroke'))
+for name, lexer in (('ply.lex', Lexer(optimize=False)),
+                    ('Tokenizer', Tokenizer())):
+    query = min(timeit.repeat(
+        lambda: tokenize(lexer, QUERY), number=1000, repeat=5)) / 1000
+    keys = min(timeit.repeat(
+        lambda: keystrokes(lexer), number=5, repeat=5)) / (5 * len(QUERY))
+    print('{0:>9} {1:>14.1f} {2:>16.1f}'.format(name, query * 1e6, keys * 1e6))
@@ -22,14 +22,124 @@ All the user-facing components of this package are intended to be found in this
 module itself rather than any of the sub-modules.
 """
 
+import os
+import re
 from collections import defaultdict
-from json import dumps as json_dumps
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import groupby
+from json import JSONEncoder, dumps as json_dumps
 from ply.yacc import NullLogger
-from .evaluator import Evaluator
-from .parser import Parser
+from .cache import MISSING, QueryCache, make_key
+from .compiler import PredicateCompiler
+from .evaluator import Evaluator, JSONEvaluator
+from .optimizer import Optimizer, Simplifier
+from .pages import fetch_pages
+from .pool import ParserPool
+from .prepared import Binding, PreparedQuery, TemplateEvaluator
+
+#: Process-wide cache of compiled queries used by :func:`parse`. Use
+#: :meth:`~pypuppetdbquery.cache.QueryCache.info` to obtain hit/miss
+#: statistics, :meth:`~pypuppetdbquery.cache.QueryCache.resize` to change its
+#: size and :meth:`~pypuppetdbquery.cache.QueryCache.clear` to empty it.
+parse_cache = QueryCache()
+
+#: Per-thread parsers shared by :func:`parse` and the query helpers.
+parser_pool = ParserPool()
+
+#: Process-wide cache of the fact path queries compiled by
+#: :func:`query_fact_contents`, which are often the same from one call to the
+#: next.
+fact_path_cache = QueryCache()
+
+#: Fields of the fact-contents endpoint used by :func:`query_fact_contents`,
+#: which are all that it asks PuppetDB for when called with `extract`.
+FACT_CONTENTS_FIELDS = ('certname', 'path', 'value')
+
+# Value of the order_by parameter used for streamed results, which are
+# grouped by node as they arrive
+_ORDER_BY_CERTNAME = json_dumps([{'field': 'certname'}])
+
+# Values of the order_by parameter used for paged results, which need a
+# unique order of the rows (and an order by node when they are streamed)
+_FACTS_PAGE_ORDER = json_dumps([{'field': 'certname'}, {'field': 'name'}])
+_FACT_CONTENTS_PAGE_ORDER = json_dumps(
+    [{'field': 'certname'}, {'field': 'path'}])
+
+# Parsers starting with identifier_path warn about the unreachable symbols of
+# the rest of the grammar. A single logger is used to silence them so that
+# the options (and hence the parser_pool key) are the same on every call.
+_NULL_LOGGER = NullLogger()
+
+# Regular expression fact names that cannot be combined into an alternation
+# with others: those with backreferences or named groups, whose numbers or
+# names would change or clash, and those with inline flags such as (?i),
+# which are only valid at the start of a pattern
+_UNMERGEABLE_RE = re.compile(
+    r'\\[1-9]|\\k<|\(\?P[<=]|\(\?<(?![=!])|\(\?[a-zA-Z-]+\)')
+
+# Markers used by _encode_deep()
+_CLOSE = object()
+_SEPARATOR = object()
+
+
+def _json_dumps(query):
+    # Queries with long chains of `and` or `or` terms can be nested too deeply
+    # for json.dumps(), which recurses into every list, so fall back to
+    # encoding those without recursion.
+    try:
+        return json_dumps(query)
+    except RuntimeError:
+        return _encode_deep(query)
+
+
+def _encode_deep(query):
+    # Produces the same output as json.dumps() for the nested lists of
+    # scalars that make up a PuppetDB AST, using an explicit stack.
+    return ''.join(_encode_chunks(query, JSONEncoder().encode))
+
+
+def _encode_template(query):
+    # Encodes a query containing bindings (see prepare()) into a list of
+    # strings of JSON, with the bindings left in place between them.
+    encode = JSONEncoder().encode
+    template = []
+    run = []
+    for chunk in _encode_chunks(
+            query, lambda x: x if isinstance(x, Binding) else encode(x)):
+        if isinstance(chunk, Binding):
+            template.append(''.join(run))
+            template.append(chunk)
+            run = []
+        else:
+            run.append(chunk)
+    template.append(''.join(run))
+    return template
+
+
+def _encode_chunks(query, encode):
+    chunks = []
+    stack = [query]
+    while stack:
+        item = stack.pop()
+        if item is _CLOSE:
+            chunks.append(']')
+        elif item is _SEPARATOR:
+            chunks.append(', ')
+        elif isinstance(item, list):
+            chunks.append('[')
+            stack.append(_CLOSE)
+            for i in range(len(item) - 1, -1, -1):
+                stack.append(item[i])
+                if i:
+                    stack.append(_SEPARATOR)
+        else:
+            chunks.append(encode(item))
+    return chunks
 
 
-def parse(s, json=True, mode='nodes', lex_options=None, yacc_options=None):
+def parse(s, json=True, mode='nodes', lex_options=None, yacc_options=None,
+          cache=True, backend='ply', flatten=True, optimize=False):
     """
     Parse a PuppetDBQuery-style query and transform it into a PuppetDB "AST"
     query.
@@ -49,21 +159,195 @@ def parse(s, json=True, mode='nodes', lex_options=None, yacc_options=None):
     :param bool json: Whether to JSON-encode the PuppetDB AST result
     :param dict lex_options: Options passed to :func:`ply.lex.lex`
     :param dict yacc_options: Options passed to :func:`ply.yacc.yacc`
+    :param bool cache: Whether to look up and store the result in
+        :data:`parse_cache`
+    :param str backend: The parser implementation to use: ``ply`` for
+        :class:`pypuppetdbquery.parser.Parser` or ``pratt`` for
+        :class:`pypuppetdbquery.pratt.PrattParser`
+    :param bool flatten: Whether to combine chains of the same boolean
+        operator into a single n-ary operator (see
+        :class:`pypuppetdbquery.evaluator.Evaluator`)
+    :param bool optimize: Whether to remove duplicate terms using
+        :class:`pypuppetdbquery.optimizer.Simplifier` and merge subqueries
+        where possible using :class:`pypuppetdbquery.optimizer.Optimizer`
+        (see also :func:`explain`). This is off by default: it changes the
+        query produced (to an equivalent one), and it adds to the time taken
+        to compile large queries, which it mostly pays back when it can merge
+        many subqueries. When this is disabled, JSON results are written out
+        directly by :class:`pypuppetdbquery.evaluator.JSONEvaluator`.
+    """
+    key = None
+    if cache:
+        key = make_key(s, json, mode, lex_options, yacc_options, backend,
+                       flatten, optimize)
+    if key is not None:
+        ret = parse_cache.get(key)
+        if ret is not MISSING:
+            return ret
+
+    if json and not optimize:
+        # Without the optimizer to run over the PuppetDB AST, the JSON can be
+        # written out directly
+        ret, _ = _compile(s, mode, lex_options, yacc_options, backend,
+                          flatten, optimize, JSONEvaluator)
+    else:
+        raw, _ = _compile(s, mode, lex_options, yacc_options, backend,
+                          flatten, optimize, Evaluator)
+        if json and raw is not None:
+            ret = _json_dumps(raw)
+        else:
+            ret = raw
+
+    if key is not None:
+        parse_cache.put(key, ret)
+    return ret
+
+
+def parse_many(queries, json=True, mode='nodes', lex_options=None,
+               yacc_options=None, backend='ply', flatten=True, optimize=False,
+               workers=None, chunksize=None):
+    """
+    Parse and transform many queries at once, using a pool of processes.
+
+    Each query is compiled as by :func:`parse`, with the same arguments. Each
+    worker process builds its parser once when it starts and keeps it (and
+    its own :data:`parse_cache`) for all of the queries it is given.
+
+    Errors are not raised: the exception raised for a query that cannot be
+    compiled (such as a :class:`pypuppetdbquery.lexer.LexException` or
+    :class:`pypuppetdbquery.parser.ParseException`) takes its place in the
+    result instead.
+
+    :param Iterable queries: The queries to parse and transform
+    :param int workers: The number of worker processes; defaults to the
+        number of CPUs. With 1, the queries are compiled in this process.
+    :param int chunksize: The number of queries sent to a worker at a time;
+        by default the queries are split into four chunks per worker
+    :return: The result of :func:`parse` or the exception raised for each
+        query, in the same order as `queries`
+    :rtype: list
+
+    The other arguments are as for :func:`parse`, and must be picklable so
+    that they can be sent to the workers.
+    """
+    queries = list(queries)
+    compile_query = partial(
+        _parse_or_error, json=json, mode=mode, lex_options=lex_options,
+        yacc_options=yacc_options, backend=backend, flatten=flatten,
+        optimize=optimize)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or not queries:
+        return [compile_query(s) for s in queries]
+
+    if chunksize is None:
+        chunksize = max(1, -(-len(queries) // (workers * 4)))
+
+    with ProcessPoolExecutor(
+            max_workers=workers, initializer=_start_worker,
+            initargs=(lex_options, yacc_options, backend)) as executor:
+        return list(executor.map(compile_query, queries,
+                                 chunksize=chunksize))
+
+
+def _start_worker(lex_options, yacc_options, backend):
+    # Build the parser of a parse_many() worker before it is given any work
+    parser_pool.get(lex_options, yacc_options, backend)
+
+
+def _parse_or_error(s, **kwargs):
+    try:
+        return parse(s, **kwargs)
+    except Exception as e:
+        return e
+
+
+def explain(s, mode='nodes', lex_options=None, yacc_options=None,
+            backend='ply', flatten=True):
+    """
+    Explain the rewrites :func:`parse` makes to optimize a query.
+
+    The arguments are the same as for :func:`parse`.
+
+    :return: The rewrites made, and those considered but found to be unsafe;
+        convert them to strings for a description of each one
+    :rtype: list of :class:`pypuppetdbquery.optimizer.Rewrite`
     """
-    parser = Parser(lex_options=lex_options, yacc_options=yacc_options)
-    evaluator = Evaluator()
+    _, rewrites = _compile(s, mode, lex_options, yacc_options, backend,
+                           flatten, True, Evaluator)
+    return rewrites
 
-    ast = parser.parse(s)
-    raw = evaluator.evaluate(ast, mode=mode)
 
+def prepare(s, json=True, mode='nodes', lex_options=None, yacc_options=None,
+            backend='ply', flatten=True, optimize=False):
+    """
+    Compile a query containing placeholders, so that it can be run many times
+    with different values without being parsed again.
+
+    Placeholders are written ``$name``, and may be used in place of any value
+    compared against (including dates, as in ``uptime<@$since``) or any
+    element of a fact path or resource title, such as
+    ``role=$role and file[$path]``. Values given for placeholders that end up
+    in a regular expression (such as alongside a ``~`` path element) are
+    escaped in the same way as the rest of the expression.
+
+    The arguments are the same as for :func:`parse`.
+
+    :return: The compiled query; call its
+        :meth:`~pypuppetdbquery.prepared.PreparedQuery.bind` method with the
+        values of the placeholders to obtain the same result as :func:`parse`
+    :rtype: pypuppetdbquery.prepared.PreparedQuery
+    :raises ValueError: If a placeholder is used as a resource parameter name
+    """
+    raw, _ = _compile(s, mode, lex_options, yacc_options, backend, flatten,
+                      optimize, TemplateEvaluator)
     if json and raw is not None:
-        return json_dumps(raw)
-    else:
-        return raw
+        return PreparedQuery(raw, _encode_template(raw))
+    return PreparedQuery(raw)
+
+
+def compile_predicate(s, lex_options=None, yacc_options=None, backend='ply'):
+    """
+    Compile a query into a function that tests whether a node matches it,
+    given the node's facts, without involving PuppetDB.
+
+    Nodes are matched as they would be by PuppetDB. Queries on node names
+    only match when the name of the node is also given to the function.
+
+    :param str s: The query to compile
+    :param dict lex_options: Options passed to :func:`ply.lex.lex`
+    :param dict yacc_options: Options passed to :func:`ply.yacc.yacc`
+    :param str backend: The parser implementation to use (see :func:`parse`)
+    :return: A function taking a :class:`dict` of the facts of a node and
+        optionally its name, and returning a :class:`bool`
+    :raises ValueError: If the query uses resources or nested subqueries
+    """
+    parser = parser_pool.get(lex_options, yacc_options, backend)
+    tree = Simplifier().simplify(parser.parse(s))
+    return PredicateCompiler().compile(tree)
+
+
+def _compile(s, mode, lex_options, yacc_options, backend, flatten, optimize,
+             evaluator_class):
+    # Returns the PuppetDB AST for a query and the list of rewrites made to
+    # optimize it
+    parser = parser_pool.get(lex_options, yacc_options, backend)
+    tree = parser.parse(s)
+    if not optimize:
+        evaluator = evaluator_class(flatten=flatten)
+        return evaluator.evaluate(tree, mode=mode), []
+
+    simplifier = Simplifier()
+    tree = simplifier.simplify(tree)
+    raw = evaluator_class(flatten=flatten).evaluate(tree, mode=mode)
+
+    optimizer = Optimizer()
+    raw = optimizer.optimize(raw)
+    return raw, simplifier.rewrites + optimizer.rewrites
 
 
 def query_facts(pdb, s, facts=None, raw=False, lex_options=None,
-                yacc_options=None):
+                yacc_options=None, stream=False, page_size=None, workers=1):
     """
     Helper to query PuppetDB for facts on nodes matching a query string.
 
@@ -79,6 +363,21 @@ def query_facts(pdb, s, facts=None, raw=False, lex_options=None,
     values. If `True` it returns raw :class:`pypuppetdb.types.Fact` objects as
     :meth:`pypuppetdb.api.BaseAPI.nodes` does.
 
+    If `stream` is `True`, the facts are requested in order of node name and
+    an iterator is returned instead of a :class:`dict`, which yields a tuple
+    of each node name and its :class:`dict` of facts in turn as the facts
+    arrive. With `raw` as well, the ordered fact objects are returned.
+    :mod:`pypuppetdb` decodes the whole of a response before returning any of
+    it, so on its own this does not reduce the memory used: use `page_size`
+    as well for that, and only a few pages are held at a time.
+
+    If `page_size` is given, the facts are fetched in pages of that many facts
+    at a time, and `workers` pages are fetched at once (see
+    :func:`pypuppetdbquery.pages.fetch_pages`). The pages are requested in
+    order of node and fact name, so that they can be merged back together in
+    order. Results returned with `raw` or `stream` fetch the pages as they
+    are consumed.
+
     .. note:: This function can return only full facts, not elements of
         structured facts. For example, only the whole ``os`` fact may be
         returned but not the ``os.family`` key within the larger structured
@@ -91,39 +390,119 @@ def query_facts(pdb, s, facts=None, raw=False, lex_options=None,
         structure
     :param dict lex_options: Options passed to :func:`ply.lex.lex`
     :param dict yacc_options: Options passed to :func:`ply.yacc.yacc`
+    :param bool stream: Whether to return the facts of each node in turn
+        instead of all of them at once
+    :param int page_size: The number of facts to fetch at a time, if any
+    :param int workers: The number of pages to fetch at once
     """
+    query = _facts_query(s, facts, lex_options, yacc_options)
+    if query is None:
+        return None
+
+    if page_size:
+        facts = fetch_pages(
+            partial(pdb.facts, query=_json_dumps(query),
+                    order_by=_FACTS_PAGE_ORDER),
+            page_size, workers)
+    elif stream:
+        facts = pdb.facts(query=_json_dumps(query),
+                          order_by=_ORDER_BY_CERTNAME)
+    else:
+        facts = pdb.facts(query=_json_dumps(query))
+
+    if raw:
+        return facts
+    if stream:
+        return _stream_facts(facts)
+
+    ret = defaultdict(dict)
+    for fact in facts:
+        ret[fact.node][fact.name] = fact.value
+    return ret
+
+
+def _facts_query(s, facts, lex_options, yacc_options):
+    # Builds the query run by query_facts(), or returns None if there is
+    # nothing to query
     query = parse(s, json=False, mode='facts', lex_options=lex_options,
                   yacc_options=yacc_options)
 
     if facts:
-        factquery = ['or']
-        for fact in facts:
-            # Regular expression fact name?
-            if fact[0] == fact[-1] == '/':
-                factquery.append(['~', 'name', fact[1:-1]])
-            else:
-                factquery.append(['=', 'name', fact])
-
+        factquery = _fact_names_query(facts)
         if query:
             query = ['and', query, factquery]
         else:
             query = factquery
 
-    if query is None:
-        return None
+    return query
 
-    facts = pdb.facts(query=json_dumps(query))
-    if raw:
-        return facts
 
-    ret = defaultdict(dict)
+def _stream_facts(facts):
+    for node, group in groupby(facts, lambda fact: fact.node):
+        yield node, dict((fact.name, fact.value) for fact in group)
+
+
+def _fact_names_query(facts):
+    # Match all the exact fact names with a single array and the regular
+    # expressions with a single alternation where it is safe to combine them,
+    # rather than one term each
+    names = []
+    regexps = []
+    separate = []
+    seen = set()
     for fact in facts:
-        ret[fact.node][fact.name] = fact.value
+        # Regular expression fact name?
+        if fact[0] == fact[-1] == '/':
+            if _UNMERGEABLE_RE.search(fact[1:-1]):
+                separate.append(fact[1:-1])
+            else:
+                regexps.append(fact[1:-1])
+        elif fact not in seen:
+            seen.add(fact)
+            names.append(fact)
+
+    factquery = ['or']
+    if len(names) == 1:
+        factquery.append(['=', 'name', names[0]])
+    elif names:
+        factquery.append(['in', 'name', ['array', names]])
+
+    if len(regexps) == 1:
+        factquery.append(['~', 'name', regexps[0]])
+    elif regexps:
+        factquery.append(['~', 'name', '|'.join(
+            '(?:{0})'.format(x) for x in regexps)])
+
+    factquery.extend(['~', 'name', x] for x in separate)
+
+    return factquery
+
+
+def _fact_path_query(fact, lex_options, yacc_options):
+    # Compiles a fact path given to query_fact_contents(), reusing earlier
+    # results from fact_path_cache where possible
+    key = make_key('fact_path', fact, lex_options, yacc_options)
+    if key is not None:
+        ret = fact_path_cache.get(key)
+        if ret is not MISSING:
+            return ret
+
+    # Fact paths are parsed starting with identifier_path rather than query
+    yacc_opt_id = dict(yacc_options) if yacc_options else {}
+    yacc_opt_id['errorlog'] = _NULL_LOGGER
+    yacc_opt_id['start'] = 'identifier_path'
+
+    parser = parser_pool.get(lex_options, yacc_opt_id)
+    ret = Evaluator().evaluate(parser.parse(fact), mode='facts')
+
+    if key is not None:
+        fact_path_cache.put(key, ret)
     return ret
 
 
 def query_fact_contents(pdb, s, facts=None, raw=False, lex_options=None,
-                        yacc_options=None):
+                        yacc_options=None, extract=False, stream=False,
+                        page_size=None, workers=1):
     """
     Helper to query PuppetDB for fact contents (i.e. within structured facts)
     on nodes matching a query string.
@@ -142,11 +521,27 @@ def query_fact_contents(pdb, s, facts=None, raw=False, lex_options=None,
     dictionaries (see the `PuppetDB fact-contents documentation
     <https://docs.puppet.com/puppetdb/4.1/api/query/v4/fact-contents.html#response-format>`__).
 
+    If `stream` is `True`, the results are requested in order of node name
+    and an iterator of tuples of each node name and its :class:`dict` of fact
+    paths is returned instead, as for :func:`query_facts` (which see about
+    memory use).
+
+    If `page_size` is given, the results are fetched in pages, `workers` at a
+    time, as for :func:`query_facts` (but in order of node name and path).
+
     .. note:: This function can only be used to search deeply within structured
         facts. It cannot return a whole structured fact, only individual
         elements within—but you can return all the elements within a structured
         fact if you want by using a regex match.
 
+    The compiled fact paths are kept in :data:`fact_path_cache`, so calls
+    with the same fact paths do not need to parse them again.
+
+    If `extract` is `True`, the query is wrapped in an ``extract`` of the
+    fields listed in :data:`FACT_CONTENTS_FIELDS`, so that PuppetDB only
+    returns the fields needed to build the result. The dictionaries returned
+    when `raw` is also `True` will only contain those fields.
+
     :param pypuppetdb.api.BaseAPI pdb: pypuppetdb connection to query from
     :param str s: The query string (may be empty to query all nodes)
     :param Sequence facts: List of fact paths to search for
@@ -154,41 +549,68 @@ def query_fact_contents(pdb, s, facts=None, raw=False, lex_options=None,
         structure grouped by node
     :param dict lex_options: Options passed to :func:`ply.lex.lex`
     :param dict yacc_options: Options passed to :func:`ply.yacc.yacc`
+    :param bool extract: Whether to have PuppetDB return only the fields
+        used by this function
+    :param bool stream: Whether to return the fact paths of each node in
+        turn instead of all of them at once
+    :param int page_size: The number of results to fetch at a time, if any
+    :param int workers: The number of pages to fetch at once
     """
+    query = _fact_contents_query(s, facts, lex_options, yacc_options,
+                                 extract)
+    if query is None:
+        return None
+
+    if page_size:
+        facts = fetch_pages(
+            partial(pdb.fact_contents, query=_json_dumps(query),
+                    order_by=_FACT_CONTENTS_PAGE_ORDER),
+            page_size, workers)
+    elif stream:
+        facts = pdb.fact_contents(query=_json_dumps(query),
+                                  order_by=_ORDER_BY_CERTNAME)
+    else:
+        facts = pdb.fact_contents(query=_json_dumps(query))
+
+    if raw:
+        return facts
+    if stream:
+        return _stream_fact_contents(facts)
+    return _group_fact_contents(facts)
+
+
+def _fact_contents_query(s, facts, lex_options, yacc_options, extract):
+    # Builds the query run by query_fact_contents(), or returns None if there
+    # is nothing to query
     query = parse(s, json=False, mode='facts', lex_options=lex_options,
                   yacc_options=yacc_options)
 
     if facts:
-        # We need custom optiosn to start with identifier_path, but that then
-        # causes warnings to be issued for unreachable symbols so we silence
-        # those with the NullLogger.
-        yacc_opt_id = dict(yacc_options) if yacc_options else {}
-        yacc_opt_id['errorlog'] = NullLogger()
-        yacc_opt_id['start'] = 'identifier_path'
-
-        parser = Parser(lex_options=lex_options, yacc_options=yacc_opt_id)
-        evaluator = Evaluator()
-
         factquery = ['or']
         for fact in facts:
-            ast = parser.parse(fact)
-            factquery.append(evaluator.evaluate(ast, mode='facts'))
+            factquery.append(
+                _fact_path_query(fact, lex_options, yacc_options))
 
         if query:
             query = ['and', query, factquery]
         else:
             query = factquery
 
-    if query is None:
-        return None
+    if query is not None and extract:
+        query = ['extract', list(FACT_CONTENTS_FIELDS), query]
+    return query
 
-    facts = pdb.fact_contents(query=json_dumps(query))
-    if raw:
-        return facts
 
+def _group_fact_contents(facts):
     ret = defaultdict(dict)
     for fact in facts:
         node = fact['certname']
         name = '.'.join(fact['path'])
         ret[node][name] = fact['value']
     return ret
+
+
+def _stream_fact_contents(facts):
+    for node, group in groupby(facts, lambda fact: fact['certname']):
+        yield node, dict(
+            ('.'.join(fact['path']), fact['value']) for fact in group)
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Counterparts of the query helpers in :mod:`pypuppetdbquery` for use with
+:mod:`asyncio`.
+
+Rather than a :class:`pypuppetdb.api.BaseAPI`, these take an asynchronous
+transport: any object with a coroutine method ``query(endpoint, **params)``
+that runs a query against a PuppetDB endpoint (such as ``facts``) with the
+given parameters and returns the decoded rows of the result. :class:`Client`
+is a minimal transport built on :mod:`asyncio` streams.
+
+Many queries can be run at once with :func:`asyncio.gather`, while the
+transport limits how many requests are made to PuppetDB at a time::
+
+    client = Client('puppetdb.example.com', 8080, limit=4)
+    results = await asyncio.gather(*[
+        query_facts(client, 'role={0}'.format(role), ['ipaddress'])
+        for role in roles])
+"""
+
+import asyncio
+import json
+from collections import defaultdict, deque
+from urllib.parse import urlencode
+
+from . import (
+    _FACT_CONTENTS_PAGE_ORDER, _FACTS_PAGE_ORDER, _fact_contents_query,
+    _facts_query, _group_fact_contents, _json_dumps)
+from .lexer import _DetailedException
+from .pages import check_paging
+
+
+class HTTPException(_DetailedException):
+    """
+    Raised by :class:`Client` when PuppetDB answers a request with an error.
+
+    The HTTP status code of the response is stored in the `status` attribute
+    (`None` if the response could not be understood).
+    """
+    _detail = 'status'
+
+    def __init__(self, message, status):
+        super(HTTPException, self).__init__(message)
+        self.status = status
+
+
+class Client(object):
+    """
+    Minimal asynchronous HTTP client for the PuppetDB query API, built on
+    :func:`asyncio.open_connection`.
+
+    A new connection is made for every request. At most `limit` requests are
+    made at a time, across all the queries using the client; further
+    requests wait for one of them to finish.
+
+    :param str host: The PuppetDB host name
+    :param int port: The PuppetDB port
+    :param ssl.SSLContext ssl: Context to connect using TLS with, if any
+    :param int limit: The maximum number of requests in progress at once
+    :param float timeout: Number of seconds after which a request is
+        abandoned, if any
+    :param str prefix: Path of the PuppetDB query API
+    """
+    def __init__(self, host='localhost', port=8080, ssl=None, limit=10,
+                 timeout=None, prefix='/pdb/query/v4'):
+        super(Client, self).__init__()
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self.timeout = timeout
+        self.prefix = prefix
+        self.limit = limit
+        self._semaphore = None
+        self._loop = None
+
+    async def query(self, endpoint, **params):
+        """
+        Run a query against a PuppetDB endpoint.
+
+        :param str endpoint: The endpoint to query, such as ``facts``
+        :param params: Parameters of the query, such as `query`, `order_by`,
+            `limit` and `offset`; any that are `None` are left out
+        :return: The decoded rows of the result
+        :rtype: list
+        :raises HTTPException: If PuppetDB returns an error
+        """
+        params = dict((k, v) for k, v in params.items() if v is not None)
+        path = '{0}/{1}'.format(self.prefix, endpoint)
+        if params:
+            path = '{0}?{1}'.format(path, urlencode(sorted(params.items())))
+
+        async with self._get_semaphore():
+            status, body = await asyncio.wait_for(
+                self._request(path), self.timeout)
+
+        if status != 200:
+            raise HTTPException(
+                'PuppetDB returned HTTP {0}: {1}'.format(
+                    status, body.decode('utf-8', 'replace')),
+                status)
+        return json.loads(body.decode('utf-8'))
+
+    def _get_semaphore(self):
+        # Before Python 3.10, a semaphore is bound to the event loop current
+        # when it is made, so make it in the loop the queries run in.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.limit)
+            self._loop = loop
+        return self._semaphore
+
+    async def _request(self, path):
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, ssl=self.ssl)
+        try:
+            writer.write((
+                'GET {0} HTTP/1.1\r\n'
+                'Host: {1}:{2}\r\n'
+                'Accept: application/json\r\n'
+                'Connection: close\r\n'
+                '\r\n').format(path, self.host, self.port).encode('ascii'))
+            await writer.drain()
+
+            status = (await reader.readline()).split()
+            if len(status) < 2 or not status[1].isdigit():
+                raise HTTPException('Invalid response from PuppetDB', None)
+            status = int(status[1])
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            return status, await self._read_body(reader, headers)
+        finally:
+            writer.close()
+
+    async def _read_body(self, reader, headers):
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if not size:
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            return b''.join(chunks)
+        elif 'content-length' in headers:
+            return await reader.readexactly(int(headers['content-length']))
+        return await reader.read()
+
+
+async def query_facts(transport, s, facts=None, raw=False, lex_options=None,
+                      yacc_options=None, page_size=None, workers=1):
+    """
+    Asynchronous counterpart of :func:`pypuppetdbquery.query_facts`.
+
+    If `raw` is `True`, the rows returned by the ``facts`` endpoint are
+    returned as they are (dictionaries, rather than
+    :class:`pypuppetdb.types.Fact` objects).
+
+    :param transport: The transport to query PuppetDB with, such as a
+        :class:`Client`
+    :param str s: The query string (may be empty to query all nodes)
+    :param Sequence facts: List of fact names to search for
+    :param bool raw: Whether to skip post-processing the facts into a dict
+        structure
+    :param dict lex_options: Options passed to :func:`ply.lex.lex`
+    :param dict yacc_options: Options passed to :func:`ply.yacc.yacc`
+    :param int page_size: The number of facts to fetch at a time, if any
+    :param int workers: The number of pages to fetch at once
+    """
+    query = _facts_query(s, facts, lex_options, yacc_options)
+    if query is None:
+        return None
+
+    facts = await _fetch(transport, 'facts', query, _FACTS_PAGE_ORDER,
+                         page_size, workers)
+    if raw:
+        return facts
+
+    ret = defaultdict(dict)
+    for fact in facts:
+        ret[fact['certname']][fact['name']] = fact['value']
+    return ret
+
+
+async def query_fact_contents(transport, s, facts=None, raw=False,
+                              lex_options=None, yacc_options=None,
+                              extract=False, page_size=None, workers=1):
+    """
+    Asynchronous counterpart of :func:`pypuppetdbquery.query_fact_contents`.
+
+    :param transport: The transport to query PuppetDB with, such as a
+        :class:`Client`
+    :param str s: The query string (may be empty to query all nodes)
+    :param Sequence facts: List of fact paths to search for
+    :param bool raw: Whether to skip post-processing the facts into a dict
+        structure grouped by node
+    :param dict lex_options: Options passed to :func:`ply.lex.lex`
+    :param dict yacc_options: Options passed to :func:`ply.yacc.yacc`
+    :param bool extract: Whether to have PuppetDB return only the fields
+        used by this function
+    :param int page_size: The number of results to fetch at a time, if any
+    :param int workers: The number of pages to fetch at once
+    """
+    query = _fact_contents_query(s, facts, lex_options, yacc_options,
+                                 extract)
+    if query is None:
+        return None
+
+    facts = await _fetch(transport, 'fact-contents', query,
+                         _FACT_CONTENTS_PAGE_ORDER, page_size, workers)
+    if raw:
+        return facts
+    return _group_fact_contents(facts)
+
+
+async def _fetch(transport, endpoint, query, order_by, page_size, workers):
+    # Runs a query, in pages if asked to in the same way as
+    # pypuppetdbquery.pages.fetch_pages(), and returns all the rows
+    query = _json_dumps(query)
+    if not page_size:
+        return await transport.query(endpoint, query=query)
+
+    check_paging(page_size, workers)
+    rows = []
+    pending = deque()
+    offset = 0
+    try:
+        while True:
+            while len(pending) < workers:
+                pending.append(asyncio.ensure_future(transport.query(
+                    endpoint, query=query, order_by=order_by,
+                    limit=page_size, offset=offset)))
+                offset += page_size
+
+            page = await pending.popleft()
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+    finally:
+        # Pages past the end of the results are of no use
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
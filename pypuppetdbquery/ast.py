@@ -18,21 +18,97 @@
 Abstract Syntax Tree (AST) for the PuppetDBQuery language. These simple classes
 are used by the :class:`pypuppetdbquery.parser.Parser` in order to represent
 the parsed syntax tree.
+
+Nodes are immutable and compare equal when they are of the same type and have
+equal attributes, so they can be used as dictionary keys or members of sets.
+Values are only equal when they are of the same type, so that ``Literal(1)``,
+``Literal(1.0)`` and ``Literal(True)`` are all different.
 """
 
-import inspect
+
+def _key(value):
+    # Child nodes already have their hash computed, so they are hashed as-is;
+    # other values are hashed along with their type.
+    if isinstance(value, Node):
+        return value
+    return (type(value), value)
 
 
 class Node(object):
-    def __repr__(self):
-        # Represent the variables defined in the constructor in the same order
-        # that they are listed in the constructor.
-        members = []
-        for var in inspect.getargspec(self.__init__).args:
-            if var == 'self':
+    __slots__ = ('_hash',)
+
+    #: Names of the attributes of the node, in the same order as the
+    #: arguments to its constructor.
+    _fields = ()
+
+    def __init__(self, *values):
+        # The hash is computed from those of the children, which were already
+        # computed when they were created, so this is cheap even for very deep
+        # trees.
+        for name, value in zip(self._fields, values):
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, '_hash', hash(
+            (type(self),) + tuple(_key(x) for x in values)))
+
+    def _values(self):
+        return tuple(getattr(self, x) for x in self._fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("'{cls}' object is immutable".format(
+            cls=self.__class__.__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("'{cls}' object is immutable".format(
+            cls=self.__class__.__name__))
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, Node):
+            return NotImplemented
+
+        # Compare the trees using an explicit stack, as they can be nested far
+        # deeper than the recursion limit
+        stack = [(self, other)]
+        while stack:
+            a, b = stack.pop()
+            if a is b:
                 continue
+            if type(a) is not type(b):
+                return False
+
+            if isinstance(a, Node):
+                if a._hash != b._hash:
+                    return False
+                stack.extend(zip(a._values(), b._values()))
+            elif isinstance(a, tuple):
+                if len(a) != len(b):
+                    return False
+                stack.extend(zip(a, b))
+            elif a != b:
+                return False
+        return True
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+        if ret is NotImplemented:
+            return ret
+        return not ret
+
+    def __reduce__(self):
+        return (self.__class__, self._values())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
-            members.append(repr(getattr(self, var)))
+    def __repr__(self):
+        # Represent the attributes in the same order that they are listed in
+        # the constructor.
+        members = [repr(getattr(self, x)) for x in self._fields]
 
         # Put it together with the class name
         return "{cls}({members})".format(
@@ -40,89 +116,124 @@ class Node(object):
 
 
 class Literal(Node):
+    __slots__ = _fields = ('value',)
+
     def __init__(self, value):
-        self.value = value
+        super(Literal, self).__init__(value)
 
 
 class Date(Literal):
-    pass
+    __slots__ = ()
 
 
 class Query(Node):
+    __slots__ = _fields = ('expression',)
+
     def __init__(self, expression):
-        self.expression = expression
+        super(Query, self).__init__(expression)
 
 
 class Expression(Node):
-    pass
+    __slots__ = ()
 
 
 class UnaryExpression(Node):
+    __slots__ = _fields = ('expression',)
+
     def __init__(self, expression):
-        self.expression = expression
+        super(UnaryExpression, self).__init__(expression)
 
 
 class BinaryExpression(Node):
+    __slots__ = _fields = ('left', 'right')
+
     def __init__(self, left, right):
-        self.left = left
-        self.right = right
+        super(BinaryExpression, self).__init__(left, right)
 
 
 class AndExpression(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class OrExpression(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class NotExpression(UnaryExpression):
-    pass
+    __slots__ = ()
 
 
 class ParenthesizedExpression(UnaryExpression):
-    pass
+    __slots__ = ()
 
 
 class BlockExpression(UnaryExpression):
-    pass
+    __slots__ = ()
 
 
 class Comparison(Expression):
+    __slots__ = _fields = ('operator', 'left', 'right')
+
     def __init__(self, operator, left, right):
-        self.operator = operator
-        self.left = left
-        self.right = right
+        super(Comparison, self).__init__(operator, left, right)
+
+
+class Membership(Expression):
+    __slots__ = _fields = ('left', 'values')
+
+    def __init__(self, left, values):
+        super(Membership, self).__init__(left, tuple(values))
 
 
 class Identifier(Node):
+    __slots__ = _fields = ('name',)
+
     def __init__(self, name):
-        self.name = name
+        super(Identifier, self).__init__(name)
 
 
 class RegexpIdentifier(Identifier):
-    pass
+    __slots__ = ()
 
 
 class IdentifierPath(Node):
+    __slots__ = _fields = ('components',)
+
     def __init__(self, components):
-        self.components = components
+        # Stored as a tuple so that the path cannot change
+        super(IdentifierPath, self).__init__(tuple(components))
 
 
 class Subquery(Node):
+    __slots__ = _fields = ('endpoint', 'expression')
+
     def __init__(self, endpoint, expression):
-        self.endpoint = endpoint
-        self.expression = expression
+        super(Subquery, self).__init__(endpoint, expression)
 
 
 class Resource(Expression):
+    __slots__ = _fields = ('res_type', 'title', 'exported', 'parameters')
+
     def __init__(self, res_type, title, exported, parameters=None):
-        self.res_type = res_type
-        self.title = title
-        self.exported = exported
-        self.parameters = parameters
+        super(Resource, self).__init__(res_type, title, exported, parameters)
+
+
+class Placeholder(Node):
+    __slots__ = _fields = ('name',)
+
+    def __init__(self, name):
+        super(Placeholder, self).__init__(name)
+
+
+class NodeList(Expression):
+    __slots__ = _fields = ('names',)
+
+    def __init__(self, names):
+        super(NodeList, self).__init__(tuple(names))
 
 
 class RegexpNodeMatch(Expression):
+    __slots__ = _fields = ('value',)
+
     def __init__(self, value):
-        self.value = value
+        super(RegexpNodeMatch, self).__init__(value)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Bounded cache of compiled queries. This is used by
+:func:`pypuppetdbquery.parse` so that repeated query strings do not need to be
+lexed, parsed and evaluated again.
+"""
+
+from collections import namedtuple, OrderedDict
+from threading import Lock
+
+#: Statistics about a :class:`QueryCache`, as returned by
+#: :meth:`QueryCache.info`.
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+#: Marker returned by :meth:`QueryCache.get` when a key is not in the cache.
+MISSING = object()
+
+
+def make_key(*args):
+    """
+    Build a cache key out of the given arguments.
+
+    Dictionaries (such as the `lex_options` and `yacc_options` arguments to
+    :func:`pypuppetdbquery.parse`) are converted into sorted tuples of their
+    items so that they can be hashed.
+
+    :return: A hashable key, or `None` if any of the arguments cannot be
+        hashed and the result should therefore not be cached
+    """
+    key = tuple(_freeze(x) for x in args)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(_freeze(x) for x in value)
+    else:
+        return value
+
+
+def copy_tree(value):
+    """
+    Copy a PuppetDB AST (nested lists of scalars) so that the copy can be
+    handed to a caller who may modify it.
+
+    The lists are copied using an explicit stack rather than recursion, as
+    queries with long chains of `and` or `or` terms can be nested very deeply.
+    """
+    if not isinstance(value, list):
+        return value
+
+    ret = []
+    stack = [(value, ret)]
+    while stack:
+        src, dst = stack.pop()
+        for x in src:
+            if isinstance(x, list):
+                child = []
+                stack.append((x, child))
+                x = child
+            dst.append(x)
+    return ret
+
+
+class QueryCache(object):
+    """
+    A thread-safe, size-bounded mapping of keys to compiled queries.
+
+    When the cache is full the least recently used entry is evicted to make
+    room for a new one. Lists stored in the cache are copied on the way in and
+    on the way out so that callers are free to modify the results they are
+    given without corrupting the cache.
+
+    :param int maxsize: The maximum number of entries to keep. `None` means
+        the cache may grow without bound and `0` disables caching entirely.
+    """
+    def __init__(self, maxsize=256):
+        super(QueryCache, self).__init__()
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self._maxsize = maxsize
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        """
+        Look up a compiled query.
+
+        :param key: The cache key, as returned by :func:`make_key`
+        :return: The cached value, or :data:`MISSING` if there is no entry
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self._misses += 1
+                return MISSING
+
+            # Re-insert at the end to mark this entry as most recently used
+            self._data[key] = value
+            self._hits += 1
+
+        return copy_tree(value)
+
+    def put(self, key, value):
+        """
+        Store a compiled query, evicting the least recently used entries if
+        the cache is full.
+
+        :param key: The cache key, as returned by :func:`make_key`
+        :param value: The value to store
+        """
+        if self._maxsize == 0:
+            return
+
+        value = copy_tree(value)
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            self._evict()
+
+    def resize(self, maxsize):
+        """
+        Change the maximum number of entries in the cache, evicting entries
+        as needed to satisfy the new limit.
+
+        :param int maxsize: The new maximum size (see :class:`QueryCache`)
+        """
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """
+        Remove all entries from the cache and reset the statistics.
+        """
+        with self._lock:
+            self._data.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def info(self):
+        """
+        Report statistics about the cache.
+
+        :rtype: CacheInfo
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize,
+                             len(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    def _evict(self):
+        # Must be called with the lock held
+        if self._maxsize is None:
+            return
+
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
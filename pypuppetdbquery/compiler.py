@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compilation of queries into Python functions that test whether a node
+matches them, given its facts.
+"""
+
+import operator
+import re
+
+from .evaluator import Evaluator
+from .local import ENDPOINT_FIELDS, _contents, _is_number, _key, _regexp
+
+#: Functions implementing the inequality operators.
+INEQUALITIES = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def _always(facts, certname=None):
+    return True
+
+
+def _never(row):
+    return False
+
+
+def _node_rows(facts, certname):
+    return ((certname,),)
+
+
+def _fact_rows(facts, certname):
+    return ((certname, name, value) for name, value in facts.items())
+
+
+def _fact_contents_rows(facts, certname):
+    return ((certname, name, path, value)
+            for name, fact in facts.items()
+            for path, value in _contents(name, fact))
+
+
+#: Functions yielding the rows of each endpoint for the facts of a node, as
+#: tuples of the fields listed in
+#: :data:`pypuppetdbquery.local.ENDPOINT_FIELDS`.
+ENDPOINT_ROWS = {
+    'nodes': _node_rows,
+    'facts': _fact_rows,
+    'fact_contents': _fact_contents_rows,
+}
+
+
+class PredicateCompiler(Evaluator):
+    """
+    Compiles a :mod:`pypuppetdbquery.ast` Abstract Syntax Tree into a
+    function (a predicate) that takes the facts of a node, and optionally its
+    name, and returns whether the node matches the query.
+
+    The predicate is built once out of nested closures, with any regular
+    expressions compiled, fact paths split into their components and dates
+    parsed up front, so that no work is repeated for each node it is called
+    on. Matching follows the same rules as
+    :class:`pypuppetdbquery.local.LocalEvaluator`, to which it gives the same
+    results. Comparisons on a fact path are tested by looking the path up in
+    the facts, rather than by going through all of them.
+
+    Queries on node names (such as ``~web`` or ``[a, b]``) only match if a
+    name is given to the predicate. Resources, subqueries nested within
+    subqueries and regular expressions that are not strings cannot be
+    compiled, and raise :class:`ValueError`.
+    """
+
+    def compile(self, ast, mode='nodes'):
+        """
+        Compile a parsed PuppetDBQuery AST into a predicate.
+
+        :param pypuppetdbquery.ast.Query ast: Root of the AST to compile
+        :param str mode: Must be ``nodes``; the other PuppetDB endpoints are
+            not supported
+        :return: A function taking a :class:`dict` of the facts of a node and
+            the name of the node (`None` by default) and returning a
+            :class:`bool`
+        :raises ValueError: If the query cannot be compiled
+        """
+        if mode != 'nodes':
+            raise ValueError(
+                'Unsupported mode for compiled queries: {0}'.format(mode))
+        return self._visit(ast, ['nodes'])
+
+    def _visit_query(self, node, path):
+        if node.expression is None:
+            return _always
+        return self._visit(node.expression, path)
+
+    def _visit_binary_expression(self, node, path):
+        if path[-1] != 'nodes':
+            return super(PredicateCompiler, self)._visit_binary_expression(
+                node, path)
+
+        op, operands = self._chain(node, self._visitor(type(node)))
+        operands = tuple(self._visit(x, path) for x in operands)
+        if len(operands) == 2:
+            left, right = operands
+            if op == 'and':
+                return lambda facts, certname=None: (
+                    left(facts, certname) and right(facts, certname))
+            return lambda facts, certname=None: (
+                left(facts, certname) or right(facts, certname))
+
+        if op == 'and':
+            def predicate(facts, certname=None):
+                for operand in operands:
+                    if not operand(facts, certname):
+                        return False
+                return True
+        else:
+            def predicate(facts, certname=None):
+                for operand in operands:
+                    if operand(facts, certname):
+                        return True
+                return False
+        return predicate
+
+    def _visit_not_expression(self, node, path):
+        if path[-1] != 'nodes':
+            return super(PredicateCompiler, self)._visit_not_expression(
+                node, path)
+
+        expression = self._visit(node.expression, path)
+        return lambda facts, certname=None: not expression(facts, certname)
+
+    def _visit_node_list(self, node, path):
+        if path[-1] != 'nodes':
+            return super(PredicateCompiler, self)._visit_node_list(
+                node, path)
+
+        names = frozenset(node.names)
+        return lambda facts, certname=None: certname in names
+
+    def _visit_regexp_node_match(self, node, path):
+        query = super(PredicateCompiler, self)._visit_regexp_node_match(
+            node, path)
+        if path[-1] != 'nodes':
+            return query
+
+        regexp = re.compile(query[2])
+        return lambda facts, certname=None: (
+            certname is not None and regexp.search(certname) is not None)
+
+    def _subquery(self, from_mode, to_mode, query):
+        if from_mode != 'nodes':
+            raise ValueError('Nested subqueries cannot be compiled')
+
+        if to_mode == 'fact_contents':
+            predicate = self._fact_path(query)
+            if predicate is not None:
+                return predicate
+
+        try:
+            rows = ENDPOINT_ROWS[to_mode]
+        except KeyError:
+            raise ValueError(
+                'Cannot compile queries on {0}'.format(to_mode))
+
+        match = self._term(query, ENDPOINT_FIELDS[to_mode])
+
+        def predicate(facts, certname=None):
+            for row in rows(facts, certname):
+                if match(row):
+                    return True
+            return False
+        return predicate
+
+    def _fact_path(self, query):
+        # Compiles a fact-contents query made by Evaluator for a comparison
+        # on a fact path into a predicate that looks up the path in the
+        # facts, or returns None if the query is of any other form
+        if not (len(query) == 3 and query[0] == 'and' and
+                query[1][1] == 'path'):
+            return None
+
+        term = query[2]
+        negate = term[0] == 'not'
+        if negate:
+            term = term[1]
+        if term[1] != 'value':
+            return None
+        test = self._test(term[0], term[2])
+
+        path_op, _, components = query[1]
+        if path_op == '=':
+            return self._fact_path_lookup(tuple(components), test, negate)
+        elif path_op == '~>':
+            return self._fact_path_search(
+                tuple(_regexp(x) for x in components), test, negate)
+        return None
+
+    def _fact_path_lookup(self, components, test, negate):
+        def predicate(facts, certname=None):
+            value = facts
+            for component in components:
+                if isinstance(value, dict):
+                    if component not in value:
+                        return False
+                    value = value[component]
+                elif (isinstance(value, list) and
+                        type(component) is int and
+                        0 <= component < len(value)):
+                    value = value[component]
+                else:
+                    return False
+
+            # Only the leaves of structured facts can be compared
+            if isinstance(value, (dict, list)):
+                return False
+            return test(value) is not negate
+        return predicate
+
+    def _fact_path_search(self, regexps, test, negate):
+        def predicate(facts, certname=None):
+            level = [facts]
+            for regexp in regexps:
+                children = []
+                for value in level:
+                    if isinstance(value, dict):
+                        items = value.items()
+                    elif isinstance(value, list):
+                        items = enumerate(value)
+                    else:
+                        continue
+                    children.extend(child for key, child in items
+                                    if regexp.search(str(key)))
+                if not children:
+                    return False
+                level = children
+
+            for value in level:
+                if (not isinstance(value, (dict, list)) and
+                        test(value) is not negate):
+                    return True
+            return False
+        return predicate
+
+    def _term(self, query, fields):
+        # Compiles a PuppetDB AST into a function that tests whether a row
+        # (a tuple of the values of `fields`) matches it
+        op = query[0]
+        if op in ('and', 'or'):
+            terms = tuple(self._term(x, fields) for x in query[1:])
+            if op == 'and':
+                return lambda row: all(x(row) for x in terms)
+            return lambda row: any(x(row) for x in terms)
+        elif op == 'not':
+            term = self._term(query[1], fields)
+            return lambda row: not term(row)
+
+        field = query[1]
+        if not isinstance(field, str):
+            raise ValueError('Cannot compile {0!r}'.format(field))
+        if field not in fields:
+            return _never
+
+        index = fields.index(field)
+        test = self._test(op, query[2])
+        return lambda row: test(row[index])
+
+    def _test(self, op, operand):
+        # Compiles a comparison against a value into a function that tests
+        # whether a value matches it
+        if op == '=':
+            if isinstance(operand, str):
+                return lambda value: (
+                    isinstance(value, str) and value == operand)
+            key = _key(operand)
+            return lambda value: _key(value) == key
+        elif op == 'in':
+            keys = frozenset(_key(x) for x in operand[1])
+            return lambda value: _key(value) in keys
+        elif op == '~':
+            regexp = _regexp(operand)
+            return lambda value: (
+                isinstance(value, str) and regexp.search(value) is not None)
+        elif op == '~>':
+            regexps = tuple(_regexp(x) for x in operand)
+            return lambda value: (
+                isinstance(value, tuple) and len(value) == len(regexps) and
+                all(x.search(str(y)) is not None
+                    for x, y in zip(regexps, value)))
+        elif op in INEQUALITIES:
+            compare = INEQUALITIES[op]
+            if _is_number(operand):
+                return lambda value: (
+                    _is_number(value) and compare(value, operand))
+            elif isinstance(operand, str):
+                return lambda value: (
+                    isinstance(value, str) and compare(value, operand))
+            return lambda value: False
+        raise ValueError('Cannot compile {0!r}'.format(op))
@@ -17,20 +17,80 @@
 
 import dateutil.parser
 import re
+from json import JSONEncoder
+from json.encoder import encode_basestring_ascii
 
 from . import ast
 
+_encoder = JSONEncoder()
+
+
+def _encode_json(value):
+    # Same as json.dumps(), with shortcuts for the values found in PuppetDB
+    # AST queries; JSONEncoder.encode() sets up a new encoder for anything
+    # other than a string.
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    elif value is True:
+        return 'true'
+    elif value is False:
+        return 'false'
+    elif type(value) is int:
+        return int.__repr__(value)
+    elif type(value) is list:
+        return '[' + ', '.join([_encode_json(x) for x in value]) + ']'
+    return _encoder.encode(value)
+
 
 class Evaluator(object):
     """
     Converts a :mod:`pypuppetdbquery.ast` Abstract Syntax Tree into a PuppetDB
     native AST query.
+
+    :param bool flatten: Whether to turn chains of the same boolean operator,
+       such as ``a and (b and c)``, into a single n-ary PuppetDB operator
+       (``["and", a, b, c]``) rather than nesting them as they are parsed
     """
 
     #: Regular expression used when converting CamelCase class names to
     #: underscore_separated names.
     DECAMEL_RE = re.compile(r'(?!^)([A-Z]+)')
 
+    #: Whether chains of the same boolean operator are flattened (see above).
+    flatten = True
+
+    def __init__(self, flatten=True):
+        super(Evaluator, self).__init__()
+        self.flatten = flatten
+
+    @classmethod
+    def _dispatch_table(cls):
+        # Node types are mapped to their visitor methods once per evaluator
+        # class rather than once per node. The table is filled in as node
+        # types are first seen, and must not be shared with subclasses as
+        # they may override some of the visitors. It is looked up from the
+        # class on each visit so that subclasses need not call __init__.
+        table = cls.__dict__.get('_dispatch')
+        if table is None:
+            table = cls._dispatch = {}
+        return table
+
+    def _find_visitor(self, node_type):
+        # Each AST node class is handled by the _visit_* method named after
+        # it (converting CamelCase to underscores), or failing that by that
+        # of the nearest base class that has one.
+        for klass in node_type.__mro__:
+            underscore = self.DECAMEL_RE.sub(r'_\1', klass.__name__).lower()
+            visitor = getattr(type(self), '_visit_{0}'.format(underscore),
+                              None)
+            if visitor is not None:
+                type(self)._dispatch_table()[node_type] = visitor
+                return visitor
+
+        raise AttributeError(
+            "'{0}' object has no visitor for '{1}'".format(
+                type(self).__name__, node_type.__name__))
+
     def evaluate(self, ast, mode='nodes'):
         """
         Process a parsed PuppetDBQuery AST and return a PuppetDB AST.
@@ -63,22 +123,42 @@ class Evaluator(object):
     def _capitalize_class(self, name):
         return '::'.join([x.capitalize() for x in name.split('::')])
 
+    def _escape(self, name):
+        return re.escape(name)
+
+    def _join_path(self, components):
+        return '.'.join(components)
+
+    def _format_date(self, value):
+        return dateutil.parser.parse(value).strftime('%Y-%m-%dT%H:%M:%SZ')
+
     def _visit(self, node, path):
-        if isinstance(node, list):
-            return [self._visit(x, path) for x in node]
+        try:
+            visitor = type(self)._dispatch_table()[type(node)]
+        except KeyError:
+            visitor = self._find_visitor(type(node))
+        return visitor(self, node, path)
+
+    def _visitor(self, node_type):
+        try:
+            return type(self)._dispatch_table()[node_type]
+        except KeyError:
+            return self._find_visitor(node_type)
 
-        # Convert CamelCase node class name to underscores
-        klass = node.__class__.__name__
-        underscore = self.DECAMEL_RE.sub(r'_\1', klass).lower()
+    def _visit_list(self, node, path):
+        return [self._visit(x, path) for x in node]
 
-        visitor = getattr(self, '_visit_{0}'.format(underscore))
-        return visitor(node, path)
+    def _visit_tuple(self, node, path):
+        return self._visit_list(node, path)
 
     def _visit_literal(self, node, path):
         return node.value
 
     def _visit_date(self, node, path):
-        return dateutil.parser.parse(node.value).strftime('%Y-%m-%dT%H:%M:%SZ')
+        value = node.value
+        if isinstance(value, ast.Placeholder):
+            value = self._visit(value, path)
+        return self._format_date(value)
 
     def _visit_query(self, node, path):
         if node.expression is None:
@@ -86,15 +166,65 @@ class Evaluator(object):
         else:
             return self._visit(node.expression, path)
 
-    def _visit_and_expression(self, node, path):
-        return ['and',
-                self._visit(node.left, path),
-                self._visit(node.right, path)]
+    def _visit_binary_expression(self, node, path):
+        # Chains of `and` and `or` expressions nest one level deeper on the
+        # left for every term, which makes generated queries with thousands
+        # of terms far too deep to recurse into. Instead walk down the left
+        # hand side for as long as it is handled by this same visitor, then
+        # build the results back up from the bottom.
+        visitor = self._visitor(type(node))
+        if self.flatten:
+            op, operands = self._chain(node, visitor)
+            return [op] + [self._visit(x, path) for x in operands]
+
+        spine, node = self._spine(node, visitor)
+        ret = self._visit(node, path)
+        for node in reversed(spine):
+            ret = [self._operator(node), ret, self._visit(node.right, path)]
+        return ret
 
-    def _visit_or_expression(self, node, path):
-        return ['or',
-                self._visit(node.left, path),
-                self._visit(node.right, path)]
+    def _operator(self, node):
+        return 'and' if isinstance(node, ast.AndExpression) else 'or'
+
+    def _spine(self, node, visitor):
+        # Returns the binary expressions down the left hand side of a node
+        # that are handled by the given visitor, top first, along with the
+        # node found at the bottom.
+        spine = []
+        while True:
+            spine.append(node)
+            node = node.left
+            if self._visitor(type(node)) != visitor:
+                return spine, node
+
+    def _chain(self, node, visitor):
+        # Collect the operands of a chain of the same operator, looking
+        # through parentheses, using an explicit stack for the same reasons
+        # as above. Returns the operator and the operands in their original
+        # order.
+        op = self._operator(node)
+        if op == 'and':
+            op_type = ast.AndExpression
+        else:
+            op_type = ast.OrExpression
+
+        operands = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            while (isinstance(node, ast.ParenthesizedExpression) and
+                   self._visitor(type(node)) ==
+                   Evaluator._visit_parenthesized_expression):
+                node = node.expression
+
+            if (isinstance(node, op_type) and
+                    self._visitor(type(node)) == visitor):
+                stack.append(node.right)
+                stack.append(node.left)
+            else:
+                operands.append(node)
+
+        return op, operands
 
     def _visit_not_expression(self, node, path):
         return ['not', self._visit(node.expression, path)]
@@ -125,9 +255,33 @@ class Evaluator(object):
                 path[-1], 'fact_contents',
                 ['and', left, self._comparison(node.operator, 'value', right)])
 
+    def _visit_membership(self, node, path):
+        left = self._visit(node.left, path)
+        values = ['array', [self._visit(x, path) for x in node.values]]
+
+        if path[-1] == 'subquery':
+            if len(left) == 1:
+                left = left[0]
+            return ['in', left, values]
+        elif path[-1] == 'resources':
+            if left[0] == 'tag':
+                return ['in', left[0], values]
+            else:
+                # Resource parameters are not a field that PuppetDB can match
+                # against an array
+                return ['or'] + [['=', ['parameter', left[0]], x]
+                                 for x in values[1]]
+        else:
+            return self._subquery(
+                path[-1], 'fact_contents',
+                ['and', left, ['in', 'value', values]])
+
+    def _visit_node_list(self, node, path):
+        return ['in', 'certname', ['array', list(node.names)]]
+
     def _visit_identifier(self, node, path):
         if path[-1] == 'regexp':
-            return re.escape(node.name)
+            return self._escape(node.name)
         else:
             return node.name
 
@@ -138,7 +292,7 @@ class Evaluator(object):
         if path[-1] in ['subquery', 'resources']:
             return self._visit(node.components, path)
         elif path[-1] == 'regexp':
-            return '.'.join(self._visit(node.components, path))
+            return self._join_path(self._visit(node.components, path))
         else:
             # Check if any of the children are of regexp type in that case we
             # need to escape the others and use the ~> operator
@@ -158,15 +312,20 @@ class Evaluator(object):
         path.pop()
         return ret
 
-    def _visit_resource(self, node, path):
-        path.append('resources')
-
+    def _resource_title(self, node, path):
+        # Returns the title of a resource expression, and whether it is a
+        # regular expression
         regexp = isinstance(node.title, ast.RegexpIdentifier)
         if not regexp and node.res_type.lower() == 'class':
             title = self._capitalize_class(self._visit(node.title, path))
         else:
             title = self._visit(node.title, path)
+        return title, regexp
 
+    def _visit_resource(self, node, path):
+        path.append('resources')
+
+        title, regexp = self._resource_title(node, path)
         res_type = self._capitalize_class(node.res_type)
         query = [
             'and',
@@ -176,14 +335,186 @@ class Evaluator(object):
         ]
 
         if node.parameters:
-            query.append(self._visit(node.parameters, path))
+            parameters = self._visit(node.parameters, path)
+            if self.flatten and parameters[0] == 'and':
+                query.extend(parameters[1:])
+            else:
+                query.append(parameters)
 
         path.pop()
 
         return self._subquery(path[-1], 'resources', query)
 
+    def _visit_placeholder(self, node, path):
+        raise ValueError(
+            "No value for placeholder '${0}' (queries with placeholders must "
+            "be compiled using pypuppetdbquery.prepare)".format(node.name))
+
+    def _visit_regexp_node_match(self, node, path):
+        path.append('regexp')
+        ret = ['~', 'certname', self._escape(self._visit(node.value, path))]
+        path.pop()
+        return ret
+
+
+class JSONEvaluator(Evaluator):
+    """
+    Converts a :mod:`pypuppetdbquery.ast` Abstract Syntax Tree directly into
+    the JSON text of a PuppetDB native AST query.
+
+    The result is exactly what :func:`json.dumps` would produce for the result
+    of :class:`Evaluator`, but the query is written out as it is evaluated
+    rather than being built up as nested lists and then encoded, which saves
+    both time and memory on large queries. Only the small lists that make up
+    the paths of facts and resource parameters are built as lists.
+
+    :param bool flatten: As for :class:`Evaluator`
+    """
+
+    def evaluate(self, ast, mode='nodes'):
+        """
+        Process a parsed PuppetDBQuery AST and return a PuppetDB AST in JSON.
+
+        :param pypuppetdbquery.ast.Query ast: Root of the AST to evaulate
+        :param str mode: PuppetDB endpoint to target
+        :return: PuppetDB AST as JSON, or `None` for an empty query
+        :rtype: str
+        """
+        return self._visit(ast, [mode])
+
+    def _subquery(self, from_mode, to_mode, query):
+        if from_mode == 'none':
+            return query
+
+        return ('["in", "certname", ["extract", "certname", '
+                '[{0}, {1}]]]'.format(
+                    _encode_json('select_{0}'.format(to_mode)), query))
+
+    def _comparison(self, operator, left, right):
+        if operator[0] == '!':
+            return '["not", [{0}, {1}, {2}]]'.format(
+                _encode_json(operator[1]), left, right)
+        else:
+            return '[{0}, {1}, {2}]'.format(
+                _encode_json(operator), left, right)
+
+    def _visit_binary_expression(self, node, path):
+        visitor = self._visitor(type(node))
+        if self.flatten:
+            op, operands = self._chain(node, visitor)
+            return '["{0}", {1}]'.format(
+                op, ', '.join([self._visit(x, path) for x in operands]))
+
+        # Write out the opening of every nested list down the left hand side
+        # first, then close them in turn after each right hand side.
+        spine, node = self._spine(node, visitor)
+        chunks = ['["{0}", '.format(self._operator(x)) for x in spine]
+        chunks.append(self._visit(node, path))
+        for node in reversed(spine):
+            chunks.append(', ')
+            chunks.append(self._visit(node.right, path))
+            chunks.append(']')
+        return ''.join(chunks)
+
+    def _visit_not_expression(self, node, path):
+        return '["not", {0}]'.format(self._visit(node.expression, path))
+
+    def _visit_comparison(self, node, path):
+        left = self._visit(node.left, path)
+        right = _encode_json(self._visit(node.right, path))
+
+        if path[-1] == 'subquery':
+            if len(left) == 1:
+                left = left[0]
+            return self._comparison(node.operator, _encode_json(left), right)
+        elif path[-1] == 'resources':
+            if left[0] == 'tag':
+                return self._comparison(
+                    node.operator, _encode_json(left[0]), right)
+            else:
+                return self._comparison(
+                    node.operator, '["parameter", {0}]'.format(
+                        _encode_json(left[0])), right)
+        else:
+            return self._subquery(
+                path[-1], 'fact_contents', '["and", {0}, {1}]'.format(
+                    left, self._comparison(node.operator, '"value"', right)))
+
+    def _visit_membership(self, node, path):
+        left = self._visit(node.left, path)
+        values = '["array", [{0}]]'.format(', '.join([
+            _encode_json(self._visit(x, path)) for x in node.values]))
+
+        if path[-1] == 'subquery':
+            if len(left) == 1:
+                left = left[0]
+            return '["in", {0}, {1}]'.format(_encode_json(left), values)
+        elif path[-1] == 'resources':
+            if left[0] == 'tag':
+                return '["in", {0}, {1}]'.format(_encode_json(left[0]), values)
+            else:
+                parameter = '["parameter", {0}]'.format(_encode_json(left[0]))
+                return '["or", {0}]'.format(', '.join([
+                    '["=", {0}, {1}]'.format(
+                        parameter, _encode_json(self._visit(x, path)))
+                    for x in node.values]))
+        else:
+            return self._subquery(
+                path[-1], 'fact_contents',
+                '["and", {0}, ["in", "value", {1}]]'.format(left, values))
+
+    def _visit_node_list(self, node, path):
+        return '["in", "certname", ["array", {0}]]'.format(
+            _encode_json(list(node.names)))
+
+    def _visit_identifier_path(self, node, path):
+        if path[-1] in ['subquery', 'resources', 'regexp']:
+            return super(JSONEvaluator, self)._visit_identifier_path(
+                node, path)
+        elif any(isinstance(x, ast.RegexpIdentifier)
+                 for x in node.components):
+            path.append('regexp')
+            ret = '["~>", "path", [{0}]]'.format(
+                self._encode_components(node, path))
+            path.pop()
+            return ret
+        else:
+            return '["=", "path", [{0}]]'.format(
+                self._encode_components(node, path))
+
+    def _encode_components(self, node, path):
+        return ', '.join([_encode_json(self._visit(x, path))
+                          for x in node.components])
+
+    def _visit_resource(self, node, path):
+        path.append('resources')
+
+        title, regexp = self._resource_title(node, path)
+        res_type = self._capitalize_class(node.res_type)
+        query = [
+            '"and"',
+            '["=", "type", {0}]'.format(_encode_json(res_type)),
+            '["{0}", "title", {1}]'.format('~' if regexp else '=',
+                                           _encode_json(title)),
+            '["=", "exported", {0}]'.format(_encode_json(node.exported)),
+        ]
+
+        if node.parameters:
+            parameters = self._visit(node.parameters, path)
+            if self.flatten and parameters.startswith('["and", '):
+                # Splice the operands of the "and" into the query
+                query.append(parameters[len('["and", '):-1])
+            else:
+                query.append(parameters)
+
+        path.pop()
+
+        return self._subquery(
+            path[-1], 'resources', '[{0}]'.format(', '.join(query)))
+
     def _visit_regexp_node_match(self, node, path):
         path.append('regexp')
-        ret = ['~', 'certname', re.escape(self._visit(node.value, path))]
+        ret = '["~", "certname", {0}]'.format(
+            _encode_json(self._escape(self._visit(node.value, path))))
         path.pop()
         return ret
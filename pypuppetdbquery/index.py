@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Indexes over a snapshot of facts, so that queries can be evaluated against
+it without scanning the facts of every node as
+:class:`pypuppetdbquery.local.LocalEvaluator` does.
+
+Sets of nodes are represented as bitsets: integers with bit `i` set for the
+node with id `i`, which are combined with the ``&``, ``|`` and ``~``
+operators. Sets of only a few nodes are stored as tuples of their ids
+instead, as the bitset of even a single node takes as much memory as that of
+all of them.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+
+from .local import (
+    LocalEvaluator, _check_regexps, _contents, _is_number, _key, _regexp)
+
+# Key of the path of the fact found at a node of FactIndex.trie
+_PATH = object()
+
+
+def _bits(ids):
+    # Builds the bitset of an iterable of node ids
+    ids = list(ids)
+    if len(ids) < 64:
+        ret = 0
+        for i in ids:
+            ret |= 1 << i
+        return ret
+
+    buf = bytearray((max(ids) >> 3) + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _as_bits(nodes):
+    # Nodes may be stored as a bitset or a tuple of ids
+    if isinstance(nodes, tuple):
+        return _bits(nodes)
+    return nodes
+
+
+class SortedColumn(object):
+    """
+    Values of one type found at a fact path, sorted so that ranges of them
+    can be found using :mod:`bisect`.
+
+    Alongside the values are the bitsets of the nodes with the smallest
+    values at regular intervals (checkpoints), so that the nodes with values
+    below any point can be found by adding the few nodes since the last
+    checkpoint to its bitset.
+
+    :param list pairs: Tuples of a value and the id of the node it was found
+        on, with each node found at most once
+    """
+    #: Maximum number of checkpoints kept.
+    CHECKPOINTS = 32
+
+    def __init__(self, pairs):
+        super(SortedColumn, self).__init__()
+        pairs.sort(key=lambda x: x[0])
+        self.keys = [x[0] for x in pairs]
+        self.ids = [x[1] for x in pairs]
+
+        self.stride = max(64, -(-len(pairs) // self.CHECKPOINTS))
+        self.prefix = [0]
+        for end in range(self.stride, len(pairs) + 1, self.stride):
+            self.prefix.append(
+                self.prefix[-1] | _bits(self.ids[end - self.stride:end]))
+        self.all = self._below(len(pairs))
+
+    def _below(self, pos):
+        # The nodes of the first `pos` values
+        block = pos // self.stride
+        return self.prefix[block] | _bits(self.ids[block * self.stride:pos])
+
+    def range(self, op, value):
+        """
+        Find the nodes with values that compare to `value` using `op`.
+
+        :param str op: One of ``<``, ``<=``, ``>`` or ``>=``
+        :param value: The value to compare against
+        :return: Bitset of the matching nodes
+        :rtype: int
+        """
+        if op == '<':
+            return self._below(bisect_left(self.keys, value))
+        elif op == '<=':
+            return self._below(bisect_right(self.keys, value))
+        elif op == '>':
+            return self.all & ~self._below(bisect_right(self.keys, value))
+        return self.all & ~self._below(bisect_left(self.keys, value))
+
+
+class PathIndex(object):
+    """
+    Index of the values found at one fact path.
+
+    :param list ids: The ids of the nodes with a value at the path
+    :param list values: The value found on each of those nodes
+    :param int dense: Sets of at least this many nodes are stored as bitsets
+    """
+    def __init__(self, ids, values, dense):
+        super(PathIndex, self).__init__()
+
+        groups = {}
+        numbers = []
+        strings = []
+        for i, value in zip(ids, values):
+            key = _key(value)
+            if key in groups:
+                groups[key].append(i)
+            else:
+                groups[key] = [i]
+            if key[0] == 'number':
+                numbers.append((value, i))
+            elif key[0] == 'string':
+                strings.append((value, i))
+
+        def store(ids):
+            return _bits(ids) if len(ids) >= dense else tuple(ids)
+
+        #: The nodes with a value at the path.
+        self.nodes = store(ids)
+        #: The nodes with each value, by the key of the value.
+        self.values = dict((k, store(v)) for k, v in groups.items())
+        #: Sorted numeric values, if there are any.
+        self.numbers = SortedColumn(numbers) if numbers else None
+        #: Sorted string values, if there are any.
+        self.strings = SortedColumn(strings) if strings else None
+
+    def match(self, op, value):
+        """
+        Find the nodes with a value at the path that matches a comparison.
+
+        :param str op: The PuppetDB operator (``=``, ``~``, ``<``, ``<=``,
+            ``>``, ``>=`` or ``in``)
+        :param value: The value compared against (an ``array`` expression for
+            ``in``)
+        :return: Bitset of the matching nodes, or `None` if the operator is
+            not supported
+        :raises ValueError: If a regular expression is not a string
+        """
+        if op == '=':
+            return _as_bits(self.values.get(_key(value), 0))
+        elif op == 'in':
+            return self._union(self.values.get(_key(x), 0) for x in value[1])
+        elif op == '~':
+            regexp = _regexp(value)
+            return self._union(
+                nodes for key, nodes in self.values.items()
+                if key[0] == 'string' and regexp.search(key[1]))
+        elif op in ('<', '<=', '>', '>='):
+            if _is_number(value):
+                column = self.numbers
+            elif isinstance(value, str):
+                column = self.strings
+            else:
+                column = None
+            return column.range(op, value) if column else 0
+        return None
+
+    def _union(self, sets):
+        # The ids of sparse sets are gathered up to build a single bitset
+        # from, rather than one for each of them
+        ret = 0
+        ids = []
+        for nodes in sets:
+            if isinstance(nodes, tuple):
+                ids.extend(nodes)
+            else:
+                ret |= nodes
+        return ret | _bits(ids)
+
+
+class FactIndex(object):
+    """
+    Indexes over a snapshot of the facts of a set of nodes.
+
+    Each node is given an id, its position in :attr:`names`. The leaves of
+    the (structured) facts are indexed by their path in :attr:`paths`, and
+    the paths are arranged in a trie in :attr:`trie` so that those matching
+    regular expressions (including ``*`` components) can be found without
+    going through all of them.
+
+    :param dict facts: The facts of each node, as for
+        :class:`pypuppetdbquery.local.LocalEvaluator`
+    """
+    def __init__(self, facts):
+        super(FactIndex, self).__init__()
+
+        #: Names of the nodes, by node id.
+        self.names = sorted(facts)
+        #: Ids of the nodes, by name.
+        self.ids = dict((name, i) for i, name in enumerate(self.names))
+        #: Bitset of all the nodes.
+        self.all = (1 << len(self.names)) - 1
+
+        leaves = {}
+        for i, name in enumerate(self.names):
+            for fact, value in facts[name].items():
+                for path, leaf in _contents(fact, value):
+                    try:
+                        entry = leaves[path]
+                    except KeyError:
+                        entry = leaves[path] = ([], [])
+                    entry[0].append(i)
+                    entry[1].append(leaf)
+
+        dense = max(64, len(self.names) // 256)
+        #: :class:`PathIndex` of each fact path, as a tuple of its components.
+        self.paths = dict((path, PathIndex(ids, values, dense))
+                          for path, (ids, values) in leaves.items())
+
+        #: Trie of the fact paths: a :class:`dict` of each first component
+        #: of the paths to a trie of the rest of them.
+        self.trie = {}
+        for path in self.paths:
+            node = self.trie
+            for component in path:
+                node = node.setdefault(component, {})
+            node[_PATH] = path
+
+    def bits(self, names):
+        """
+        Build the bitset of the nodes with the given names.
+
+        Names that are not in the snapshot are ignored.
+
+        :param Iterable names: The node names
+        :rtype: int
+        """
+        ids = self.ids
+        return _bits(ids[x] for x in names if x in ids)
+
+    def node_names(self, bits):
+        """
+        List the names of the nodes in a bitset.
+
+        :param int bits: The bitset
+        :rtype: list
+        """
+        names = self.names
+        return [names[m.start()]
+                for m in re.finditer('1', bin(bits)[:1:-1])]
+
+    def match_paths(self, regexps):
+        """
+        Find the fact paths matching a ``~>`` path expression: paths with as
+        many components as there are regular expressions, with each
+        component matching its regular expression.
+
+        :param list regexps: Compiled regular expressions
+        :return: The matching paths
+        :rtype: list
+        """
+        level = [self.trie]
+        for regexp in regexps:
+            level = [child for node in level
+                     for component, child in node.items()
+                     if component is not _PATH and
+                     regexp.search(str(component))]
+        return [node[_PATH] for node in level if _PATH in node]
+
+
+class IndexEvaluator(LocalEvaluator):
+    """
+    Evaluates a :mod:`pypuppetdbquery.ast` Abstract Syntax Tree against a
+    snapshot of facts using a :class:`FactIndex`, with the same results as
+    :class:`pypuppetdbquery.local.LocalEvaluator`.
+
+    Comparisons on fact paths are answered from the indexes, and the
+    expressions combining them by operations on bitsets. Anything else (such
+    as subqueries) is evaluated by scanning the snapshot as
+    :class:`pypuppetdbquery.local.LocalEvaluator` does.
+
+    :param dict facts: The facts of each node, as for
+        :class:`pypuppetdbquery.local.LocalEvaluator`
+    :param FactIndex index: The index of `facts`, if already built
+    """
+    def __init__(self, facts, index=None):
+        super(IndexEvaluator, self).__init__(facts)
+        self.index = index if index is not None else FactIndex(facts)
+
+    def evaluate_bits(self, ast):
+        """
+        Find the nodes matching a parsed PuppetDBQuery AST, returning them
+        as a bitset of node ids. This saves converting them to names, such as
+        when only the number of nodes is needed.
+
+        :param pypuppetdbquery.ast.Query ast: Root of the AST to evaluate
+        :return: Bitset of the ids of the matching nodes (see
+            :meth:`FactIndex.node_names`)
+        :rtype: int
+        """
+        _check_regexps(ast)
+        return self._visit(ast, ['nodes'])
+
+    def _all_nodes(self):
+        return self.index.all
+
+    def _complement(self, nodes):
+        return self.index.all & ~nodes
+
+    def _node_set(self, names):
+        return self.index.bits(names)
+
+    def _names(self, nodes):
+        return frozenset(self.index.node_names(nodes))
+
+    def _select(self, endpoint, query):
+        if endpoint == 'fact_contents':
+            ret = self._lookup(query)
+            if ret is not None:
+                return ret
+        elif endpoint == 'nodes' and query[:2] == ['~', 'certname']:
+            regexp = re.compile(query[2])
+            return _bits(i for i, name in enumerate(self.index.names)
+                         if regexp.search(name))
+
+        # Anything else is answered by scanning the rows
+        return self.index.bits(
+            super(IndexEvaluator, self)._select(endpoint, query))
+
+    def _lookup(self, query):
+        # Answers a fact-contents query made by Evaluator for a comparison on
+        # a fact path from the index, or returns None if it cannot
+        if not (len(query) == 3 and query[0] == 'and' and
+                query[1][1] == 'path'):
+            return None
+
+        path_op, _, path = query[1]
+        if path_op == '=':
+            paths = [tuple(path)]
+        elif path_op == '~>':
+            paths = self.index.match_paths([_regexp(x) for x in path])
+        else:
+            return None
+
+        term = query[2]
+        negate = term[0] == 'not'
+        if negate:
+            term = term[1]
+        if term[1] != 'value':
+            return None
+        if term[0] == '~':
+            # Checked even when no path matches, as LocalEvaluator does
+            _regexp(term[2])
+
+        ret = 0
+        for path in paths:
+            column = self.index.paths.get(path)
+            if column is None:
+                continue
+            nodes = column.match(term[0], term[2])
+            if nodes is None:
+                return None
+            if negate:
+                # Each node has a single value at the path
+                nodes = _as_bits(column.nodes) & ~nodes
+            ret |= nodes
+        return ret
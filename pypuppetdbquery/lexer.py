@@ -15,10 +15,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import re
+from collections import namedtuple
+
 import ply.lex as lex
 
 
-class LexException(Exception):
+class _DetailedException(Exception):
+    """
+    Base for exceptions holding a detail, such as a position, beside their
+    message. The detail is kept when the exception is pickled, such as to
+    return it from another process.
+    """
+    #: Name of the attribute holding the detail
+    _detail = None
+
+    def __reduce__(self):
+        return (type(self), (str(self), getattr(self, self._detail)))
+
+
+class LexException(_DetailedException):
     """
     Raised for errors encountered during lexing.
 
@@ -26,11 +42,35 @@ class LexException(Exception):
     position of the lexer when the error was encountered (the index into the
     input string) is stored in the `position` attribute.
     """
+    _detail = 'position'
+
     def __init__(self, message, position):
         super(LexException, self).__init__(message)
         self.position = position
 
 
+def _check_length(s, max_length):
+    if max_length is not None and len(s) > max_length:
+        msg = 'Input is too long ({0} characters, limit {1})'.format(
+            len(s), max_length)
+        raise LexException(msg, max_length)
+
+
+def _too_many_tokens(max_tokens, position):
+    msg = 'Too many tokens (limit {0})'.format(max_tokens)
+    return LexException(msg, position)
+
+
+def _is_terminated(value):
+    # Check that a quoted string (including its opening quote) ends with a
+    # closing quote, which must not be escaped by an odd number of
+    # backslashes before it.
+    if len(value) < 2 or value[-1] != value[0]:
+        return False
+    body = value[1:-1]
+    return (len(body) - len(body.rstrip('\\'))) % 2 == 0
+
+
 class Lexer(object):
     """
     Lexer for the PuppetDBQuery language.
@@ -39,16 +79,23 @@ class Lexer(object):
     It is used by :class:`pypuppetdbquery.parser.Parser` in order to process
     queries.
 
-    The arguments to the constructor are passed directly to
-    :func:`ply.lex.lex`.
+    Apart from the limits below, the arguments to the constructor are passed
+    directly to :func:`ply.lex.lex`.
+
+    :param int max_length: Reject inputs longer than this many characters
+    :param int max_tokens: Reject inputs that contain more than this many
+       tokens
 
     .. note:: Many of the docstrings in this class are used by
        :mod:`ply.lex` to build the lexer. These strings are not particularly
        useful for generating documentation from, so the built documentation for
        this class may not be very useful.
     """
-    def __init__(self, **kwargs):
+    def __init__(self, max_length=None, max_tokens=None, **kwargs):
         super(Lexer, self).__init__()
+        self.max_length = max_length
+        self.max_tokens = max_tokens
+        self._count = 0
         self.lexer = lex.lex(object=self, **kwargs)
 
     def input(self, s):
@@ -57,14 +104,26 @@ class Lexer(object):
 
         Tokens then need to be obtained using :meth:`token` or the iterator
         interface provided by this class.
+
+        :raises LexException: If the input is longer than `max_length`
         """
+        _check_length(s, self.max_length)
+        self._count = 0
         self.lexer.input(s)
 
     def token(self):
         """
         Obtain one token from the input.
+
+        :raises LexException: If the input contains an illegal character or
+           more than `max_tokens` tokens
         """
-        return self.lexer.token()
+        t = self.lexer.token()
+        if t is not None and self.max_tokens is not None:
+            self._count += 1
+            if self._count > self.max_tokens:
+                raise _too_many_tokens(self.max_tokens, t.lexpos)
+        return t
 
     def __iter__(self):
         return self
@@ -111,6 +170,9 @@ class Lexer(object):
         'FLOAT',
         'EXPORTED',
         'AT',
+        'PLACEHOLDER',
+        'IN',
+        'COMMA',
     )
 
     # Regular expression rules for simple tokens
@@ -133,14 +195,47 @@ class Lexer(object):
     t_DOT = r'\.'
     t_EXPORTED = r'@@'
     t_AT = r'@'
+    t_COMMA = r','
+
+    # Quoted strings. These rules make the closing quote optional so that
+    # their regexes match in a single pass and never need to backtrack,
+    # however long the string and whether or not it is terminated. The rules
+    # check for the closing quote themselves and report the opening one as an
+    # illegal character if there isn't one, just as if nothing had matched.
+    #
+    # They are defined first, and so tried first, because the regex engine
+    # works harder on each repetition within a rule the more capture groups
+    # precede it in the master regex ply builds; no other rule can match a
+    # quote, so the order does not otherwise matter.
+    def t_STRING_double_quoted(self, t):
+        r'"[^"\\]*(?:\\.[^"\\]*)*"?'
+        if not _is_terminated(t.value):
+            self.t_error(t)
+        t.type = 'STRING'
+        # This is a double-quoted string. The regex handles most of what we
+        # need but we must strip off the quote characters around the string.
+        t.value = t.value[1:-1]
+        return t
+
+    def t_STRING_single_quoted(self, t):
+        r"'[^'\\]*(?:\\.[^'\\]*)*'?"
+        if not _is_terminated(t.value):
+            self.t_error(t)
+        t.type = 'STRING'
+        # This is a single-quoted string. The regex handles most of what we
+        # need but we must strip off the quote characters around the string.
+        t.value = t.value[1:-1]
+        return t
 
     # Keywords
     def t_keyword(self, t):
-        r'not|and|or'
+        r'not|and|or|in(?=\s*\[)'
         # Tokens defined by fuctions are added before regular expression tokens
         # so we must define a function to handle our keywords else they will be
         # lexed as bareword strings. The type here is just the uppercase
-        # version of the token value.
+        # version of the token value. Unlike the others, `in` is only a
+        # keyword right before the `[` of a list, so that it can still be
+        # used as a string (such as `country=in`) or start one (`interfaces`).
         t.type = t.value.upper()
         return t
 
@@ -162,9 +257,9 @@ class Lexer(object):
         t.value = int(t.value)
         return t
 
-    # The next three functions handle string parsing, because there are three
-    # slightly different syntaxes for strings (which are handled the same way
-    # in the parser).
+    # Bareword strings. Together with the quoted strings above, there are
+    # three slightly different syntaxes for strings (which are handled the
+    # same way in the parser).
     def t_STRING_bareword(self, t):
         r'[-\w_:]+'
         t.type = 'STRING'
@@ -172,20 +267,11 @@ class Lexer(object):
         # unchanged.
         return t
 
-    def t_STRING_double_quoted(self, t):
-        r'"(\\.|[^\\"])*"'
-        t.type = 'STRING'
-        # This is a double-quoted string. The regex handles most of what we
-        # need but we must strip off the quote characters around the string.
-        t.value = t.value[1:-1]
-        return t
-
-    def t_STRING_single_quoted(self, t):
-        r"'(\\.|[^\\'])*'"
-        t.type = 'STRING'
-        # This is a single-quoted string. The regex handles most of what we
-        # need but we must strip off the quote characters around the string.
-        t.value = t.value[1:-1]
+    # Placeholders for values bound later (see pypuppetdbquery.prepare)
+    def t_PLACEHOLDER(self, t):
+        r'\$[^\W\d]\w*'
+        # The value is the name of the placeholder, without the dollar sign
+        t.value = t.value[1:]
         return t
 
     # A string containing ignored characters
@@ -195,3 +281,249 @@ class Lexer(object):
     def t_error(self, t):
         msg = "Illegal character '{0}'".format(t.value[0])
         raise LexException(msg, t.lexpos)
+
+
+class Token(namedtuple('Token', ['type', 'value', 'lineno', 'lexpos'])):
+    """
+    A token produced by :class:`Tokenizer`.
+
+    This is a plain tuple with the same attributes as the
+    :class:`ply.lex.LexToken` objects produced by :class:`Lexer`, so it can be
+    consumed by :mod:`ply.yacc` as well as by other parsers.
+    """
+    __slots__ = ()
+
+    #: :mod:`ply.yacc` tries to attach the lexer to a token that causes a
+    #: syntax error unless the token already has this attribute.
+    lexer = None
+
+
+class Tokenizer(object):
+    """
+    Single-pass tokenizer for the PuppetDBQuery language.
+
+    This is a faster alternative to :class:`Lexer`. It produces exactly the
+    same tokens, but as lightweight :class:`Token` tuples instead of
+    :class:`ply.lex.LexToken` objects, and it does not call a method per
+    token. Punctuation is looked up in a table, quoted strings are scanned
+    in linear time and everything else is matched by one compiled regular
+    expression.
+
+    It provides the same interface as :class:`Lexer` and raises
+    :exc:`LexException` at the same positions, so it can be used with
+    :class:`pypuppetdbquery.parser.Parser` as well as
+    :class:`pypuppetdbquery.pratt.PrattParser`. The whole input is tokenized
+    by :meth:`input`, but an error is only raised by :meth:`token` once the
+    tokens before it have been consumed, just as :class:`Lexer` would.
+
+    :param int max_length: Reject inputs longer than this many characters
+    :param int max_tokens: Reject inputs that contain more than this many
+       tokens
+
+    Other keyword arguments are accepted for compatibility with
+    :class:`Lexer` but are otherwise ignored.
+    """
+
+    #: List of token names handled by the tokenizer.
+    tokens = Lexer.tokens
+
+    #: Characters that are skipped between tokens.
+    IGNORE = frozenset(Lexer.t_ignore)
+
+    #: Two-character punctuation tokens, which take precedence over the
+    #: one-character tokens that are their prefixes.
+    PUNCTUATION2 = {
+        '!=': 'NOTEQUALS',
+        '!~': 'NOTMATCH',
+        '<=': 'LESSTHANEQ',
+        '>=': 'GREATERTHANEQ',
+        '@@': 'EXPORTED',
+    }
+
+    #: One-character punctuation tokens.
+    PUNCTUATION = {
+        '(': 'LPAREN',
+        ')': 'RPAREN',
+        '[': 'LBRACK',
+        ']': 'RBRACK',
+        '{': 'LBRACE',
+        '}': 'RBRACE',
+        '=': 'EQUALS',
+        '~': 'MATCH',
+        '<': 'LESSTHAN',
+        '>': 'GREATERTHAN',
+        '*': 'ASTERISK',
+        '#': 'HASH',
+        '.': 'DOT',
+        '@': 'AT',
+        ',': 'COMMA',
+    }
+
+    #: Regular expression for the other unquoted tokens. The alternatives are
+    #: the function rules of :class:`Lexer`, in the same order, so the index
+    #: of the group that matched identifies the rule.
+    WORD_RE = re.compile(r"""
+          (not|and|or|in(?=\s*\[))  # 1: keywords
+        | (true|false)              # 2: booleans
+        | (-?\d+\.\d+)              # 3: floats
+        | (-?\d+)                   # 4: integers
+        | ([-\w_:]+)                # 5: bareword strings
+        | \$([^\W\d]\w*)            # 6: placeholders
+        """, re.VERBOSE)
+
+    #: Regular expressions for the contents of quoted strings, keyed by the
+    #: quote character. These always match, without backtracking, up to the
+    #: closing quote or to where the string turns out to be unterminated.
+    QUOTED_RE = {
+        '"': re.compile(r'[^"\\]*(?:\\.[^"\\]*)*'),
+        "'": re.compile(r"[^'\\]*(?:\\.[^'\\]*)*"),
+    }
+
+    def __init__(self, max_length=None, max_tokens=None, **kwargs):
+        super(Tokenizer, self).__init__()
+        self.max_length = max_length
+        self.max_tokens = max_tokens
+        self._tokens = []
+        self._error = None
+        self._pos = 0
+
+    def input(self, s):
+        """
+        Reset and supply input to the tokenizer.
+
+        Tokens then need to be obtained using :meth:`token` or the iterator
+        interface provided by this class.
+
+        :raises LexException: If the input is longer than `max_length`
+        """
+        _check_length(s, self.max_length)
+        self._tokens, self._error = self._scan(s)
+        self._pos = 0
+
+    def token(self):
+        """
+        Obtain one token from the input.
+
+        :return: The next token, or `None` at the end of the input
+        :rtype: Token
+        :raises LexException: If the input contains an illegal character or
+           more than `max_tokens` tokens
+        """
+        pos = self._pos
+        if pos < len(self._tokens):
+            self._pos = pos + 1
+            return self._tokens[pos]
+        elif self._error:
+            raise self._error
+        return None
+
+    def __iter__(self):
+        tokens = self._tokens
+        while self._pos < len(tokens):
+            self._pos += 1
+            yield tokens[self._pos - 1]
+        if self._error:
+            raise self._error
+
+    def _scan(self, text):
+        # Returns the list of tokens up to the first error, and the error.
+        tokens = []
+        append = tokens.append
+        new = tuple.__new__
+        ignore = self.IGNORE
+        punctuation = self.PUNCTUATION
+        punctuation2 = self.PUNCTUATION2
+        quoted = self.QUOTED_RE
+        word = self.WORD_RE.match
+        limit = -1 if self.max_tokens is None else self.max_tokens
+
+        pos = 0
+        end = len(text)
+        while pos < end:
+            c = text[pos]
+            if c in ignore:
+                pos += 1
+                continue
+
+            value = text[pos:pos + 2]
+            type = punctuation2.get(value)
+            if type is None:
+                value = c
+                type = punctuation.get(c)
+
+            if type is not None:
+                nxt = pos + len(value)
+            elif c in quoted:
+                close = quoted[c].match(text, pos + 1).end()
+                if close == end or text[close] != c:
+                    return tokens, self._illegal(c, pos)
+                type = 'STRING'
+                value = text[pos + 1:close]
+                nxt = close + 1
+            else:
+                m = word(text, pos)
+                if m is None:
+                    return tokens, self._illegal(c, pos)
+
+                rule = m.lastindex
+                value = m.group(rule)
+                if rule == 1:
+                    type = value.upper()
+                elif rule == 2:
+                    type = 'BOOLEAN'
+                    value = (value == 'true')
+                elif rule == 3:
+                    type = 'FLOAT'
+                    value = float(value)
+                elif rule == 4:
+                    type = 'NUMBER'
+                    value = int(value)
+                elif rule == 6:
+                    type = 'PLACEHOLDER'
+                else:
+                    type = 'STRING'
+                nxt = m.end()
+
+            if len(tokens) == limit:
+                return tokens, _too_many_tokens(limit, pos)
+            append(new(Token, (type, value, 1, pos)))
+            pos = nxt
+
+        return tokens, None
+
+    def _illegal(self, c, pos):
+        msg = "Illegal character '{0}'".format(c)
+        return LexException(msg, pos)
+
+
+#: Regular expression matching the text of a NUMBER or FLOAT token.
+NUMBER_RE = re.compile('{0}|{1}'.format(
+    Lexer.t_FLOAT.__doc__, Lexer.t_NUMBER.__doc__))
+
+
+def number_text(s, position):
+    """
+    Return a NUMBER or FLOAT token as written in the input, such as where it
+    is part of a name and the formatting of its value (like ``007`` or
+    ``1.50``) matters.
+
+    :param str s: The input
+    :param int position: Position of the token in the input
+    :rtype: str
+    """
+    return NUMBER_RE.match(s, position).group()
+
+
+def tokenize(s):
+    """
+    Tokenize a query in one go using :class:`Tokenizer`.
+
+    :param str s: The query to tokenize
+    :return: All the tokens in the query
+    :rtype: list of :class:`Token`
+    :raises LexException: If the query contains an illegal character
+    """
+    tokens, error = Tokenizer()._scan(s)
+    if error:
+        raise error
+    return tokens
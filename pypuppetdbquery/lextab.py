@@ -0,0 +1,11 @@
+# lextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('AND', 'ASTERISK', 'AT', 'BOOLEAN', 'COMMA', 'DOT', 'EQUALS', 'EXPORTED', 'FLOAT', 'GREATERTHAN', 'GREATERTHANEQ', 'HASH', 'IN', 'LBRACE', 'LBRACK', 'LESSTHAN', 'LESSTHANEQ', 'LPAREN', 'MATCH', 'NOT', 'NOTEQUALS', 'NOTMATCH', 'NUMBER', 'OR', 'PLACEHOLDER', 'RBRACE', 'RBRACK', 'RPAREN', 'STRING'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_STRING_double_quoted>"[^"\\\\]*(?:\\\\.[^"\\\\]*)*"?)|(?P<t_STRING_single_quoted>\'[^\'\\\\]*(?:\\\\.[^\'\\\\]*)*\'?)|(?P<t_keyword>not|and|or|in(?=\\s*\\[))|(?P<t_BOOLEAN>true|false)|(?P<t_FLOAT>-?\\d+\\.\\d+)|(?P<t_NUMBER>-?\\d+)|(?P<t_STRING_bareword>[-\\w_:]+)|(?P<t_PLACEHOLDER>\\$[^\\W\\d]\\w*)|(?P<t_HASH>[#])|(?P<t_ASTERISK>\\*)|(?P<t_DOT>\\.)|(?P<t_EXPORTED>@@)|(?P<t_GREATERTHANEQ>>=)|(?P<t_LBRACK>\\[)|(?P<t_LESSTHANEQ><=)|(?P<t_LPAREN>\\()|(?P<t_NOTEQUALS>!=)|(?P<t_NOTMATCH>!~)|(?P<t_RBRACK>\\])|(?P<t_RPAREN>\\))|(?P<t_AT>@)|(?P<t_COMMA>,)|(?P<t_EQUALS>=)|(?P<t_GREATERTHAN>>)|(?P<t_LBRACE>{)|(?P<t_LESSTHAN><)|(?P<t_MATCH>~)|(?P<t_RBRACE>})', [None, ('t_STRING_double_quoted', 'STRING_double_quoted'), ('t_STRING_single_quoted', 'STRING_single_quoted'), ('t_keyword', 'keyword'), ('t_BOOLEAN', 'BOOLEAN'), ('t_FLOAT', 'FLOAT'), ('t_NUMBER', 'NUMBER'), ('t_STRING_bareword', 'STRING_bareword'), ('t_PLACEHOLDER', 'PLACEHOLDER'), (None, 'HASH'), (None, 'ASTERISK'), (None, 'DOT'), (None, 'EXPORTED'), (None, 'GREATERTHANEQ'), (None, 'LBRACK'), (None, 'LESSTHANEQ'), (None, 'LPAREN'), (None, 'NOTEQUALS'), (None, 'NOTMATCH'), (None, 'RBRACK'), (None, 'RPAREN'), (None, 'AT'), (None, 'COMMA'), (None, 'EQUALS'), (None, 'GREATERTHAN'), (None, 'LBRACE'), (None, 'LESSTHAN'), (None, 'MATCH'), (None, 'RBRACE')])]}
+_lexstateignore = {'INITIAL': ' \t\n\r\x0c\x0b'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
+_signature    = '16fe2185a62d8796af7914d204fa2255cd7970df'
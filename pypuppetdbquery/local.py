@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Evaluation of queries against a snapshot of facts held in memory, without a
+round trip to PuppetDB.
+"""
+
+import json
+import re
+
+from . import ast
+from .evaluator import Evaluator
+
+#: Fields of the rows of each endpoint that can be queried in a snapshot.
+ENDPOINT_FIELDS = {
+    'nodes': ('certname',),
+    'facts': ('certname', 'name', 'value'),
+    'fact_contents': ('certname', 'name', 'path', 'value'),
+}
+
+
+def _key(value):
+    # Values are only equal if they are of the same JSON type, so that true
+    # does not equal 1 as it would in Python
+    if isinstance(value, bool):
+        return ('boolean', value)
+    elif isinstance(value, (int, float)):
+        return ('number', value)
+    elif isinstance(value, str):
+        return ('string', value)
+    elif value is None:
+        return ('null', None)
+    return ('json', json.dumps(value, sort_keys=True))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _ordered(left, right):
+    # Numbers are compared with numbers and strings (such as timestamps) with
+    # strings; anything else never matches an inequality
+    if _is_number(left):
+        return _is_number(right)
+    return isinstance(left, str) and isinstance(right, str)
+
+
+def _regexp(value):
+    # As in PuppetDB, regular expressions must be strings (a query such as
+    # "role~1" gives a number)
+    if not isinstance(value, str):
+        raise ValueError(
+            'Regular expression is not a string: {0!r}'.format(value))
+    return re.compile(value)
+
+
+def _check_regexps(tree):
+    # Evaluating an "and" stops at the first operand that matches no nodes,
+    # so the regular expressions in a query are checked before it is
+    # evaluated, for it to be rejected whatever the facts are
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Node):
+            if (type(node) is ast.Comparison and
+                    node.operator in ('~', '!~') and
+                    type(node.right) is ast.Literal):
+                _regexp(node.right.value)
+            stack.extend(node._values())
+        elif isinstance(node, tuple):
+            stack.extend(node)
+
+
+def _contents(name, value):
+    # Yields the path and value of each leaf of a structured fact, as the
+    # fact-contents endpoint does; array indexes are integers
+    stack = [((name,), value)]
+    while stack:
+        path, value = stack.pop()
+        if isinstance(value, dict):
+            items = value.items()
+        elif isinstance(value, list):
+            items = enumerate(value)
+        else:
+            yield path, value
+            continue
+        for key, child in reversed(list(items)):
+            stack.append((path + (key,), child))
+
+
+class LocalEvaluator(Evaluator):
+    """
+    Evaluates a :mod:`pypuppetdbquery.ast` Abstract Syntax Tree against a
+    snapshot of the facts of a set of nodes, and returns the names of the
+    nodes that match.
+
+    The ``and``, ``or`` and ``not`` expressions of the query are evaluated as
+    operations on sets of node names. Each comparison is converted into the
+    same PuppetDB AST as :class:`pypuppetdbquery.evaluator.Evaluator` would
+    produce, which is then matched against the rows PuppetDB would hold for
+    the snapshot, so that fact paths (including regular expression
+    components), comparisons and node name matches behave as they would in
+    PuppetDB:
+
+    * ``=`` only matches values of the same JSON type, so ``true`` does not
+      equal ``1``
+    * ``~`` only matches string values, searching them for the regular
+      expression
+    * ``<``, ``<=``, ``>`` and ``>=`` compare numbers with numbers and
+      strings (such as timestamps) with strings
+
+    Subqueries may be made against the ``node``, ``fact`` and
+    ``fact_content`` endpoints (see :data:`ENDPOINT_FIELDS` for their
+    fields). Resources are not part of a snapshot of facts, so queries on
+    them raise :class:`ValueError`, as do regular expressions that are not
+    strings (such as in ``role~1``), which PuppetDB rejects.
+
+    :param dict facts: The facts of each node, as a :class:`dict` of node
+        names to :class:`dict` of fact names to (structured) fact values
+    """
+    def __init__(self, facts):
+        super(LocalEvaluator, self).__init__()
+        self.facts = facts
+        self._nodes = frozenset(facts)
+        self._rows = {}
+
+    def evaluate(self, ast, mode='nodes'):
+        """
+        Find the nodes matching a parsed PuppetDBQuery AST.
+
+        :param pypuppetdbquery.ast.Query ast: Root of the AST to evaluate
+        :param str mode: Must be ``nodes``; the other PuppetDB endpoints are
+            not supported
+        :return: The names of the matching nodes
+        :rtype: frozenset
+        """
+        if mode != 'nodes':
+            raise ValueError(
+                'Unsupported mode for local evaluation: {0}'.format(mode))
+        _check_regexps(ast)
+        return self._names(self._visit(ast, ['nodes']))
+
+    # The sets of nodes that expressions evaluate to are only handled by the
+    # methods below, and the & and | operators, so that subclasses can
+    # represent them differently.
+
+    def _all_nodes(self):
+        return self._nodes
+
+    def _complement(self, nodes):
+        return self._nodes - nodes
+
+    def _node_set(self, names):
+        return self._nodes.intersection(names)
+
+    def _names(self, nodes):
+        return nodes
+
+    def _subquery(self, from_mode, to_mode, query):
+        nodes = self._select(to_mode, query)
+        if from_mode == 'nodes':
+            return nodes
+
+        # Within another subquery, match its rows by node name
+        return ['in', 'certname', ['array', self._names(nodes)]]
+
+    def _visit_query(self, node, path):
+        if node.expression is None:
+            return self._all_nodes()
+        return self._visit(node.expression, path)
+
+    def _visit_binary_expression(self, node, path):
+        if path[-1] != 'nodes':
+            return super(LocalEvaluator, self)._visit_binary_expression(
+                node, path)
+
+        op, operands = self._chain(node, self._visitor(type(node)))
+        ret = self._visit(operands[0], path)
+        for operand in operands[1:]:
+            if op == 'and':
+                if not ret:
+                    break
+                ret = ret & self._visit(operand, path)
+            else:
+                ret = ret | self._visit(operand, path)
+        return ret
+
+    def _visit_not_expression(self, node, path):
+        if path[-1] != 'nodes':
+            return super(LocalEvaluator, self)._visit_not_expression(
+                node, path)
+        return self._complement(self._visit(node.expression, path))
+
+    def _visit_node_list(self, node, path):
+        if path[-1] != 'nodes':
+            return super(LocalEvaluator, self)._visit_node_list(node, path)
+        return self._node_set(node.names)
+
+    def _visit_regexp_node_match(self, node, path):
+        query = super(LocalEvaluator, self)._visit_regexp_node_match(
+            node, path)
+        if path[-1] != 'nodes':
+            return query
+        return self._select('nodes', query)
+
+    def _select(self, endpoint, query):
+        # Returns the names of the nodes with any row of the endpoint that
+        # matches the query, as a select_<endpoint> subquery would
+        rows = self._endpoint_rows(endpoint)
+        fields = ENDPOINT_FIELDS[endpoint]
+        match = self._prepare(query, fields)
+
+        ret = set()
+        for certname, node_rows in rows:
+            for row in node_rows:
+                if self._match(match, row):
+                    ret.add(certname)
+                    break
+        return frozenset(ret)
+
+    def _endpoint_rows(self, endpoint):
+        # The rows of each endpoint are built the first time it is queried,
+        # as tuples of the values of its fields
+        try:
+            return self._rows[endpoint]
+        except KeyError:
+            pass
+
+        if endpoint == 'nodes':
+            rows = [(certname, [(certname,)]) for certname in self.facts]
+        elif endpoint == 'facts':
+            rows = [(certname, [(certname, name, value)
+                                for name, value in facts.items()])
+                    for certname, facts in self.facts.items()]
+        elif endpoint == 'fact_contents':
+            rows = [(certname, [(certname, name, path, value)
+                                for name, value in facts.items()
+                                for path, value in _contents(name, value)])
+                    for certname, facts in self.facts.items()]
+        else:
+            raise ValueError(
+                'Cannot evaluate queries on {0} locally'.format(endpoint))
+
+        self._rows[endpoint] = rows
+        return rows
+
+    def _prepare(self, query, fields):
+        # Converts a PuppetDB AST into tuples of an operator and its
+        # operands, with field names replaced by their index in the rows
+        # (None for fields that the endpoint does not have), regular
+        # expressions compiled and the members of arrays turned into sets
+        op = query[0]
+        if op in ('and', 'or'):
+            return (op, [self._prepare(x, fields) for x in query[1:]])
+        elif op == 'not':
+            return (op, self._prepare(query[1], fields))
+
+        field = query[1]
+        if not isinstance(field, str):
+            raise ValueError(
+                'Cannot evaluate {0!r} locally'.format(field))
+        index = fields.index(field) if field in fields else None
+        value = query[2]
+
+        if op == '~':
+            value = _regexp(value)
+        elif op == '~>':
+            value = [_regexp(x) for x in value]
+        elif op == 'in':
+            value = frozenset(_key(x) for x in value[1])
+        elif op == '=':
+            value = _key(list(value) if field == 'path' else value)
+        return (op, index, value)
+
+    def _match(self, query, row):
+        op = query[0]
+        if op == 'and':
+            return all(self._match(x, row) for x in query[1])
+        elif op == 'or':
+            return any(self._match(x, row) for x in query[1])
+        elif op == 'not':
+            return not self._match(query[1], row)
+
+        _, index, value = query
+        if index is None:
+            return False
+
+        field = row[index]
+        if op == '=':
+            if isinstance(field, tuple):
+                field = list(field)
+            return _key(field) == value
+        elif op == 'in':
+            return _key(field) in value
+        elif op == '~':
+            return isinstance(field, str) and value.search(field) is not None
+        elif op == '~>':
+            return (isinstance(field, tuple) and len(field) == len(value) and
+                    all(x.search(str(y)) is not None
+                        for x, y in zip(value, field)))
+        elif not _ordered(field, value):
+            return False
+        elif op == '<':
+            return field < value
+        elif op == '<=':
+            return field <= value
+        elif op == '>':
+            return field > value
+        elif op == '>=':
+            return field >= value
+        raise ValueError('Cannot evaluate {0!r} locally'.format(op))
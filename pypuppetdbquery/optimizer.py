@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Rewrites of queries into equivalent queries that are cheaper for PuppetDB to
+run.
+
+:class:`Simplifier` works on the :mod:`pypuppetdbquery.ast` tree before it is
+evaluated. Generated queries often repeat the same terms, which would each
+become a separate subquery; it removes the duplicates from ``and`` and
+``or`` expressions (so ``a and a`` becomes just ``a``) and folds away double
+negations.
+
+:class:`Optimizer` works on the PuppetDB AST query produced by
+:class:`pypuppetdbquery.evaluator.Evaluator`. Every comparison on a fact,
+resource or node field is evaluated into its own subquery of the form::
+
+    ["in", "certname", ["extract", "certname", ["select_<endpoint>", ...]]]
+
+and each of these subqueries costs PuppetDB a separate scan of the endpoint.
+Subqueries on the same endpoint that are combined with ``or`` select the
+union of the nodes matched by each one, so they can be merged into a single
+subquery with an ``or`` of their conditions. Combined with ``and``, they can
+only be merged for endpoints with a single row per node, where all of the
+conditions are matched against the same row.
+"""
+
+from collections import namedtuple
+
+from . import ast
+
+#: Endpoints with a single row per node, so that subqueries combined with
+#: ``and`` can be merged.
+SINGLE_ROW_ENDPOINTS = frozenset(['select_nodes'])
+
+
+class Rewrite(namedtuple('Rewrite', ['rule', 'operator', 'endpoint',
+                                     'count'])):
+    """
+    Record of a rewrite made (or considered) by :class:`Simplifier` or
+    :class:`Optimizer`.
+
+    `rule` is one of:
+
+    ``deduplicated``
+        `count` duplicate operands of an `operator` expression were removed
+    ``folded``
+        `count` double negations were removed (`operator` is ``not``)
+    ``merged``
+        `count` subqueries on `endpoint` combined with `operator` were merged
+        into one
+    ``unmerged``
+        `count` subqueries on `endpoint` combined with `operator` had to be
+        kept apart
+
+    The string form of a rewrite explains it in words.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        if self.rule == 'deduplicated':
+            return "removed {0} duplicate operands of '{1}'".format(
+                self.count, self.operator)
+        elif self.rule == 'folded':
+            return 'folded {0} double negations'.format(self.count)
+        elif self.rule == 'merged':
+            return "merged {0} {1} subqueries under '{2}'".format(
+                self.count, self.endpoint, self.operator)
+        return ("kept {0} {1} subqueries under '{2}' apart, as they must "
+                "match different rows".format(
+                    self.count, self.endpoint, self.operator))
+
+
+class Simplifier(object):
+    """
+    Removes duplicate operands of ``and`` and ``or`` expressions and double
+    negations from a :mod:`pypuppetdbquery.ast` tree.
+
+    Duplicates are found using the structural equality of AST nodes, after
+    removing any parentheses from the tree (they make no difference to the
+    query once it is parsed). The rewrites made by the last call to
+    :meth:`simplify` are listed in :attr:`rewrites`.
+    """
+
+    #: Operator names of the boolean expression node types.
+    OPERATORS = {
+        ast.AndExpression: 'and',
+        ast.OrExpression: 'or',
+    }
+
+    def __init__(self):
+        super(Simplifier, self).__init__()
+
+        #: List of :class:`Rewrite` records from the last call to
+        #: :meth:`simplify`.
+        self.rewrites = []
+
+        # Operands of the chains built by the current call to simplify(), by
+        # the id of the node at the top of the chain
+        self._chains = {}
+
+    def simplify(self, tree):
+        """
+        Simplify an AST.
+
+        :param pypuppetdbquery.ast.Node tree: The AST to simplify
+        :return: An equivalent AST
+        :rtype: pypuppetdbquery.ast.Node
+        """
+        self.rewrites = []
+        self._chains = {}
+        try:
+            return self._simplify(tree)
+        finally:
+            self._chains = {}
+
+    def _simplify(self, tree):
+        # Rebuild the tree from the bottom up using an explicit stack, as
+        # trees can be very deep. Each frame holds a node, an iterator over
+        # its children and the simplified children seen so far.
+        stack = [self._frame(tree)]
+        while True:
+            node, children, results = stack[-1]
+            for child in children:
+                if isinstance(child, (ast.Node, tuple)):
+                    stack.append(self._frame(child))
+                    break
+                results.append(child)
+            else:
+                stack.pop()
+                if type(node) in self.OPERATORS:
+                    result = self._build_chain(type(node), results)
+                elif isinstance(node, tuple):
+                    result = tuple(results)
+                else:
+                    result = self._build(type(node), results)
+
+                if not stack:
+                    return result
+                stack[-1][2].append(result)
+
+    def _frame(self, node):
+        if type(node) in self.OPERATORS:
+            return (node, iter(self._operands(node)), [])
+        elif isinstance(node, tuple):
+            return (node, iter(node), [])
+        return (node, iter(node._values()), [])
+
+    def _operands(self, node):
+        # Collect the operands of a chain of the same operator, looking
+        # through parentheses, in their original order
+        chain_type = type(node)
+        operands = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            while isinstance(node, ast.ParenthesizedExpression):
+                node = node.expression
+            if type(node) is chain_type:
+                stack.append(node.right)
+                stack.append(node.left)
+            else:
+                operands.append(node)
+        return operands
+
+    def _build(self, node_type, values):
+        if node_type is ast.ParenthesizedExpression:
+            return values[0]
+
+        if (node_type is ast.NotExpression and
+                type(values[0]) is ast.NotExpression):
+            self.rewrites.append(Rewrite('folded', 'not', None, 1))
+            return values[0].expression
+
+        return node_type(*values)
+
+    def _build_chain(self, chain_type, values):
+        # Splice in any operands that became chains of the same operator
+        # themselves once simplified (such as "not not (a and b)")
+        operands = []
+        for node in values:
+            chain = self._chains.get(id(node))
+            if (type(node) is chain_type and chain is not None and
+                    chain[0] is node):
+                operands.extend(chain[1])
+            else:
+                operands.append(node)
+
+        unique = []
+        seen = set()
+        for node in operands:
+            if node not in seen:
+                seen.add(node)
+                unique.append(node)
+
+        removed = len(operands) - len(unique)
+        if removed:
+            self.rewrites.append(Rewrite(
+                'deduplicated', self.OPERATORS[chain_type], None, removed))
+
+        if len(unique) == 1:
+            return unique[0]
+
+        node = unique[0]
+        for operand in unique[1:]:
+            node = chain_type(node, operand)
+        self._chains[id(node)] = (node, unique)
+        return node
+
+
+class Optimizer(object):
+    """
+    Merges subqueries in a PuppetDB AST query where it is safe to do so.
+
+    The rewrites made by the last call to :meth:`optimize` are listed in
+    :attr:`rewrites`, along with any subqueries that could not be merged.
+    """
+    def __init__(self):
+        super(Optimizer, self).__init__()
+
+        #: List of :class:`Rewrite` records from the last call to
+        #: :meth:`optimize`.
+        self.rewrites = []
+
+    def optimize(self, query):
+        """
+        Optimize a PuppetDB AST query.
+
+        The query given is not modified.
+
+        :param list query: The query to optimize
+        :return: An equivalent query
+        :rtype: list
+        """
+        self.rewrites = []
+        if not isinstance(query, list):
+            return query
+
+        # Rebuild the query from the bottom up, so that the operands of an
+        # operator are already merged when it is rewritten. An explicit stack
+        # is used because queries can be nested very deeply.
+        stack = [(iter(query), [])]
+        while True:
+            items, out = stack[-1]
+            for item in items:
+                if isinstance(item, list):
+                    stack.append((iter(item), []))
+                    break
+                out.append(item)
+            else:
+                stack.pop()
+                node = self._rewrite(out)
+                if not stack:
+                    return node
+                stack[-1][1].append(node)
+
+    def _rewrite(self, node):
+        if not node or node[0] not in ('and', 'or'):
+            return node
+
+        operator = node[0]
+
+        # Group the subqueries by endpoint, in order of first appearance
+        groups = {}
+        order = []
+        for operand in node[1:]:
+            endpoint = self._endpoint(operand)
+            if endpoint is None:
+                continue
+            if endpoint not in groups:
+                groups[endpoint] = []
+                order.append(endpoint)
+            groups[endpoint].append(operand)
+
+        merged = {}
+        for endpoint in order:
+            group = groups[endpoint]
+            if len(group) < 2:
+                continue
+
+            if operator == 'and' and endpoint not in SINGLE_ROW_ENDPOINTS:
+                self.rewrites.append(
+                    Rewrite('unmerged', operator, endpoint, len(group)))
+                continue
+
+            merged[endpoint] = self._merge(operator, endpoint, group)
+            self.rewrites.append(
+                Rewrite('merged', operator, endpoint, len(group)))
+
+        if not merged:
+            return node
+
+        # Replace each merged group by its first member
+        ret = [operator]
+        for operand in node[1:]:
+            endpoint = self._endpoint(operand)
+            if endpoint not in merged:
+                ret.append(operand)
+            elif merged[endpoint] is not None:
+                ret.append(merged[endpoint])
+                merged[endpoint] = None
+
+        if len(ret) == 2:
+            return ret[1]
+        return ret
+
+    def _merge(self, operator, endpoint, group):
+        # Every list here was built by optimize(), so the first subquery can
+        # be reused for the merged one. When its condition is already of the
+        # same operator (such as when chains are merged one level at a time)
+        # the other conditions are appended to it rather than copying it.
+        select = group[0][2][2]
+        conditions = select[1]
+        if not (isinstance(conditions, list) and
+                conditions[:1] == [operator]):
+            conditions = [operator, conditions]
+
+        for subquery in group[1:]:
+            condition = subquery[2][2][1]
+            if isinstance(condition, list) and condition[:1] == [operator]:
+                conditions.extend(condition[1:])
+            else:
+                conditions.append(condition)
+
+        select[1] = conditions
+        return group[0]
+
+    def _endpoint(self, node):
+        # Returns the endpoint of a node subquery (as created by
+        # Evaluator._subquery), or None for anything else
+        if not (isinstance(node, list) and len(node) == 3 and
+                node[0] == 'in' and node[1] == 'certname'):
+            return None
+
+        extract = node[2]
+        if not (isinstance(extract, list) and len(extract) == 3 and
+                extract[0] == 'extract' and extract[1] == 'certname'):
+            return None
+
+        select = extract[2]
+        if not (isinstance(select, list) and len(select) == 2 and
+                isinstance(select[0], str) and
+                select[0].startswith('select_')):
+            return None
+
+        return select[0]
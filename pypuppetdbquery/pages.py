@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Fetching of query results one page at a time. Large queries can take PuppetDB
+too long to answer in one go, so the query helpers in :mod:`pypuppetdbquery`
+can instead request them in pages using the ``limit`` and ``offset`` paging
+parameters, several pages at once if asked to.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def fetch_pages(fetch, page_size, workers=1):
+    """
+    Fetch the results of a query in pages and yield their rows in order.
+
+    `fetch` is called with `limit` and `offset` keyword arguments to obtain
+    each page, such as a :func:`functools.partial` of
+    :meth:`pypuppetdb.api.BaseAPI.facts` with the query and an ``order_by``
+    that gives the rows a stable order (without which pages may overlap or
+    leave rows out). The pages are fetched until one of them is not full.
+
+    With more than one worker, that many pages are fetched at a time by a
+    pool of threads. The number of pages is not known in advance, so up to
+    `workers - 1` empty pages may be requested past the end of the results.
+
+    :param callable fetch: Called to fetch each page, returning an iterable
+        of its rows
+    :param int page_size: The number of rows per page
+    :param int workers: The number of pages to fetch at a time
+    :return: An iterator over the rows of all the pages
+    """
+    check_paging(page_size, workers)
+    return _fetch_pages(fetch, page_size, workers)
+
+
+def check_paging(page_size, workers):
+    """
+    Check the paging arguments given to :func:`fetch_pages` (or its
+    counterparts in :mod:`pypuppetdbquery.aio`).
+
+    :raises ValueError: If either argument is less than one
+    """
+    if page_size < 1:
+        raise ValueError('Invalid page size: {0}'.format(page_size))
+    if workers < 1:
+        raise ValueError('Invalid number of workers: {0}'.format(workers))
+
+
+def _fetch_pages(fetch, page_size, workers):
+    def fetch_page(offset):
+        # Pages may be generators (as for pypuppetdb), so read them fully
+        # where they are fetched
+        return list(fetch(limit=page_size, offset=offset))
+
+    if workers == 1:
+        offset = 0
+        while True:
+            rows = fetch_page(offset)
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            offset += page_size
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for page in range(workers):
+            pending.append(executor.submit(fetch_page, page * page_size))
+        offset = workers * page_size
+
+        while pending:
+            rows = pending.popleft().result()
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            pending.append(executor.submit(fetch_page, offset))
+            offset += page_size
+    finally:
+        # Pages past the end of the results (or that the caller did not
+        # wait for) are of no use
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
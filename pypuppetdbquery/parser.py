@@ -17,17 +17,38 @@
 
 import ply.yacc as yacc
 
-from . import ast
-from .lexer import Lexer
+from . import ast, tables
+from .lexer import Lexer, _DetailedException, number_text
 
 
-class ParseException(Exception):
+def make_lexer(lex_options=None):
+    """
+    Construct a :class:`pypuppetdbquery.lexer.Lexer` for use by a parser.
+
+    Unless told otherwise, the lexer uses the prebuilt table from
+    :mod:`pypuppetdbquery.tables`.
+
+    :param dict lex_options: Passed as keyword arguments to
+       :class:`pypuppetdbquery.lexer.Lexer`; defaults are filled in
+    """
+    lex_options = lex_options or {}
+    lex_options.setdefault('debug', False)
+    if 'lextab' not in lex_options:
+        lex_options['lextab'] = tables.load_lextab()
+    lex_options.setdefault('optimize', lex_options['lextab'] is not None)
+
+    return Lexer(**lex_options)
+
+
+class ParseException(_DetailedException):
     """
     Raised for errors encountered during parsing.
 
     The position of the lexer when the error was encountered (the index into
     the input string) is stored in the `position` attribute.
     """
+    _detail = 'position'
+
     def __init__(self, message, position):
         super(ParseException, self).__init__(message)
         self.position = position
@@ -45,25 +66,32 @@ class Parser(object):
        :class:`pypuppetdbquery.lexer.Lexer`
     :param dict yacc_options: Passed as keyword arguments to
        :func:`ply.yacc.yacc`
+    :param lexer: Lexer to use instead of constructing a
+       :class:`pypuppetdbquery.lexer.Lexer` from `lex_options`, such as a
+       :class:`pypuppetdbquery.lexer.Tokenizer`
+
+    Unless told otherwise through the options, the prebuilt tables from
+    :mod:`pypuppetdbquery.tables` are loaded and nothing is written to disk.
 
     .. note:: Many of the docstrings in this class are used by :mod:`ply.yacc`
        to build the parser. These strings are not particularly useful for
        generating documentation from, so the built documentation for this class
        may not be very useful.
     """
-    def __init__(self, lex_options=None, yacc_options=None):
+    def __init__(self, lex_options=None, yacc_options=None, lexer=None):
         super(Parser, self).__init__()
 
-        lex_options = lex_options or {}
-        lex_options.setdefault('debug', False)
-        lex_options.setdefault('optimize', True)
-
-        self.lexer = Lexer(**lex_options)
-        self.tokens = self.lexer.tokens
+        self.lexer = lexer or make_lexer(lex_options)
+        self._text = None
 
         yacc_options = yacc_options or {}
         yacc_options.setdefault('debug', False)
-        yacc_options.setdefault('optimize', True)
+        yacc_options.setdefault('write_tables', False)
+        if 'tabmodule' not in yacc_options and 'start' not in yacc_options:
+            # The prebuilt tables are only valid for the default start symbol
+            yacc_options['tabmodule'] = tables.load_parsetab()
+        yacc_options.setdefault(
+            'optimize', yacc_options.get('tabmodule') is not None)
 
         self.parser = yacc.yacc(module=self, **yacc_options)
 
@@ -77,7 +105,16 @@ class Parser(object):
         :return: An Abstract Syntax Tree
         :rtype: pypuppetdbquery.ast.Query
         """
-        return self.parser.parse(input=text, lexer=self.lexer, debug=debug)
+        # Kept for rules that need the query as written
+        self._text = text
+        try:
+            return self.parser.parse(input=text, lexer=self.lexer,
+                                     debug=debug)
+        finally:
+            self._text = None
+
+    #: List of token names handled by the lexer.
+    tokens = Lexer.tokens
 
     #: Non-terminal to use as the starting grammar symbol
     start = 'query'
@@ -109,6 +146,10 @@ class Parser(object):
         'expr : LPAREN expr RPAREN'
         p[0] = ast.ParenthesizedExpression(p[2])
 
+    def p_expr_node_list(self, p):
+        'expr : LBRACK node_names RBRACK'
+        p[0] = ast.NodeList(p[2])
+
     def p_expr(self, p):
         """
         expr : resource_expr
@@ -130,6 +171,14 @@ class Parser(object):
         'literal : AT string'
         p[0] = ast.Date(p[2])
 
+    def p_literal_date_placeholder(self, p):
+        'literal : AT PLACEHOLDER'
+        p[0] = ast.Date(ast.Placeholder(p[2]))
+
+    def p_literal_placeholder(self, p):
+        'literal : PLACEHOLDER'
+        p[0] = ast.Placeholder(p[1])
+
     def p_comparison_op(self, p):
         """
         comparison_op : MATCH
@@ -147,6 +196,20 @@ class Parser(object):
         'comparison_expr : identifier_path comparison_op literal'
         p[0] = ast.Comparison(p[2], p[1], p[3])
 
+    def p_comparison_expr_membership(self, p):
+        'comparison_expr : identifier_path IN LBRACK literal_list RBRACK'
+        p[0] = ast.Membership(p[1], p[4])
+
+    def p_literal_list(self, p):
+        'literal_list : literal'
+        p[0] = [p[1]]
+
+    def p_literal_list_nested(self, p):
+        'literal_list : literal_list COMMA literal'
+        # Lists can be very long, so append rather than copy
+        p[1].append(p[3])
+        p[0] = p[1]
+
     def p_identifier(self, p):
         """
         identifier : string
@@ -162,15 +225,47 @@ class Parser(object):
         'identifier : ASTERISK'
         p[0] = ast.RegexpIdentifier(r'.*')
 
+    def p_identifier_placeholder(self, p):
+        'identifier : PLACEHOLDER'
+        p[0] = ast.Placeholder(p[1])
+
     def p_identifier_path(self, p):
         'identifier_path : identifier'
         p[0] = ast.IdentifierPath([p[1]])
 
     def p_identifier_path_nested(self, p):
         'identifier_path : identifier_path DOT identifier'
-        p[1].components.append(p[3])
+        p[0] = ast.IdentifierPath(p[1].components + (p[3],))
+
+    def p_node_names(self, p):
+        'node_names : node_name'
+        p[0] = [p[1]]
+
+    def p_node_names_nested(self, p):
+        'node_names : node_names COMMA node_name'
+        p[1].append(p[3])
         p[0] = p[1]
 
+    def p_node_name(self, p):
+        'node_name : node_label'
+        p[0] = p[1]
+
+    def p_node_name_nested(self, p):
+        'node_name : node_name DOT node_label'
+        p[0] = '{0}.{1}'.format(p[1], p[3])
+
+    def p_node_label(self, p):
+        'node_label : string'
+        p[0] = p[1]
+
+    def p_node_label_number(self, p):
+        """
+        node_label : NUMBER
+                   | FLOAT
+        """
+        # A FLOAT covers two labels, as in 10.0.0.1
+        p[0] = number_text(self._text, p.lexpos(1))
+
     def p_subquery_comparison(self, p):
         'subquery : HASH string DOT comparison_expr'
         p[0] = ast.Subquery(p[2], p[4])
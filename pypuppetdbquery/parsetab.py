@@ -0,0 +1,86 @@
+
+# parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'queryleftORleftANDleftEQUALSMATCHLESSTHANGREATERTHANrightNOTAND ASTERISK AT BOOLEAN COMMA DOT EQUALS EXPORTED FLOAT GREATERTHAN GREATERTHANEQ HASH IN LBRACE LBRACK LESSTHAN LESSTHANEQ LPAREN MATCH NOT NOTEQUALS NOTMATCH NUMBER OR PLACEHOLDER RBRACE RBRACK RPAREN STRING\n        query : expr\n              | empty\n        expr : identifier_pathexpr : NOT exprexpr : expr AND exprexpr : expr OR exprexpr : LPAREN expr RPARENexpr : LBRACK node_names RBRACK\n        expr : resource_expr\n             | comparison_expr\n             | subquery\n        \n        literal : boolean\n                | string\n                | integer\n                | float\n        literal : AT stringliteral : AT PLACEHOLDERliteral : PLACEHOLDER\n        comparison_op : MATCH\n                      | NOTMATCH\n                      | EQUALS\n                      | NOTEQUALS\n                      | GREATERTHAN\n                      | GREATERTHANEQ\n                      | LESSTHAN\n                      | LESSTHANEQ\n        comparison_expr : identifier_path comparison_op literalcomparison_expr : identifier_path IN LBRACK literal_list RBRACKliteral_list : literalliteral_list : literal_list COMMA literal\n        identifier : string\n                   | integer\n        identifier : MATCH stringidentifier : ASTERISKidentifier : PLACEHOLDERidentifier_path : identifieridentifier_path : identifier_path DOT identifiernode_names : node_namenode_names : node_names COMMA node_namenode_name : node_labelnode_name : node_name DOT node_labelnode_label : string\n        node_label : NUMBER\n                   | FLOAT\n        subquery : HASH string DOT comparison_exprsubquery : HASH string block_exprblock_expr : LBRACE expr RBRACEresource_expr : string LBRACK identifier RBRACKresource_expr : string LBRACK identifier RBRACK block_exprresource_expr : EXPORTED string LBRACK identifier RBRACKresource_expr : EXPORTED string LBRACK identifier RBRACK block_exprboolean : BOOLEANinteger : NUMBERstring  : STRINGfloat : FLOATempty :'
+    
+_lr_action_items = {'NOT':([0,5,6,21,22,68,],[5,5,5,5,5,5,]),'LPAREN':([0,5,6,21,22,68,],[6,6,6,6,6,6,]),'LBRACK':([0,5,6,12,19,21,22,25,43,68,],[7,7,7,42,-54,7,7,59,65,7,]),'$end':([0,1,2,3,4,8,9,10,11,12,15,17,18,19,20,34,45,46,47,48,49,50,51,52,53,54,56,57,58,60,61,67,69,70,75,77,80,82,83,84,86,],[-56,0,-1,-2,-3,-9,-10,-11,-36,-31,-32,-34,-35,-54,-53,-4,-33,-5,-6,-37,-31,-27,-12,-13,-14,-15,-18,-52,-55,-7,-8,-46,-16,-17,-48,-45,-28,-49,-50,-47,-51,]),'EXPORTED':([0,5,6,21,22,68,],[13,13,13,13,13,13,]),'HASH':([0,5,6,21,22,68,],[14,14,14,14,14,14,]),'MATCH':([0,4,5,6,11,12,15,17,18,19,20,21,22,23,42,45,48,49,65,66,68,78,],[16,26,16,16,-36,-31,-32,-34,-35,-54,-53,16,16,16,16,-33,-37,-31,16,16,16,26,]),'ASTERISK':([0,5,6,21,22,23,42,65,66,68,],[17,17,17,17,17,17,17,17,17,17,]),'PLACEHOLDER':([0,5,6,21,22,23,24,26,27,28,29,30,31,32,33,42,55,59,65,66,68,81,],[18,18,18,18,18,18,56,-19,-20,-21,-22,-23,-24,-25,-26,18,70,56,18,18,18,56,]),'STRING':([0,5,6,7,13,14,16,21,22,23,24,26,27,28,29,30,31,32,33,42,55,59,62,63,65,66,68,81,],[19,19,19,19,19,19,19,19,19,19,19,-19,-20,-21,-22,-23,-24,-25,-26,19,19,19,19,19,19,19,19,19,]),'NUMBER':([0,5,6,7,21,22,23,24,26,27,28,29,30,31,32,33,42,59,62,63,65,66,68,81,],[20,20,20,40,20,20,20,20,-19,-20,-21,-22,-23,-24,-25,-26,20,20,40,40,20,20,20,20,]),'AND':([2,4,8,9,10,11,12,15,17,18,19,20,34,35,45,46,47,48,49,50,51,52,53,54,56,57,58,60,61,67,69,70,75,77,79,80,82,83,84,86,],[21,-3,-9,-10,-11,-36,-31,-32,-34,-35,-54,-53,-4,21,-33,-5,21,-37,-31,-27,-12,-13,-14,-15,-18,-52,-55,-7,-8,-46,-16,-17,-48,-45,21,-28,-49,-50,-47,-51,]),'OR':([2,4,8,9,10,11,12,15,17,18,19,20,34,35,45,46,47,48,49,50,51,52,53,54,56,57,58,60,61,67,69,70,75,77,79,80,82,83,84,86,],[22,-3,-9,-10,-11,-36,-31,-32,-34,-35,-54,-53,-4,22,-33,-5,-6,-37,-31,-27,-12,-13,-14,-15,-18,-52,-55,-7,-8,-46,-16,-17,-48,-45,22,-28,-49,-50,-47,-51,]),'RPAREN':([4,8,9,10,11,12,15,17,18,19,20,34,35,45,46,47,48,49,50,51,52,53,54,56,57,58,60,61,67,69,70,75,77,80,82,83,84,86,],[-3,-9,-10,-11,-36,-31,-32,-34,-35,-54,-53,-4,60,-33,-5,-6,-37,-31,-27,-12,-13,-14,-15,-18,-52,-55,-7,-8,-46,-16,-17,-48,-45,-28,-49,-50,-47,-51,]),'RBRACE':([4,8,9,10,11,12,15,17,18,19,20,34,45,46,47,48,49,50,51,52,53,54,56,57,58,60,61,67,69,70,75,77,79,80,82,83,84,86,],[-3,-9,-10,-11,-36,-31,-32,-34,-35,-54,-53,-4,-33,-5,-6,-37,-31,-27,-12,-13,-14,-15,-18,-52,-55,-7,-8,-46,-16,-17,-48,-45,84,-28,-49,-50,-47,-51,]),'DOT':([4,11,12,15,17,18,19,20,37,38,39,40,41,44,45,48,49,73,74,78,],[23,-36,-31,-32,-34,-35,-54,-53,63,-40,-42,-43,-44,66,-33,-37,-31,63,-41,23,]),'IN':([4,11,12,15,17,18,19,20,45,48,49,78,],[25,-36,-31,-32,-34,-35,-54,-53,-33,-37,-31,25,]),'NOTMATCH':([4,11,12,15,17,18,19,20,45,48,49,78,],[27,-36,-31,-32,-34,-35,-54,-53,-33,-37,-31,27,]),'EQUALS':([4,11,12,15,17,18,19,20,45,48,49,78,],[28,-36,-31,-32,-34,-35,-54,-53,-33,-37,-31,28,]),'NOTEQUALS':([4,11,12,15,17,18,19,20,45,48,49,78,],[29,-36,-31,-32,-34,-35,-54,-53,-33,-37,-31,29,]),'GREATERTHAN':([4,11,12,15,17,18,19,20,45,48,49,78,],[30,-36,-31,-32,-34,-35,-54,-53,-33,-37,-31,30,]),'GREATERTHANEQ':([4,11,12,15,17,18,19,20,45,48,49,78,],[31,-36,-31,-32,-34,-35,-54,-53,-33,-37,-31,31,]),'LESSTHAN':([4,11,12,15,17,18,19,20,45,48,49,78,],[32,-36,-31,-32,-34,-35,-54,-53,-33,-37,-31,32,]),'LESSTHANEQ':([4,11,12,15,17,18,19,20,45,48,49,78,],[33,-36,-31,-32,-34,-35,-54,-53,-33,-37,-31,33,]),'FLOAT':([7,24,26,27,28,29,30,31,32,33,59,62,63,81,],[41,58,-19,-20,-21,-22,-23,-24,-25,-26,58,41,41,58,]),'RBRACK':([15,17,18,19,20,36,37,38,39,40,41,45,49,51,52,53,54,56,57,58,64,69,70,71,72,73,74,76,85,],[-32,-34,-35,-54,-53,61,-38,-40,-42,-43,-44,-33,-31,-12,-13,-14,-15,-18,-52,-55,75,-16,-17,80,-29,-39,-41,83,-30,]),'COMMA':([19,20,36,37,38,39,40,41,51,52,53,54,56,57,58,69,70,71,72,73,74,85,],[-54,-53,62,-38,-40,-42,-43,-44,-12,-13,-14,-15,-18,-52,-55,-16,-17,81,-29,-39,-41,-30,]),'LBRACE':([19,44,75,83,],[-54,68,68,68,]),'AT':([24,26,27,28,29,30,31,32,33,59,81,],[55,-19,-20,-21,-22,-23,-24,-25,-26,55,55,]),'BOOLEAN':([24,26,27,28,29,30,31,32,33,59,81,],[57,-19,-20,-21,-22,-23,-24,-25,-26,57,57,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'query':([0,],[1,]),'expr':([0,5,6,21,22,68,],[2,34,35,46,47,79,]),'empty':([0,],[3,]),'identifier_path':([0,5,6,21,22,66,68,],[4,4,4,4,4,78,4,]),'resource_expr':([0,5,6,21,22,68,],[8,8,8,8,8,8,]),'comparison_expr':([0,5,6,21,22,66,68,],[9,9,9,9,9,77,9,]),'subquery':([0,5,6,21,22,68,],[10,10,10,10,10,10,]),'identifier':([0,5,6,21,22,23,42,65,66,68,],[11,11,11,11,11,48,64,76,11,11,]),'string':([0,5,6,7,13,14,16,21,22,23,24,42,55,59,62,63,65,66,68,81,],[12,12,12,39,43,44,45,12,12,49,52,49,69,52,39,39,49,49,12,52,]),'integer':([0,5,6,21,22,23,24,42,59,65,66,68,81,],[15,15,15,15,15,15,53,15,53,15,15,15,53,]),'comparison_op':([4,78,],[24,24,]),'node_names':([7,],[36,]),'node_name':([7,62,],[37,73,]),'node_label':([7,62,63,],[38,38,74,]),'literal':([24,59,81,],[50,72,85,]),'boolean':([24,59,81,],[51,51,51,]),'float':([24,59,81,],[54,54,54,]),'block_expr':([44,75,83,],[67,82,86,]),'literal_list':([59,],[71,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> query","S'",1,None,None,None),
+  ('query -> expr','query',1,'p_query','parser.py',127),
+  ('query -> empty','query',1,'p_query','parser.py',128),
+  ('expr -> identifier_path','expr',1,'p_expr_identifier_path','parser.py',133),
+  ('expr -> NOT expr','expr',2,'p_expr_not','parser.py',137),
+  ('expr -> expr AND expr','expr',3,'p_expr_and','parser.py',141),
+  ('expr -> expr OR expr','expr',3,'p_expr_or','parser.py',145),
+  ('expr -> LPAREN expr RPAREN','expr',3,'p_expr_parenthesized','parser.py',149),
+  ('expr -> LBRACK node_names RBRACK','expr',3,'p_expr_node_list','parser.py',153),
+  ('expr -> resource_expr','expr',1,'p_expr','parser.py',158),
+  ('expr -> comparison_expr','expr',1,'p_expr','parser.py',159),
+  ('expr -> subquery','expr',1,'p_expr','parser.py',160),
+  ('literal -> boolean','literal',1,'p_literal','parser.py',166),
+  ('literal -> string','literal',1,'p_literal','parser.py',167),
+  ('literal -> integer','literal',1,'p_literal','parser.py',168),
+  ('literal -> float','literal',1,'p_literal','parser.py',169),
+  ('literal -> AT string','literal',2,'p_literal_date','parser.py',174),
+  ('literal -> AT PLACEHOLDER','literal',2,'p_literal_date_placeholder','parser.py',178),
+  ('literal -> PLACEHOLDER','literal',1,'p_literal_placeholder','parser.py',182),
+  ('comparison_op -> MATCH','comparison_op',1,'p_comparison_op','parser.py',187),
+  ('comparison_op -> NOTMATCH','comparison_op',1,'p_comparison_op','parser.py',188),
+  ('comparison_op -> EQUALS','comparison_op',1,'p_comparison_op','parser.py',189),
+  ('comparison_op -> NOTEQUALS','comparison_op',1,'p_comparison_op','parser.py',190),
+  ('comparison_op -> GREATERTHAN','comparison_op',1,'p_comparison_op','parser.py',191),
+  ('comparison_op -> GREATERTHANEQ','comparison_op',1,'p_comparison_op','parser.py',192),
+  ('comparison_op -> LESSTHAN','comparison_op',1,'p_comparison_op','parser.py',193),
+  ('comparison_op -> LESSTHANEQ','comparison_op',1,'p_comparison_op','parser.py',194),
+  ('comparison_expr -> identifier_path comparison_op literal','comparison_expr',3,'p_comparison_expr','parser.py',199),
+  ('comparison_expr -> identifier_path IN LBRACK literal_list RBRACK','comparison_expr',5,'p_comparison_expr_membership','parser.py',203),
+  ('literal_list -> literal','literal_list',1,'p_literal_list','parser.py',207),
+  ('literal_list -> literal_list COMMA literal','literal_list',3,'p_literal_list_nested','parser.py',211),
+  ('identifier -> string','identifier',1,'p_identifier','parser.py',218),
+  ('identifier -> integer','identifier',1,'p_identifier','parser.py',219),
+  ('identifier -> MATCH string','identifier',2,'p_identifier_regexp','parser.py',224),
+  ('identifier -> ASTERISK','identifier',1,'p_identifier_wild','parser.py',228),
+  ('identifier -> PLACEHOLDER','identifier',1,'p_identifier_placeholder','parser.py',232),
+  ('identifier_path -> identifier','identifier_path',1,'p_identifier_path','parser.py',236),
+  ('identifier_path -> identifier_path DOT identifier','identifier_path',3,'p_identifier_path_nested','parser.py',240),
+  ('node_names -> node_name','node_names',1,'p_node_names','parser.py',244),
+  ('node_names -> node_names COMMA node_name','node_names',3,'p_node_names_nested','parser.py',248),
+  ('node_name -> node_label','node_name',1,'p_node_name','parser.py',253),
+  ('node_name -> node_name DOT node_label','node_name',3,'p_node_name_nested','parser.py',257),
+  ('node_label -> string','node_label',1,'p_node_label','parser.py',261),
+  ('node_label -> NUMBER','node_label',1,'p_node_label_number','parser.py',266),
+  ('node_label -> FLOAT','node_label',1,'p_node_label_number','parser.py',267),
+  ('subquery -> HASH string DOT comparison_expr','subquery',4,'p_subquery_comparison','parser.py',273),
+  ('subquery -> HASH string block_expr','subquery',3,'p_subquery_block','parser.py',277),
+  ('block_expr -> LBRACE expr RBRACE','block_expr',3,'p_block_expr','parser.py',281),
+  ('resource_expr -> string LBRACK identifier RBRACK','resource_expr',4,'p_resource_expr','parser.py',285),
+  ('resource_expr -> string LBRACK identifier RBRACK block_expr','resource_expr',5,'p_resource_expr_param','parser.py',289),
+  ('resource_expr -> EXPORTED string LBRACK identifier RBRACK','resource_expr',5,'p_resource_expr_exported','parser.py',293),
+  ('resource_expr -> EXPORTED string LBRACK identifier RBRACK block_expr','resource_expr',6,'p_resource_expr_exported_param','parser.py',297),
+  ('boolean -> BOOLEAN','boolean',1,'p_boolean','parser.py',301),
+  ('integer -> NUMBER','integer',1,'p_integer','parser.py',305),
+  ('string -> STRING','string',1,'p_string','parser.py',309),
+  ('float -> FLOAT','float',1,'p_float','parser.py',313),
+  ('empty -> <empty>','empty',0,'p_empty','parser.py',317),
+]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Reusable parser instances. Building a :class:`pypuppetdbquery.parser.Parser`
+means building a lexer and the LALR tables, which costs far more than parsing
+a typical query, so the helper functions in :mod:`pypuppetdbquery` obtain
+their parsers from here instead.
+"""
+
+import threading
+
+from .cache import make_key
+from .parser import Parser
+from .pratt import PrattParser
+
+#: Parser implementations that can be selected by name.
+BACKENDS = {
+    'ply': Parser,
+    'pratt': PrattParser,
+}
+
+
+class ParserPool(object):
+    """
+    Hands out parser instances that are constructed once per thread, per
+    backend and per set of options, then reused.
+
+    A single parser cannot be shared between threads because its lexer (and
+    the :mod:`ply.yacc` parser itself) keep state while parsing, so each
+    thread gets its own instances.
+    """
+    def __init__(self):
+        super(ParserPool, self).__init__()
+        self._local = threading.local()
+
+    def get(self, lex_options=None, yacc_options=None, backend='ply'):
+        """
+        Obtain a parser for the calling thread.
+
+        :param dict lex_options: Passed to the parser constructor
+        :param dict yacc_options: Passed to the parser constructor
+        :param str backend: The parser implementation to use; one of the
+           keys of :data:`BACKENDS`
+        :return: A :class:`pypuppetdbquery.parser.Parser` or
+           :class:`pypuppetdbquery.pratt.PrattParser`
+        """
+        try:
+            factory = BACKENDS[backend]
+        except KeyError:
+            raise ValueError('Unknown parser backend: {0}'.format(backend))
+
+        key = make_key(backend, lex_options, yacc_options)
+        if key is None:
+            # Options we cannot hash can't be looked up in the pool either
+            return self._build(factory, lex_options, yacc_options)
+
+        parsers = self._parsers()
+        parser = parsers.get(key)
+        if parser is None:
+            parser = parsers[key] = self._build(
+                factory, lex_options, yacc_options)
+        return parser
+
+    def clear(self):
+        """
+        Discard the parsers held for the calling thread.
+        """
+        self._parsers().clear()
+
+    def _parsers(self):
+        try:
+            return self._local.parsers
+        except AttributeError:
+            parsers = self._local.parsers = {}
+            return parsers
+
+    def _build(self, factory, lex_options, yacc_options):
+        # Parsers fill in defaults in the dicts they are given, so hand them
+        # copies to keep the caller's options (and our keys) unchanged.
+        return factory(
+            lex_options=dict(lex_options) if lex_options else None,
+            yacc_options=dict(yacc_options) if yacc_options else None)
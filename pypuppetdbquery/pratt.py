@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import ast
+from .lexer import Tokenizer, number_text
+from .parser import ParseException
+
+
+class PrattParser(object):
+    """
+    Hand-written parser for the PuppetDBQuery language.
+
+    This is an alternative to :class:`pypuppetdbquery.parser.Parser` that
+    does not use :mod:`ply.yacc`. The `and`/`or` operators are handled by
+    precedence climbing (a Pratt parser) and everything else by recursive
+    descent. It accepts the same language and produces the same
+    :mod:`pypuppetdbquery.ast` trees and :class:`ParseException` errors.
+
+    :param dict lex_options: Passed as keyword arguments to
+       :class:`pypuppetdbquery.lexer.Tokenizer`
+    :param dict yacc_options: Accepted for compatibility with
+       :class:`pypuppetdbquery.parser.Parser`. Only the `start` option is
+       used, which may be ``query`` (the default) or ``identifier_path``.
+    :param lexer: Lexer to use instead of constructing a
+       :class:`pypuppetdbquery.lexer.Tokenizer` from `lex_options`
+    """
+
+    #: Binding power of the infix operators; higher binds more tightly.
+    BINDING_POWER = {
+        'OR': 1,
+        'AND': 2,
+    }
+
+    #: Tokens that can be used as comparison operators.
+    COMPARISON_OPS = frozenset([
+        'MATCH',
+        'NOTMATCH',
+        'EQUALS',
+        'NOTEQUALS',
+        'GREATERTHAN',
+        'GREATERTHANEQ',
+        'LESSTHAN',
+        'LESSTHANEQ',
+    ])
+
+    #: Tokens whose value can be used directly as a literal.
+    LITERALS = frozenset(['BOOLEAN', 'STRING', 'NUMBER', 'FLOAT'])
+
+    #: Non-terminal to use as the starting grammar symbol
+    start = 'query'
+
+    def __init__(self, lex_options=None, yacc_options=None, lexer=None):
+        super(PrattParser, self).__init__()
+
+        self.lexer = lexer or Tokenizer(**(lex_options or {}))
+
+        yacc_options = yacc_options or {}
+        self.start = yacc_options.get('start', self.start)
+        if self.start not in ('query', 'identifier_path'):
+            raise ValueError(
+                'Unsupported start symbol: {0}'.format(self.start))
+
+        self._tokens = []
+        self._pos = 0
+        self._text = None
+
+    def parse(self, text, debug=0):
+        """
+        Parse the input string and return an AST.
+
+        :param str text: The query to parse
+        :param bool debug: Ignored; accepted for compatibility with
+           :meth:`pypuppetdbquery.parser.Parser.parse`
+        :return: An Abstract Syntax Tree
+        :rtype: pypuppetdbquery.ast.Query
+        """
+        self.lexer.input(text)
+        self._tokens = []
+        self._pos = 0
+        self._text = text
+
+        try:
+            if self.start == 'identifier_path':
+                ret = self._identifier_path()
+            elif self._peek():
+                ret = ast.Query(self._expr(0))
+            else:
+                ret = ast.Query(None)
+
+            if self._peek():
+                self._error()
+            return ret
+        finally:
+            self._tokens = []
+            self._text = None
+
+    def _token(self, offset=0):
+        # Tokens are pulled from the lexer only as they are needed, so that
+        # lexing and parsing errors are reported in the same order as
+        # pypuppetdbquery.parser.Parser would report them.
+        index = self._pos + offset
+        while len(self._tokens) <= index:
+            tok = self.lexer.token()
+            if tok is None:
+                return None
+            self._tokens.append(tok)
+        return self._tokens[index]
+
+    def _peek(self, offset=0):
+        tok = self._token(offset)
+        return tok.type if tok else None
+
+    def _next(self):
+        tok = self._token()
+        if tok is None:
+            self._error()
+        self._pos += 1
+        return tok
+
+    def _expect(self, type):
+        if self._peek() != type:
+            self._error()
+        return self._next().value
+
+    def _error(self):
+        tok = self._token()
+        if tok:
+            raise ParseException("before: {0}".format(tok.value), tok.lexpos)
+        else:
+            raise ParseException('at end of input', None)
+
+    def _expr(self, rbp):
+        left = self._unary()
+
+        # Loop rather than recurse along chains of operators so that long
+        # left-associative chains don't consume stack.
+        while True:
+            op = self._peek()
+            lbp = self.BINDING_POWER.get(op)
+            if lbp is None or lbp <= rbp:
+                return left
+
+            self._pos += 1
+            right = self._expr(lbp)
+            if op == 'AND':
+                left = ast.AndExpression(left, right)
+            else:
+                left = ast.OrExpression(left, right)
+
+    def _unary(self):
+        tok = self._peek()
+
+        if tok == 'NOT':
+            self._pos += 1
+            return ast.NotExpression(self._unary())
+        elif tok == 'LPAREN':
+            self._pos += 1
+            expr = self._expr(0)
+            self._expect('RPAREN')
+            return ast.ParenthesizedExpression(expr)
+        elif tok == 'HASH':
+            return self._subquery()
+        elif tok == 'EXPORTED':
+            self._pos += 1
+            return self._resource(True)
+        elif tok == 'STRING' and self._peek(1) == 'LBRACK':
+            return self._resource(False)
+        elif tok == 'LBRACK':
+            return self._node_list()
+        else:
+            path = self._identifier_path()
+            if self._peek() in self.COMPARISON_OPS or self._peek() == 'IN':
+                return self._comparison(path)
+            return ast.RegexpNodeMatch(path)
+
+    def _subquery(self):
+        self._expect('HASH')
+        endpoint = self._expect('STRING')
+
+        if self._peek() == 'LBRACE':
+            return ast.Subquery(endpoint, self._block())
+
+        self._expect('DOT')
+        return ast.Subquery(
+            endpoint, self._comparison(self._identifier_path()))
+
+    def _resource(self, exported):
+        res_type = self._expect('STRING')
+        self._expect('LBRACK')
+        title = self._identifier()
+        self._expect('RBRACK')
+
+        if self._peek() == 'LBRACE':
+            return ast.Resource(res_type, title, exported, self._block())
+        return ast.Resource(res_type, title, exported)
+
+    def _block(self):
+        self._expect('LBRACE')
+        expr = self._expr(0)
+        self._expect('RBRACE')
+        return ast.BlockExpression(expr)
+
+    def _comparison(self, path):
+        if self._peek() == 'IN':
+            self._pos += 1
+            self._expect('LBRACK')
+            values = [self._literal()]
+            while self._peek() == 'COMMA':
+                self._pos += 1
+                values.append(self._literal())
+            self._expect('RBRACK')
+            return ast.Membership(path, values)
+
+        if self._peek() not in self.COMPARISON_OPS:
+            self._error()
+        op = self._next().value
+        return ast.Comparison(op, path, self._literal())
+
+    def _node_list(self):
+        self._expect('LBRACK')
+        names = [self._node_name()]
+        while self._peek() == 'COMMA':
+            self._pos += 1
+            names.append(self._node_name())
+        self._expect('RBRACK')
+        return ast.NodeList(names)
+
+    def _node_name(self):
+        name = self._node_label()
+        while self._peek() == 'DOT':
+            self._pos += 1
+            name = '{0}.{1}'.format(name, self._node_label())
+        return name
+
+    def _node_label(self):
+        if self._peek() in ('NUMBER', 'FLOAT'):
+            # A FLOAT covers two labels, as in 10.0.0.1
+            return number_text(self._text, self._next().lexpos)
+        return self._expect('STRING')
+
+    def _literal(self):
+        tok = self._peek()
+        if tok in self.LITERALS:
+            return ast.Literal(self._next().value)
+        elif tok == 'AT':
+            self._pos += 1
+            if self._peek() == 'PLACEHOLDER':
+                return ast.Date(ast.Placeholder(self._next().value))
+            return ast.Date(self._expect('STRING'))
+        elif tok == 'PLACEHOLDER':
+            return ast.Placeholder(self._next().value)
+        self._error()
+
+    def _identifier(self):
+        tok = self._peek()
+        if tok in ('STRING', 'NUMBER'):
+            return ast.Identifier(self._next().value)
+        elif tok == 'MATCH':
+            self._pos += 1
+            return ast.RegexpIdentifier(self._expect('STRING'))
+        elif tok == 'ASTERISK':
+            self._pos += 1
+            return ast.RegexpIdentifier(r'.*')
+        elif tok == 'PLACEHOLDER':
+            return ast.Placeholder(self._next().value)
+        self._error()
+
+    def _identifier_path(self):
+        components = [self._identifier()]
+        while self._peek() == 'DOT':
+            self._pos += 1
+            components.append(self._identifier())
+        return ast.IdentifierPath(components)
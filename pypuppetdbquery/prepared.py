@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Queries compiled once with placeholders (written ``$name``) for values that
+are filled in later, so that the same query can be run with different values
+without being lexed, parsed and evaluated again. See
+:func:`pypuppetdbquery.prepare`.
+"""
+
+from json import JSONEncoder
+
+from . import ast
+from .evaluator import Evaluator
+
+_encode = JSONEncoder().encode
+
+
+class Binding(object):
+    """
+    A value in a PuppetDB AST query that depends on the values given to
+    :meth:`PreparedQuery.bind`.
+
+    The value is that returned by `function` when called with `args`, after
+    any of the arguments that are themselves bindings have been resolved.
+
+    :param function: Function computing the value
+    :param tuple args: Arguments to the function
+    """
+    __slots__ = ('function', 'args')
+
+    def __init__(self, function, args):
+        super(Binding, self).__init__()
+        self.function = function
+        self.args = args
+
+    def resolve(self, values):
+        """
+        Compute the value of this binding.
+
+        :param dict values: Values of the placeholders, by name
+        """
+        return self.function(*[
+            x.resolve(values) if isinstance(x, Binding) else x
+            for x in self.args])
+
+    def names(self):
+        """
+        Names of the placeholders this binding depends on.
+
+        :rtype: set
+        """
+        ret = set()
+        for x in self.args:
+            if isinstance(x, Binding):
+                ret.update(x.names())
+        return ret
+
+
+class Parameter(Binding):
+    """
+    A :class:`Binding` that stands for the value of a placeholder itself.
+
+    :param str name: Name of the placeholder (without the ``$``)
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        super(Parameter, self).__init__(None, ())
+        self.name = name
+
+    def resolve(self, values):
+        return values[self.name]
+
+    def names(self):
+        return set([self.name])
+
+
+def _defer(function, *args):
+    # Apply a function now, or once the values are bound if any of its
+    # arguments depend on them
+    if any(isinstance(x, Binding) for x in args):
+        return Binding(function, args)
+    return function(*args)
+
+
+class TemplateEvaluator(Evaluator):
+    """
+    Evaluator used by :func:`pypuppetdbquery.prepare`, which evaluates
+    :class:`pypuppetdbquery.ast.Placeholder` nodes into :class:`Binding`
+    objects.
+
+    Anything the evaluator would otherwise do to a value that comes from a
+    placeholder, such as escaping it within a regular expression, is applied
+    when the value is bound instead.
+    """
+    def _escape(self, name):
+        return _defer(super(TemplateEvaluator, self)._escape, name)
+
+    def _join_path(self, components):
+        join = super(TemplateEvaluator, self)._join_path
+        return _defer(lambda *x: join(x), *components)
+
+    def _capitalize_class(self, name):
+        return _defer(super(TemplateEvaluator, self)._capitalize_class, name)
+
+    def _format_date(self, value):
+        return _defer(super(TemplateEvaluator, self)._format_date, value)
+
+    def _visit_placeholder(self, node, path):
+        value = Parameter(node.name)
+        if path[-1] == 'regexp':
+            return self._escape(value)
+        return value
+
+    def _visit_comparison(self, node, path):
+        # Resource parameter names decide the shape of the query (tags are
+        # not parameters), so they cannot be filled in later
+        if (path[-1] == 'resources' and
+                isinstance(node.left.components[0], ast.Placeholder)):
+            raise ValueError(
+                "Placeholder '${0}' cannot be used as a resource parameter "
+                "name".format(node.left.components[0].name))
+        return super(TemplateEvaluator, self)._visit_comparison(node, path)
+
+
+class PreparedQuery(object):
+    """
+    A query compiled by :func:`pypuppetdbquery.prepare`, to be completed with
+    values for its placeholders using :meth:`bind`.
+
+    :param query: The PuppetDB AST query, with :class:`Binding` objects in
+        place of the values that depend on placeholders
+    :param template: The JSON encoding of `query` as a sequence of strings
+        and :class:`Binding` objects, or `None` if :meth:`bind` should return
+        PuppetDB AST queries rather than JSON
+    """
+    def __init__(self, query, template=None):
+        super(PreparedQuery, self).__init__()
+        self.query = query
+        self.template = template
+
+        #: Names of the placeholders in the query.
+        self.names = frozenset(self._names())
+
+    def _names(self):
+        ret = set()
+        stack = [self.query]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(item)
+            elif isinstance(item, Binding):
+                ret.update(item.names())
+        return ret
+
+    def bind(self, values=None, **kwargs):
+        """
+        Fill in the placeholders of the query.
+
+        Values may be given as a dictionary, as keyword arguments or both.
+        They are substituted into the query as they are; they are only
+        escaped where the placeholder is part of a regular expression.
+
+        :param dict values: Values of the placeholders, by name
+        :return: The query in the same form as :func:`pypuppetdbquery.parse`
+            would return it
+        :raises ValueError: If a placeholder has no value, or a value is given
+            that does not match any placeholder
+        """
+        if values is None:
+            values = kwargs
+        elif kwargs:
+            values = dict(values, **kwargs)
+
+        if len(values) != len(self.names) or not self.names.issuperset(values):
+            self._check(values)
+
+        if self.template is not None:
+            return ''.join([
+                _encode(x.resolve(values)) if isinstance(x, Binding) else x
+                for x in self.template])
+        return self._bind_tree(values)
+
+    def _check(self, values):
+        missing = sorted(self.names.difference(values))
+        if missing:
+            raise ValueError('No value for placeholder {0}'.format(
+                ', '.join("'${0}'".format(x) for x in missing)))
+        unknown = sorted(set(values).difference(self.names))
+        if unknown:
+            raise ValueError('Unknown placeholder {0}'.format(
+                ', '.join("'${0}'".format(x) for x in unknown)))
+
+    def _bind_tree(self, values):
+        # Copy the query, resolving the bindings, using an explicit stack as
+        # queries can be nested very deeply
+        if not isinstance(self.query, list):
+            return self.query
+
+        ret = []
+        stack = [(self.query, ret)]
+        while stack:
+            src, dst = stack.pop()
+            for x in src:
+                if isinstance(x, list):
+                    child = []
+                    stack.append((x, child))
+                    x = child
+                elif isinstance(x, Binding):
+                    x = x.resolve(values)
+                dst.append(x)
+        return ret
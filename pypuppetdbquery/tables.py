@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Prebuilt :mod:`ply` tables for the PuppetDBQuery grammar.
+
+The lexer and LALR parser tables are generated when the package is built and
+shipped as the :mod:`pypuppetdbquery.lextab` and
+:mod:`pypuppetdbquery.parsetab` modules, so nothing needs to be generated or
+written when a parser is first constructed. The tables are regenerated by
+``python setup.py build`` whenever they no longer match the grammar in
+:mod:`pypuppetdbquery.lexer` and :mod:`pypuppetdbquery.parser`; this can
+also be done explicitly with::
+
+    $ python setup.py build_tables
+"""
+
+import hashlib
+import importlib
+import os
+import sys
+import warnings
+
+from ply import lex, yacc
+
+from .lexer import Lexer
+
+#: Module names of the prebuilt tables
+LEXTAB = 'pypuppetdbquery.lextab'
+PARSETAB = 'pypuppetdbquery.parsetab'
+
+_loaded = {}
+
+
+def lexer_signature():
+    """
+    Compute a signature of the lexer rules in
+    :class:`pypuppetdbquery.lexer.Lexer`, which is stored in the lexer table
+    to detect when it is out of date.
+    """
+    strings = []
+    funcs = []
+    for name in dir(Lexer):
+        if not name.startswith('t_'):
+            continue
+
+        rule = getattr(Lexer, name)
+        if callable(rule):
+            funcs.append((rule.__code__.co_firstlineno, name, rule.__doc__))
+        else:
+            strings.append((name, rule))
+
+    # Function rules are matched in the order they are defined, so that order
+    # is part of the signature (but their line numbers are not).
+    parts = [' '.join(Lexer.tokens)]
+    parts.extend('{0}={1}'.format(n, doc) for _, n, doc in sorted(funcs))
+    parts.extend('{0}={1}'.format(n, rule) for n, rule in sorted(strings))
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def parser_signature():
+    """
+    Compute the :mod:`ply.yacc` signature of the grammar in
+    :class:`pypuppetdbquery.parser.Parser`, as stored in the parser table.
+    """
+    from .parser import Parser
+
+    pdict = dict((k, getattr(Parser, k)) for k in dir(Parser))
+    pinfo = yacc.ParserReflect(pdict, log=yacc.NullLogger())
+    pinfo.get_all()
+    return pinfo.signature()
+
+
+def stale_tables():
+    """
+    Check the shipped tables against the current grammar.
+
+    :return: The names of any table modules that are missing or out of date
+    :rtype: list
+    """
+    return [name for name in (LEXTAB, PARSETAB) if _check(name) is None]
+
+
+def load_lextab():
+    """
+    Obtain the prebuilt lexer table, for use as the `lextab` argument to
+    :func:`ply.lex.lex`.
+
+    :return: The :mod:`pypuppetdbquery.lextab` module, or `None` if it is
+        missing or out of date (in which case a warning is also issued)
+    """
+    return _load(LEXTAB)
+
+
+def load_parsetab():
+    """
+    Obtain the prebuilt parser table, for use as the `tabmodule` argument to
+    :func:`ply.yacc.yacc`.
+
+    :return: The :mod:`pypuppetdbquery.parsetab` module, or `None` if it is
+        missing or out of date (in which case a warning is also issued)
+    """
+    return _load(PARSETAB)
+
+
+def build_tables(outputdir=None):
+    """
+    Generate the lexer and parser table modules.
+
+    :param str outputdir: Directory to write the modules into; defaults to the
+        directory containing this package
+    """
+    if outputdir is None:
+        outputdir = os.path.dirname(os.path.abspath(__file__))
+
+    lexer = Lexer(optimize=False)
+    lexer.lexer.writetab(LEXTAB, outputdir)
+    with open(os.path.join(outputdir, 'lextab.py'), 'a') as tf:
+        tf.write('_signature    = {0!r}\n'.format(lexer_signature()))
+
+    from .parser import Parser
+
+    # ply.yacc only generates (and writes) tables if it can't import existing
+    # ones that match, so point it at a module that can't exist. Only the
+    # last part of the name is used to name the file it writes.
+    Parser(
+        lex_options={'optimize': False},
+        yacc_options={
+            'optimize': False,
+            'write_tables': True,
+            'tabmodule': 'pypuppetdbquery_build_tables.parsetab',
+            'outputdir': outputdir,
+            'errorlog': yacc.NullLogger(),
+        })
+
+    # Make sure the new tables are picked up by later checks and loads
+    for name in (LEXTAB, PARSETAB):
+        sys.modules.pop(name, None)
+    _loaded.clear()
+
+
+def _load(name):
+    if name not in _loaded:
+        module = _loaded[name] = _check(name)
+        if module is None:
+            warnings.warn(
+                '{0} is missing or out of date; the tables will be generated '
+                'in memory for every new parser'.format(name), RuntimeWarning)
+    return _loaded[name]
+
+
+def _check(name):
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        return None
+
+    if name == LEXTAB:
+        fresh = (
+            getattr(module, '_tabversion', None) == lex.__tabversion__ and
+            getattr(module, '_signature', None) == lexer_signature())
+    else:
+        fresh = (
+            getattr(module, '_tabversion', None) == yacc.__tabversion__ and
+            getattr(module, '_lr_signature', None) == parser_signature())
+
+    return module if fresh else None
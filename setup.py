@@ -16,7 +16,47 @@
 # limitations under the License.
 
 from distutils.util import convert_path
-from setuptools import setup, find_packages
+from setuptools import Command, setup, find_packages
+from setuptools.command.build_py import build_py
+
+
+class BuildTables(Command):
+    """
+    Regenerate the prebuilt ply lexer and parser tables.
+    """
+    description = 'regenerate pypuppetdbquery/lextab.py and parsetab.py'
+    user_options = [
+        ('force', 'f', 'regenerate the tables even if they are up to date'),
+    ]
+
+    def initialize_options(self):
+        self.force = False
+
+    def finalize_options(self):
+        pass
+
+    def run(self):
+        try:
+            from pypuppetdbquery import tables
+        except ImportError:
+            # The runtime dependencies aren't available, so ship the tables
+            # that are already in the source tree.
+            self.warn('unable to import pypuppetdbquery; not building tables')
+            return
+
+        if self.force or tables.stale_tables():
+            self.announce('building ply tables', level=2)
+            tables.build_tables()
+
+
+class BuildPy(build_py):
+    """
+    Build the package, making sure the ply tables are up to date first.
+    """
+    def run(self):
+        self.run_command('build_tables')
+        build_py.run(self)
+
 
 # Read the version number from version.py.
 main_ns = {}
@@ -38,8 +78,13 @@ setup(
     license='Apache-2.0',
     url='https://github.com/bootc/pypuppetdbquery/',
     packages=find_packages(),
+    python_requires='>=3.7',
     install_requires=[
         'ply',
         'python-dateutil',
     ],
+    cmdclass={
+        'build_py': BuildPy,
+        'build_tables': BuildTables,
+    },
 )
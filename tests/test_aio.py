@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import functools
+import json
+import pickle
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+from pypuppetdbquery.aio import (
+    Client, HTTPException, query_fact_contents, query_facts)
+
+FACTS = [
+    {'certname': 'alpha', 'name': 'kernel', 'value': 'Linux'},
+    {'certname': 'alpha', 'name': 'osfamily', 'value': 'Debian'},
+    {'certname': 'beta', 'name': 'kernel', 'value': 'Linux'},
+]
+
+FACT_CONTENTS = [
+    {'certname': 'alpha', 'path': ['os', 'family'], 'value': 'Debian'},
+    {'certname': 'beta', 'path': ['os', 'family'], 'value': 'RedHat'},
+    {'certname': 'beta', 'path': ['os', 'name'], 'value': 'CentOS'},
+]
+
+
+class _FakePuppetDB(object):
+    """
+    In-process HTTP server standing in for PuppetDB. It does not run the
+    queries it is sent: it records their parameters and answers with a page
+    of the rows it was given for the endpoint.
+    """
+    def __init__(self, rows, chunked=False, delay=0, status=200):
+        self.rows = rows
+        self.chunked = chunked
+        self.delay = delay
+        self.status = status
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self._handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            url = urlparse((await reader.readline()).split()[1].decode())
+            while (await reader.readline()) not in (b'\r\n', b''):
+                pass
+
+            params = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+            self.requests.append((url.path, params))
+            if self.delay:
+                await asyncio.sleep(self.delay)
+
+            offset = int(params.get('offset', 0))
+            limit = int(params.get('limit', len(self.rows)))
+            body = json.dumps(self.rows[offset:offset + limit]).encode()
+            if self.status != 200:
+                body = b'Internal error'
+            self._respond(writer, body)
+            await writer.drain()
+        finally:
+            self.active -= 1
+            writer.close()
+
+    def _respond(self, writer, body):
+        writer.write('HTTP/1.1 {0} Whatever\r\n'.format(
+            self.status).encode())
+        writer.write(b'Content-Type: application/json\r\n')
+        if not self.chunked:
+            writer.write('Content-Length: {0}\r\n\r\n'.format(
+                len(body)).encode())
+            writer.write(body)
+            return
+
+        writer.write(b'Transfer-Encoding: chunked\r\n\r\n')
+        for i in range(0, len(body), 7):
+            chunk = body[i:i + 7]
+            writer.write('{0:x}\r\n'.format(len(chunk)).encode())
+            writer.write(chunk + b'\r\n')
+        writer.write(b'0\r\n\r\n')
+
+
+def _run_async(test):
+    """
+    Run a coroutine test method in a new event loop, stopping the servers it
+    started before the loop is closed.
+    """
+    @functools.wraps(test)
+    def wrapper(self):
+        async def run():
+            self.servers = []
+            try:
+                await test(self)
+            finally:
+                for server in self.servers:
+                    await server.stop()
+        asyncio.run(run())
+    return wrapper
+
+
+class TestAsyncHelpers(unittest.TestCase):
+    """
+    Test cases for :mod:`pypuppetdbquery.aio`.
+    """
+    async def _server(self, rows, **kwargs):
+        server = _FakePuppetDB(rows, **kwargs)
+        await server.start()
+        self.servers.append(server)
+        return server, Client('127.0.0.1', server.port)
+
+    @_run_async
+    async def test_query_facts(self):
+        server, client = await self._server(FACTS)
+        out = await query_facts(client, 'kernel=Linux', ['kernel', 'osfamily'])
+
+        self.assertEqual(out, {
+            'alpha': {'kernel': 'Linux', 'osfamily': 'Debian'},
+            'beta': {'kernel': 'Linux'},
+        })
+        self.assertEqual(len(server.requests), 1)
+        path, params = server.requests[0]
+        self.assertEqual(path, '/pdb/query/v4/facts')
+        self.assertEqual(json.loads(params['query'])[2], [
+            'or', ['in', 'name', ['array', ['kernel', 'osfamily']]]])
+
+    @_run_async
+    async def test_query_facts_raw(self):
+        server, client = await self._server(FACTS)
+        out = await query_facts(client, '', ['kernel'], raw=True)
+        self.assertEqual(out, FACTS)
+
+    @_run_async
+    async def test_query_facts_without_query_or_facts(self):
+        out = await query_facts(None, '')
+        self.assertTrue(out is None)
+
+    @_run_async
+    async def test_query_fact_contents_chunked(self):
+        server, client = await self._server(FACT_CONTENTS, chunked=True)
+        out = await query_fact_contents(client, '', ['os.*'], extract=True)
+
+        self.assertEqual(out, {
+            'alpha': {'os.family': 'Debian'},
+            'beta': {'os.family': 'RedHat', 'os.name': 'CentOS'},
+        })
+        path, params = server.requests[0]
+        self.assertEqual(path, '/pdb/query/v4/fact-contents')
+        self.assertEqual(json.loads(params['query']), [
+            'extract', ['certname', 'path', 'value'],
+            ['or', ['~>', 'path', ['os', '.*']]]])
+
+    @_run_async
+    async def test_paged(self):
+        server, client = await self._server(FACT_CONTENTS * 5, delay=0.01)
+        out = await query_fact_contents(
+            client, '', ['os.*'], raw=True, page_size=4, workers=3)
+
+        self.assertEqual(out, FACT_CONTENTS * 5)
+        offsets = sorted(int(x[1]['offset']) for x in server.requests)
+        self.assertEqual(offsets[:4], [0, 4, 8, 12])
+        self.assertTrue(all(x[1]['limit'] == '4' for x in server.requests))
+        self.assertEqual(
+            json.loads(server.requests[0][1]['order_by']),
+            [{'field': 'certname'}, {'field': 'path'}])
+
+        with self.assertRaises(ValueError):
+            await query_facts(client, '', ['kernel'], page_size=2, workers=0)
+
+    @_run_async
+    async def test_concurrency_limit(self):
+        server, _ = await self._server(FACTS, delay=0.02)
+        client = Client('127.0.0.1', server.port, limit=3)
+
+        out = await asyncio.gather(*[
+            query_facts(client, 'kernel={0}'.format(i), ['kernel'])
+            for i in range(10)])
+
+        self.assertEqual(len(out), 10)
+        self.assertEqual(len(server.requests), 10)
+        self.assertEqual(server.max_active, 3)
+
+    @_run_async
+    async def test_http_error(self):
+        server, client = await self._server(FACTS, status=500)
+        with self.assertRaises(HTTPException) as ctx:
+            await query_facts(client, '', ['kernel'])
+        self.assertEqual(ctx.exception.status, 500)
+        self.assertEqual(
+            str(ctx.exception), 'PuppetDB returned HTTP 500: Internal error')
+
+    @_run_async
+    async def test_timeout(self):
+        server, client = await self._server(FACTS, delay=1)
+        client.timeout = 0.05
+        with self.assertRaises(asyncio.TimeoutError):
+            await query_facts(client, '', ['kernel'])
+
+    def test_client_made_outside_loop(self):
+        client = Client('127.0.0.1', 0, limit=2)
+
+        async def run():
+            server = _FakePuppetDB(FACTS, delay=0.01)
+            await server.start()
+            try:
+                client.port = server.port
+                return await asyncio.gather(*[
+                    query_facts(client, '', ['kernel']) for i in range(4)])
+            finally:
+                await server.stop()
+
+        for i in range(2):
+            out = asyncio.run(run())
+            self.assertEqual(len(out), 4)
+
+    def test_exception_pickling(self):
+        e = pickle.loads(pickle.dumps(HTTPException('Not found', 404)))
+        self.assertTrue(isinstance(e, HTTPException))
+        self.assertEqual((str(e), e.status), ('Not found', 404))
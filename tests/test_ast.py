@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import pickle
+import unittest
+
+from pypuppetdbquery import ast
+from pypuppetdbquery.parser import Parser
+
+
+def _fact(name, value):
+    return ast.Comparison(
+        '=', ast.IdentifierPath([ast.Identifier(name)]), ast.Literal(value))
+
+
+class TestAst(unittest.TestCase):
+    """
+    Test cases for the :mod:`pypuppetdbquery.ast` node classes.
+    """
+    def test_equality(self):
+        self.assertEqual(_fact('foo', 'bar'), _fact('foo', 'bar'))
+        self.assertEqual(hash(_fact('foo', 'bar')), hash(_fact('foo', 'bar')))
+        self.assertNotEqual(_fact('foo', 'bar'), _fact('foo', 'baz'))
+        self.assertNotEqual(ast.Literal('foo'), ast.Date('foo'))
+        self.assertNotEqual(ast.Literal('foo'), 'foo')
+
+    def test_equality_includes_value_type(self):
+        values = [ast.Literal(1), ast.Literal(1.0), ast.Literal(True),
+                  ast.Literal('1')]
+        self.assertEqual(len(set(values)), 4)
+
+    def test_immutable(self):
+        node = ast.Literal('foo')
+
+        def _should_raise():
+            node.value = 'bar'
+        self.assertRaises(AttributeError, _should_raise)
+
+        def _should_raise_new():
+            node.other = 'bar'
+        self.assertRaises(AttributeError, _should_raise_new)
+
+    def test_identifier_path_components(self):
+        components = [ast.Identifier('foo')]
+        node = ast.IdentifierPath(components)
+        components.append(ast.Identifier('bar'))
+        self.assertEqual(node.components, (ast.Identifier('foo'),))
+
+    def test_parser_output(self):
+        parser = Parser(lex_options={'debug': False, 'optimize': False},
+                        yacc_options={'debug': False, 'optimize': False,
+                                      'write_tables': False})
+        out = parser.parse('foo.bar.baz = 1 and foo.bar.baz = 1')
+        self.assertEqual(out.expression.left, out.expression.right)
+        self.assertEqual(out.expression.left.left.components, (
+            ast.Identifier('foo'), ast.Identifier('bar'),
+            ast.Identifier('baz')))
+
+    def test_repr(self):
+        self.assertEqual(
+            repr(ast.Resource('file', ast.Literal('foo'), False)),
+            "Resource('file', Literal('foo'), False, None)")
+
+    def test_pickle_and_copy(self):
+        node = ast.NotExpression(ast.Resource(
+            'file', ast.Literal('foo'), True, _fact('ensure', 'present')))
+        self.assertEqual(pickle.loads(pickle.dumps(node)), node)
+        self.assertTrue(copy.deepcopy(node) is node)
+
+    def test_deep_trees(self):
+        # Building, hashing and comparing long chains must not recurse
+        left = right = _fact('foo', 0)
+        for i in range(1, 10000):
+            left = ast.OrExpression(left, _fact('foo', i))
+            right = ast.OrExpression(right, _fact('foo', i))
+        self.assertEqual(hash(left), hash(right))
+        self.assertEqual(left, right)
+        self.assertNotEqual(left, ast.OrExpression(left.left, left.left))
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypuppetdbquery.cache import MISSING, QueryCache, copy_tree, make_key
+
+
+class TestQueryCache(unittest.TestCase):
+    """
+    Test cases for :class:`pypuppetdbquery.cache.QueryCache`.
+    """
+    def test_miss_then_hit(self):
+        cache = QueryCache(maxsize=2)
+        self.assertTrue(cache.get('foo') is MISSING)
+        cache.put('foo', 'bar')
+        self.assertEqual(cache.get('foo'), 'bar')
+        self.assertEqual(cache.info(), (1, 1, 2, 1))
+
+    def test_evicts_least_recently_used(self):
+        cache = QueryCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertTrue(cache.get('b') is MISSING)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_resize(self):
+        cache = QueryCache(maxsize=None)
+        for i in range(10):
+            cache.put(i, i)
+        self.assertEqual(len(cache), 10)
+        cache.resize(3)
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.get(9), 9)
+        self.assertTrue(cache.get(0) is MISSING)
+
+    def test_zero_size_disables_cache(self):
+        cache = QueryCache(maxsize=0)
+        cache.put('foo', 'bar')
+        self.assertTrue(cache.get('foo') is MISSING)
+
+    def test_clear(self):
+        cache = QueryCache()
+        cache.put('foo', 'bar')
+        cache.get('foo')
+        cache.clear()
+        self.assertTrue(cache.get('foo') is MISSING)
+        self.assertEqual(cache.info(), (0, 1, 256, 0))
+
+    def test_values_are_copied(self):
+        cache = QueryCache()
+        value = ['and', ['=', 'path', ['foo']]]
+        cache.put('foo', value)
+        value[1][2].append('bar')
+        out = cache.get('foo')
+        self.assertEqual(out, ['and', ['=', 'path', ['foo']]])
+        out[1][2].append('baz')
+        self.assertEqual(cache.get('foo'), ['and', ['=', 'path', ['foo']]])
+
+    def test_make_key_freezes_dicts(self):
+        self.assertEqual(
+            make_key('foo', {'b': 1, 'a': [2]}),
+            make_key('foo', {'a': [2], 'b': 1}))
+
+    def test_make_key_unhashable(self):
+        self.assertTrue(make_key('foo', {'a': set()}) is None)
+
+    def test_copy_deep_tree(self):
+        value = ['x']
+        for i in range(10000):
+            value = ['or', value, i]
+        out = copy_tree(value)
+
+        # Walk both trees side by side without recursion
+        depth = 0
+        while value != ['x']:
+            self.assertFalse(out is value)
+            self.assertEqual(len(out), 3)
+            self.assertEqual(out[::2], value[::2])
+            value, out = value[1], out[1]
+            depth += 1
+        self.assertEqual(out, ['x'])
+        self.assertEqual(depth, 10000)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+
+from pypuppetdbquery import compile_predicate, parser_pool
+from pypuppetdbquery.compiler import PredicateCompiler
+from pypuppetdbquery.local import LocalEvaluator
+
+import test_index
+import test_local
+
+
+class TestPredicateCompiler(test_local.TestLocalEvaluator):
+    """
+    Run the :class:`pypuppetdbquery.local.LocalEvaluator` test cases against
+    predicates compiled by :class:`pypuppetdbquery.compiler.PredicateCompiler`.
+    """
+    def setUp(self):
+        self.compiler = PredicateCompiler()
+
+    def _match(self, s):
+        predicate = self.compiler.compile(parser_pool.get().parse(s))
+        return sorted(name.split('.')[0]
+                      for name, facts in test_local.FACTS.items()
+                      if predicate(facts, name))
+
+    def test_unsupported_mode(self):
+        with self.assertRaises(ValueError):
+            self.compiler.compile(parser_pool.get().parse(''), mode='facts')
+
+    def test_nested_subqueries_are_not_supported(self):
+        with self.assertRaises(ValueError):
+            self._match('#node{#fact.role=web}')
+
+    def test_node_matches_without_name(self):
+        facts = test_local.FACTS['web1.example.com']
+        self.assertFalse(compile_predicate('~web')(facts))
+        self.assertFalse(compile_predicate('[web1.example.com]')(facts))
+        self.assertTrue(compile_predicate('not ~web')(facts))
+        self.assertTrue(compile_predicate('role=web')(facts))
+
+    def test_leaves_only(self):
+        # Structured values and out-of-range indexes are not leaves
+        facts = test_local.FACTS['web1.example.com']
+        self.assertFalse(compile_predicate('os!=Debian')(facts))
+        self.assertFalse(compile_predicate('disks.2!=sda')(facts))
+        self.assertFalse(compile_predicate('disks.-1=sdb')(facts))
+        self.assertTrue(compile_predicate('disks.1=sdb')(facts))
+
+    def test_regexps_are_checked_when_compiled(self):
+        # Rejected before there are any facts to match
+        for s in ('role~1', 'role!~1', 'os.~"a"~2.5'):
+            with self.assertRaises(ValueError):
+                compile_predicate(s)
+
+    def test_dates(self):
+        predicate = compile_predicate('uptime<@"Jan 2 2020"')
+        self.assertTrue(predicate({'uptime': '2020-01-01T00:00:00Z'}))
+        self.assertFalse(predicate({'uptime': '2020-01-03T00:00:00Z'}))
+
+
+class TestPredicateMatchesScan(test_index.TestIndexMatchesScan):
+    """
+    Compare predicates compiled by
+    :class:`pypuppetdbquery.compiler.PredicateCompiler` against
+    :class:`pypuppetdbquery.local.LocalEvaluator` on random queries.
+    """
+    def test_random_queries(self):
+        rand = random.Random(3)
+        facts = self._snapshot(rand)
+        scan = LocalEvaluator(facts)
+        compiler = PredicateCompiler()
+        parser = parser_pool.get()
+
+        def evaluate(tree):
+            predicate = compiler.compile(tree)
+            return frozenset(name for name, node in facts.items()
+                             if predicate(node, name))
+
+        for _ in range(300):
+            s = self._query(rand)
+            tree = parser.parse(s)
+            self.assertEqual(self._result(evaluate, tree),
+                             self._result(scan.evaluate, tree), s)
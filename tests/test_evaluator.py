@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+
+from pypuppetdbquery import ast
+from pypuppetdbquery.evaluator import Evaluator, JSONEvaluator
+from pypuppetdbquery.parser import Parser
+
+
+class _UpperEvaluator(Evaluator):
+    def _visit_identifier(self, node, path):
+        return node.name.upper()
+
+
+class _CountingEvaluator(Evaluator):
+    count = 0
+
+    def _visit_and_expression(self, node, path):
+        self.count += 1
+        return super(_CountingEvaluator, self)._visit_binary_expression(
+            node, path)
+
+
+class _NoInitEvaluator(Evaluator):
+    def __init__(self):
+        # Deliberately does not call Evaluator.__init__()
+        self.seen = []
+
+    def _visit_literal(self, node, path):
+        self.seen.append(node.value)
+        return super(_NoInitEvaluator, self)._visit_literal(node, path)
+
+
+class _CustomLiteral(ast.Literal):
+    pass
+
+
+class TestEvaluator(unittest.TestCase):
+    """
+    Test cases for :class:`pypuppetdbquery.evaluator.Evaluator`.
+    """
+    def _query(self):
+        return ast.Query(ast.Comparison(
+            '=',
+            ast.IdentifierPath([ast.Identifier('foo')]),
+            ast.Literal('bar')))
+
+    def test_evaluate(self):
+        out = Evaluator().evaluate(self._query())
+        self.assertEqual(out, ['in', 'certname', [
+            'extract', 'certname', ['select_fact_contents', [
+                'and', ['=', 'path', ['foo']], ['=', 'value', 'bar']]]]])
+
+    def test_subclass_overrides_visitor(self):
+        # Evaluate with the base class first so its dispatch table is filled
+        # in, and check it does not leak into the subclass or vice versa
+        Evaluator().evaluate(self._query())
+        out = _UpperEvaluator().evaluate(self._query())
+        self.assertEqual(out[2][2][1][1], ['=', 'path', ['FOO']])
+        out = Evaluator().evaluate(self._query())
+        self.assertEqual(out[2][2][1][1], ['=', 'path', ['foo']])
+
+    def test_node_subclass_uses_base_visitor(self):
+        out = Evaluator().evaluate(_CustomLiteral(42))
+        self.assertEqual(out, 42)
+
+    def test_unknown_node(self):
+        def _should_raise():
+            Evaluator().evaluate(object())
+        self.assertRaises(AttributeError, _should_raise)
+
+    def test_long_chains(self):
+        # Far deeper than the recursion limit
+        tree = ast.Literal(0)
+        for i in range(1, 10000):
+            tree = ast.OrExpression(tree, ast.Literal(i))
+        out = Evaluator(flatten=False).evaluate(tree)
+
+        for i in range(9999, 0, -1):
+            self.assertEqual(out[0], 'or')
+            self.assertEqual(out[2], i)
+            out = out[1]
+        self.assertEqual(out, 0)
+
+    def test_long_chains_flattened(self):
+        tree = ast.Literal(0)
+        for i in range(1, 10000):
+            tree = ast.OrExpression(tree, ast.Literal(i))
+        out = Evaluator().evaluate(tree)
+        self.assertEqual(out, ['or'] + list(range(10000)))
+
+    def test_flatten_through_parentheses(self):
+        tree = ast.AndExpression(
+            ast.ParenthesizedExpression(
+                ast.AndExpression(ast.Literal(1), ast.Literal(2))),
+            ast.ParenthesizedExpression(
+                ast.OrExpression(ast.Literal(3), ast.Literal(4))))
+        out = Evaluator().evaluate(tree)
+        self.assertEqual(out, ['and', 1, 2, ['or', 3, 4]])
+
+    def test_long_chains_call_overridden_visitors(self):
+        tree = ast.Literal(0)
+        for i in range(1, 6):
+            cls = ast.AndExpression if i % 2 else ast.OrExpression
+            tree = cls(tree, ast.Literal(i))
+        evaluator = _CountingEvaluator()
+        out = evaluator.evaluate(tree)
+        self.assertEqual(out, [
+            'and', ['or', ['and', ['or', ['and', 0, 1], 2], 3], 4], 5])
+        self.assertEqual(evaluator.count, 3)
+
+    def test_subclass_without_init(self):
+        evaluator = _NoInitEvaluator()
+        tree = ast.AndExpression(
+            ast.Literal(1),
+            ast.AndExpression(ast.Literal(2), ast.Literal(3)))
+        self.assertEqual(evaluator.evaluate(tree), ['and', 1, 2, 3])
+        self.assertEqual(evaluator.seen, [1, 2, 3])
+
+
+class TestJSONEvaluator(unittest.TestCase):
+    """
+    Test cases for :class:`pypuppetdbquery.evaluator.JSONEvaluator`.
+    """
+    QUERIES = [
+        '',
+        'foo=bar',
+        'foo.bar.0!=1.5 and baz<=@"2016-01-01"',
+        'foo.~"ba.*".*~"x"',
+        '"web.example"',
+        'not (a=1 or b=true) and (c=2 and d!~"\u00e9")',
+        'file["/tmp"]{ensure=present and (tag=x or owner=root)}',
+        '@@class[foo::bar]{tag!=x}',
+        'file[~".*"]{a=1 or b=2}',
+        '#node.catalog_environment=production',
+        '#resource{type=File and title="/etc/hosts"}',
+        'role in [web, 1] or [a.example.com, b]',
+        '#node.name in [a, b] and file[x]{ensure in [a, b] or tag in [c]}',
+    ]
+
+    def setUp(self):
+        self.parser = Parser()
+
+    def test_same_as_evaluator(self):
+        for query in self.QUERIES:
+            tree = self.parser.parse(query)
+            for mode in ('nodes', 'facts', 'none'):
+                for flatten in (True, False):
+                    expect = Evaluator(flatten=flatten).evaluate(tree, mode)
+                    if expect is not None:
+                        expect = json.dumps(expect)
+                    out = JSONEvaluator(flatten=flatten).evaluate(tree, mode)
+                    self.assertEqual(out, expect, (query, mode, flatten))
+
+    def test_long_chains(self):
+        def _host(i):
+            return ast.RegexpNodeMatch(ast.IdentifierPath([
+                ast.Identifier('h{0}'.format(i))]))
+
+        tree = _host(0)
+        for i in range(1, 10000):
+            tree = ast.OrExpression(tree, _host(i))
+        out = JSONEvaluator(flatten=False).evaluate(tree)
+        self.assertEqual(out, '["or", ' * 9999 + '["~", "certname", "h0"]' +
+                         ''.join(', ["~", "certname", "h{0}"]]'.format(i)
+                                 for i in range(1, 10000)))
+        self.assertEqual(
+            json.loads(JSONEvaluator().evaluate(tree)),
+            ['or'] + [['~', 'certname', 'h{0}'.format(i)]
+                      for i in range(10000)])
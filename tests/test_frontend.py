@@ -19,7 +19,11 @@ import json
 import mock
 import unittest
 
-from pypuppetdbquery import parse, query_facts, query_fact_contents
+from pypuppetdbquery import (
+    explain, fact_path_cache, parse, parse_cache, parse_many, parser_pool,
+    query_facts, query_fact_contents)
+from pypuppetdbquery.lexer import LexException
+from pypuppetdbquery.parser import ParseException
 
 
 class _FakeNode(object):
@@ -74,6 +78,166 @@ class TestFrontendParse(unittest.TestCase):
                ['=', 'value', 'bar']]]]]
         self.assertEqual(out, expect)
 
+    def test_repeated_queries_hit_cache(self):
+        parse_cache.clear()
+        first = self._parse('foo=bar')
+        second = self._parse('foo=bar')
+        self.assertEqual(first, second)
+        self.assertEqual(parse_cache.info().hits, 1)
+        self.assertEqual(parse_cache.info().misses, 1)
+
+    def test_cache_key_includes_mode(self):
+        parse_cache.clear()
+        self._parse('#node.foo=bar', mode='nodes')
+        self._parse('#node.foo=bar', mode='none')
+        self.assertEqual(parse_cache.info().misses, 2)
+
+    def test_cached_raw_results_are_copied(self):
+        parse_cache.clear()
+        out = self._parse('foo=bar', json=False)
+        out.append('junk')
+        again = self._parse('foo=bar', json=False)
+        self.assertEqual(parse_cache.info().hits, 1)
+        self.assertEqual(again[-1][0], 'extract')
+
+    def test_pratt_backend(self):
+        self.assertEqual(
+            self._parse('foo=bar', backend='pratt', cache=False),
+            self._parse('foo=bar', backend='ply', cache=False))
+
+    def test_unknown_backend(self):
+        def _should_raise():
+            self._parse('foo=bar', backend='nonesuch')
+        self.assertRaises(ValueError, _should_raise)
+
+    def test_input_length_limit(self):
+        for backend in ('ply', 'pratt'):
+            def _should_raise():
+                parse('foo=bar', lex_options={'max_length': 5},
+                      backend=backend, cache=False)
+            self.assertRaises(LexException, _should_raise)
+
+    def test_long_chains(self):
+        query = ' or '.join('certname=host{0}'.format(i) for i in range(5000))
+        for backend in ('ply', 'pratt'):
+            out = self._parse(query, backend=backend, cache=False,
+                              optimize=False)
+            self.assertTrue(out.startswith('["or", ["in", '))
+            self.assertEqual(out.count('"or"'), 1)
+            self.assertEqual(len(json.loads(out)), 5001)
+
+            out = self._parse(query, backend=backend, cache=False,
+                              flatten=False, optimize=False)
+            self.assertTrue(out.startswith('["or", ["or", ["or", '))
+            self.assertTrue(out.endswith(
+                '["=", "value", "host4999"]]]]]]'))
+            self.assertEqual(out.count('"or"'), 4999)
+
+    def test_json_without_optimizer(self):
+        query = 'foo.bar=1 and file[x]{ensure=present} and #node.a~"b"'
+        for flatten in (True, False):
+            out = self._parse(query, cache=False, flatten=flatten,
+                              optimize=False)
+            raw = self._parse(query, json=False, cache=False,
+                              flatten=flatten, optimize=False)
+            self.assertEqual(out, json.dumps(raw))
+
+    def test_long_chains_optimized(self):
+        query = ' or '.join('certname=host{0}'.format(i) for i in range(5000))
+        for flatten in (True, False):
+            out = self._parse(query, json=False, cache=False,
+                              flatten=flatten, optimize=True)
+            self.assertEqual(out[:2], ['in', 'certname'])
+            conditions = out[2][2][1]
+            self.assertEqual(conditions[0], 'or')
+            self.assertEqual(len(conditions), 5001)
+
+    def test_optimize(self):
+        query = '(processorcount=4 or processorcount=8) and kernel=Linux'
+        self.assertEqual(self._parse(query, json=False, optimize=True), [
+            'and',
+            ['in', 'certname',
+             ['extract', 'certname',
+              ['select_fact_contents',
+               ['or',
+                ['and', ['=', 'path', ['processorcount']],
+                 ['=', 'value', 4]],
+                ['and', ['=', 'path', ['processorcount']],
+                 ['=', 'value', 8]]]]]],
+            ['in', 'certname',
+             ['extract', 'certname',
+              ['select_fact_contents',
+               ['and', ['=', 'path', ['kernel']],
+                ['=', 'value', 'Linux']]]]]])
+        # Queries are only optimized when asked to
+        self.assertEqual(self._parse(query, json=False)[1][0], 'or')
+
+    def test_explain(self):
+        query = '(processorcount=4 or processorcount=8) and kernel=Linux'
+        self.assertEqual(
+            [str(x) for x in explain(query)],
+            ["merged 2 select_fact_contents subqueries under 'or'",
+             "kept 2 select_fact_contents subqueries under 'and' apart, as "
+             "they must match different rows"])
+
+    def test_explain_simplified(self):
+        query = 'not not a=1 and a=1'
+        self.assertEqual(
+            [str(x) for x in explain(query)],
+            ['folded 1 double negations',
+             "removed 1 duplicate operands of 'and'"])
+        self.assertEqual(self._parse(query, optimize=True),
+                         self._parse('a=1'))
+
+    def test_cache_key_includes_flatten(self):
+        parse_cache.clear()
+        query = 'a=1 and (b=2 and c=3)'
+        flat = self._parse(query, json=False, optimize=False)
+        nested = self._parse(query, json=False, flatten=False,
+                             optimize=False)
+        self.assertEqual(len(flat), 4)
+        self.assertEqual(len(nested), 3)
+
+    def test_cache_disabled(self):
+        parse_cache.clear()
+        self._parse('foo=bar', cache=False)
+        self._parse('foo=bar', cache=False)
+        self.assertEqual(parse_cache.info(), (0, 0, 256, 0))
+
+
+class TestFrontendParseMany(unittest.TestCase):
+    """
+    Test cases targetting :func:`pypuppetdbquery.parse_many`.
+    """
+    QUERIES = ['foo=bar', 'foo=', 'kernel=Linux and not role=db', '$',
+               'foo=bar', '']
+
+    def _check(self, out, **kwargs):
+        self.assertEqual(len(out), len(self.QUERIES))
+        for s, result in zip(self.QUERIES, out):
+            try:
+                expect = parse(s, **kwargs)
+            except (LexException, ParseException) as e:
+                self.assertEqual(type(result), type(e))
+                self.assertEqual(str(result), str(e))
+                self.assertEqual(result.position, e.position)
+            else:
+                self.assertEqual(result, expect)
+
+    def test_parse_many(self):
+        self._check(parse_many(self.QUERIES, workers=2))
+
+    def test_parse_many_in_process(self):
+        self._check(parse_many(iter(self.QUERIES), workers=1))
+
+    def test_parse_many_options(self):
+        out = parse_many(self.QUERIES, json=False, mode='facts',
+                         backend='pratt', workers=2, chunksize=1)
+        self._check(out, json=False, mode='facts', backend='pratt')
+
+    def test_parse_many_empty(self):
+        self.assertEqual(parse_many([], workers=2), [])
+
 
 class TestFrontendQueryFacts(unittest.TestCase):
     """
@@ -155,6 +319,34 @@ class TestFrontendQueryFacts(unittest.TestCase):
             'alpha': {'foo': 'bar'},
         })
 
+    def test_query_facts_with_many_facts(self):
+        mock_pdb = mock.NonCallableMock()
+        mock_pdb.facts = mock.Mock(return_value=[])
+
+        self._query_facts(
+            mock_pdb, '', ['foo', '/^lsb/', 'bar', 'foo', '/a|b$/', 'baz'])
+
+        mock_pdb.facts.assert_called_once_with(query=json.dumps([
+            'or',
+            ['in', 'name', ['array', ['foo', 'bar', 'baz']]],
+            ['~', 'name', '(?:^lsb)|(?:a|b$)']]))
+
+    def test_query_facts_with_unmergeable_regexps(self):
+        # Regular expressions with backreferences, named groups or inline
+        # flags are kept as separate terms
+        mock_pdb = mock.NonCallableMock()
+        mock_pdb.facts = mock.Mock(return_value=[])
+
+        regexps = [r'(a)\1', '(?i)^lsb', '(?P<x>a)(?P=x)', '(?<y>b)\\k<y>']
+        self._query_facts(
+            mock_pdb, '',
+            ['/^a/'] + ['/{0}/'.format(x) for x in regexps] +
+            ['/(?i:b)|(?<=c)d/'])
+
+        mock_pdb.facts.assert_called_once_with(query=json.dumps(
+            ['or', ['~', 'name', '(?:^a)|(?:(?i:b)|(?<=c)d)']] +
+            [['~', 'name', x] for x in regexps]))
+
     def test_query_facts_without_query_or_facts(self):
         node_facts = self._query_facts(None, '')
         self.assertTrue(node_facts is None)
@@ -169,6 +361,59 @@ class TestFrontendQueryFacts(unittest.TestCase):
 
         self.assertEquals(node_facts, mock_pdb.facts.return_value)
 
+    def test_query_facts_streamed(self):
+        rows = [
+            _FakeNode('alpha', 'foo', 'bar'),
+            _FakeNode('alpha', 'baz', 1),
+            _FakeNode('beta', 'foo', 'qux'),
+        ]
+        mock_pdb = mock.NonCallableMock()
+        mock_pdb.facts = mock.Mock(return_value=iter(rows))
+
+        out = query_facts(mock_pdb, '', ['foo', 'baz'], stream=True)
+
+        mock_pdb.facts.assert_called_once_with(
+            query=json.dumps(
+                ['or', ['in', 'name', ['array', ['foo', 'baz']]]]),
+            order_by=json.dumps([{'field': 'certname'}]))
+        self.assertFalse(isinstance(out, dict))
+        self.assertEqual(list(out), [
+            ('alpha', {'foo': 'bar', 'baz': 1}),
+            ('beta', {'foo': 'qux'}),
+        ])
+
+        mock_pdb.facts = mock.Mock(return_value=rows)
+        out = query_facts(mock_pdb, '', ['foo'], raw=True, stream=True)
+        self.assertTrue(out is rows)
+
+    def test_query_facts_paged(self):
+        rows = [_FakeNode('node{0}'.format(i // 2), 'fact{0}'.format(i % 2),
+                          i) for i in range(5)]
+        mock_pdb = mock.NonCallableMock()
+        mock_pdb.facts = mock.Mock(
+            side_effect=lambda limit, offset, **kwargs: iter(
+                rows[offset:offset + limit]))
+
+        out = query_facts(mock_pdb, 'foo=bar', page_size=2, workers=2)
+
+        self.assertEqual(out, {
+            'node0': {'fact0': 0, 'fact1': 1},
+            'node1': {'fact0': 2, 'fact1': 3},
+            'node2': {'fact0': 4},
+        })
+        query = json.dumps(parse('foo=bar', mode='facts', json=False))
+        order_by = json.dumps([{'field': 'certname'}, {'field': 'name'}])
+        # The page at offset 6 may be fetched too, while the one at offset 4
+        # is being fetched
+        calls = sorted(mock_pdb.facts.call_args_list,
+                       key=lambda x: x[1]['offset'])
+        self.assertEqual(calls[:3], [
+            mock.call(query=query, order_by=order_by, limit=2, offset=i)
+            for i in (0, 2, 4)])
+
+        out = query_facts(mock_pdb, 'foo=bar', page_size=2, stream=True)
+        self.assertEqual([x[0] for x in out], ['node0', 'node1', 'node2'])
+
 
 class TestFrontendQueryFactContents(unittest.TestCase):
     """
@@ -274,3 +519,95 @@ class TestFrontendQueryFactContents(unittest.TestCase):
               ['system_uptime', 'days']]]]))
 
         self.assertEquals(out, mock_pdb.fact_contents.return_value)
+
+    def test_fact_paths_are_cached(self):
+        mock_pdb = mock.NonCallableMock()
+        mock_pdb.fact_contents = mock.Mock(return_value=[])
+        fact_path_cache.clear()
+        parser_pool.clear()
+
+        parsers = []
+        for _ in range(2):
+            self._query_fact_contents(
+                mock_pdb, '', ['system_uptime.days', 'os.~"fam.*"'])
+            parsers.append(dict(parser_pool._parsers()))
+        self.assertEqual(fact_path_cache.info().hits, 2)
+        self.assertEqual(fact_path_cache.info().misses, 2)
+
+        # The identifier_path parser is built once and reused
+        self.assertEqual(parsers[0], parsers[1])
+        self.assertTrue(any(
+            ('start', 'identifier_path') in key[2] for key in parsers[0]))
+
+        query = json.dumps([
+            'or',
+            ['=', 'path', ['system_uptime', 'days']],
+            ['~>', 'path', ['os', 'fam.*']]])
+        self.assertEqual(
+            mock_pdb.fact_contents.call_args_list,
+            [mock.call(query=query)] * 2)
+
+    def test_extract(self):
+        mock_pdb = mock.NonCallableMock()
+        mock_pdb.fact_contents = mock.Mock(return_value=[
+            {
+                'value': 14,
+                'certname': 'alpha',
+                'path': ['system_uptime', 'days'],
+            },
+        ])
+
+        out = query_fact_contents(
+            mock_pdb, '', ['system_uptime.days'], extract=True)
+
+        mock_pdb.fact_contents.assert_called_once_with(query=json.dumps([
+            'extract', ['certname', 'path', 'value'],
+            ['or',
+             ['=', 'path',
+              ['system_uptime', 'days']]]]))
+
+        self.assertEqual(out, {
+            'alpha': {'system_uptime.days': 14},
+        })
+
+        self.assertTrue(
+            query_fact_contents(None, '', extract=True) is None)
+
+    def test_streamed(self):
+        mock_pdb = mock.NonCallableMock()
+        mock_pdb.fact_contents = mock.Mock(return_value=[
+            {'certname': 'alpha', 'path': ['os', 'family'], 'value': 'a'},
+            {'certname': 'alpha', 'path': ['os', 'name'], 'value': 'b'},
+            {'certname': 'beta', 'path': ['os', 'family'], 'value': 'c'},
+        ])
+
+        out = query_fact_contents(mock_pdb, '', ['os.*'], stream=True)
+
+        mock_pdb.fact_contents.assert_called_once_with(
+            query=json.dumps(['or', ['~>', 'path', ['os', '.*']]]),
+            order_by=json.dumps([{'field': 'certname'}]))
+        self.assertEqual(list(out), [
+            ('alpha', {'os.family': 'a', 'os.name': 'b'}),
+            ('beta', {'os.family': 'c'}),
+        ])
+
+    def test_paged(self):
+        rows = [
+            {'certname': 'alpha', 'path': ['os', 'family'], 'value': 'a'},
+            {'certname': 'alpha', 'path': ['os', 'name'], 'value': 'b'},
+            {'certname': 'beta', 'path': ['os', 'family'], 'value': 'c'},
+        ]
+        mock_pdb = mock.NonCallableMock()
+        mock_pdb.fact_contents = mock.Mock(
+            side_effect=lambda limit, offset, **kwargs: rows[
+                offset:offset + limit])
+
+        out = query_fact_contents(
+            mock_pdb, '', ['os.*'], raw=True, page_size=2)
+
+        self.assertEqual(list(out), rows)
+        order_by = json.dumps([{'field': 'certname'}, {'field': 'path'}])
+        self.assertEqual(mock_pdb.fact_contents.call_args_list, [
+            mock.call(query=json.dumps(['or', ['~>', 'path', ['os', '.*']]]),
+                      order_by=order_by, limit=2, offset=i)
+            for i in (0, 2)])
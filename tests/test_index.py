@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import re
+import unittest
+
+from pypuppetdbquery import parser_pool
+from pypuppetdbquery.index import (
+    FactIndex, IndexEvaluator, SortedColumn, _bits)
+from pypuppetdbquery.local import LocalEvaluator
+
+import test_local
+
+
+class TestIndexEvaluator(test_local.TestLocalEvaluator):
+    """
+    Run the :class:`pypuppetdbquery.local.LocalEvaluator` test cases against
+    :class:`pypuppetdbquery.index.IndexEvaluator`.
+    """
+    def setUp(self):
+        self.evaluator = IndexEvaluator(test_local.FACTS)
+
+    def test_regexps_on_missing_paths(self):
+        # The index has nothing to match at these paths, but the queries are
+        # still rejected as they are by a scan
+        for s in ('nope~1', 'nope.~"x"!~2.5'):
+            with self.assertRaises(ValueError):
+                self._match(s)
+
+    def test_evaluate_bits(self):
+        tree = parser_pool.get().parse('role=web')
+        bits = self.evaluator.evaluate_bits(tree)
+        self.assertEqual(
+            self.evaluator.index.node_names(bits),
+            ['web1.example.com', 'web2.example.com'])
+
+
+class TestFactIndex(unittest.TestCase):
+    """
+    Test cases for :class:`pypuppetdbquery.index.FactIndex`.
+    """
+    def setUp(self):
+        self.index = FactIndex(test_local.FACTS)
+
+    def test_node_ids(self):
+        self.assertEqual(self.index.names, sorted(test_local.FACTS))
+        self.assertEqual(self.index.all, 0b1111)
+        self.assertEqual(
+            self.index.bits(['web1.example.com', 'nope', 'db1.example.com']),
+            0b0011)
+        self.assertEqual(self.index.node_names(0b1010),
+                         ['web1.example.com', 'win1.example.com'])
+        self.assertEqual(self.index.node_names(0), [])
+
+    def test_paths(self):
+        column = self.index.paths[('os', 'release', 'major')]
+        self.assertEqual(column.nodes, (0, 1, 2))
+        self.assertEqual(column.match('=', '12'), 0b0001)
+        self.assertEqual(column.match('in', ['array', ['11', '9']]), 0b0110)
+        self.assertEqual(column.match('~', '^1'), 0b0011)
+        self.assertEqual(column.match('>', '11'), 0b0101)
+        self.assertEqual(column.match('>', 11), 0)
+        self.assertTrue(column.match('!', 11) is None)
+        self.assertEqual(self.index.paths[('disks', 1)].match('=', 'sdb'),
+                         0b0010)
+
+    def test_match_paths(self):
+        def match(*regexps):
+            return sorted(self.index.match_paths(
+                [re.compile(x) for x in regexps]))
+
+        self.assertEqual(match('os', '.*'), [('os', 'family')])
+        self.assertEqual(match('disks', '.*'), [('disks', 0), ('disks', 1)])
+        self.assertEqual(match('s', 'rel', 'aj'),
+                         [('os', 'release', 'major')])
+        self.assertEqual(match('^nope'), [])
+
+
+class TestSortedColumn(unittest.TestCase):
+    """
+    Test cases for :class:`pypuppetdbquery.index.SortedColumn`.
+    """
+    def test_ranges(self):
+        rand = random.Random(1)
+        values = [rand.randrange(100) for _ in range(5000)]
+        column = SortedColumn([(v, i) for i, v in enumerate(values)])
+        self.assertTrue(len(column.prefix) > 2)
+
+        for value in (-1, 0, 17, 50, 99, 100):
+            for op, cmp in (('<', lambda x: x < value),
+                            ('<=', lambda x: x <= value),
+                            ('>', lambda x: x > value),
+                            ('>=', lambda x: x >= value)):
+                expect = _bits(i for i, v in enumerate(values) if cmp(v))
+                self.assertEqual(column.range(op, value), expect,
+                                 '{0} {1}'.format(op, value))
+
+
+class TestIndexMatchesScan(unittest.TestCase):
+    """
+    Compare :class:`pypuppetdbquery.index.IndexEvaluator` against
+    :class:`pypuppetdbquery.local.LocalEvaluator` on random queries over a
+    random snapshot large enough to use both tuples and bitsets of nodes.
+    """
+    PATHS = ['kernel', 'role', 'count', 'os.family', 'os.release.major',
+             'disks.0', 'disks.*', 'os.*', 'os.~"rel".major', 'nope']
+    VALUES = ['Linux', 'web', 'db', 'Debian', '11', 4, 8, 2.5, 'sda', True]
+    OPERATORS = ['=', '!=', '~', '!~', '<', '<=', '>', '>=']
+
+    def _snapshot(self, rand):
+        facts = {}
+        for i in range(300):
+            node = {
+                'kernel': rand.choice(['Linux', 'windows']),
+                'role': rand.choice(['web', 'db', 'app', 4]),
+                'count': rand.choice([2, 4, 8, 2.5, '4', True]),
+                'os': {'family': rand.choice(['Debian', 'RedHat']),
+                       'release': {'major': rand.choice(['10', '11', 11])}},
+                'disks': ['sd' + x for x in 'abc'[:rand.randrange(4)]],
+            }
+            if rand.random() < 0.2:
+                del node['role']
+            facts['node{0:03d}'.format(i)] = node
+        return facts
+
+    def _term(self, rand):
+        path = rand.choice(self.PATHS)
+        if rand.random() < 0.1:
+            return '{0} in [{1}, {2}]'.format(
+                path, self._value(rand), self._value(rand))
+        op = rand.choice(self.OPERATORS)
+        return '{0}{1}{2}'.format(path, op, self._value(rand, '~' in op))
+
+    def _value(self, rand, regexp=False):
+        value = rand.choice(self.VALUES)
+        if regexp and rand.random() < 0.9:
+            # Only strings can be used as regular expressions; the others
+            # raise ValueError
+            value = str(value)[:2]
+        if isinstance(value, str):
+            return '"{0}"'.format(value)
+        return str(value).lower()
+
+    def _query(self, rand, depth=0):
+        r = rand.random()
+        if depth > 2 or r < 0.4:
+            return self._term(rand)
+        elif r < 0.55:
+            return 'not ({0})'.format(self._query(rand, depth + 1))
+        elif r < 0.6:
+            return '~"node0[0-4]"'
+        return '({0} {1} {2})'.format(
+            self._query(rand, depth + 1), rand.choice(['and', 'or']),
+            self._query(rand, depth + 1))
+
+    def _result(self, evaluate, tree):
+        # The result of evaluating a query, or the error it raised
+        try:
+            return evaluate(tree)
+        except ValueError:
+            return ValueError
+
+    def test_random_queries(self):
+        rand = random.Random(2)
+        facts = self._snapshot(rand)
+        scan = LocalEvaluator(facts)
+        index = IndexEvaluator(facts)
+        parser = parser_pool.get()
+
+        for _ in range(300):
+            s = self._query(rand)
+            tree = parser.parse(s)
+            self.assertEqual(self._result(index.evaluate, tree),
+                             self._result(scan.evaluate, tree), s)
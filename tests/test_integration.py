@@ -19,6 +19,7 @@ import unittest
 
 from pypuppetdbquery.evaluator import Evaluator
 from pypuppetdbquery.parser import Parser
+from pypuppetdbquery.pratt import PrattParser
 
 
 class TestIntegration(unittest.TestCase):
@@ -266,6 +267,54 @@ class TestIntegration(unittest.TestCase):
 
     def test_precedence_within_resource_parameter_queries_b(self):
         out = self._parse('file[foo]{(foo=1 or bar=2) and baz=3}')
+        self.assertEquals(out, [
+            'in', 'certname',
+            ['extract', 'certname',
+             ['select_resources',
+              ['and',
+               ['=', 'type', 'File'],
+               ['=', 'title', 'foo'],
+               ['=', 'exported', False],
+               ['or',
+                ['=', ['parameter', 'foo'], 1],
+                ['=', ['parameter', 'bar'], 2]],
+               ['=', ['parameter', 'baz'], 3]]]]])
+
+    def test_flatten_chains(self):
+        out = self._parse('file[foo]{a=1 or (b=2 or c=3 and d=4) or e=5}')
+        self.assertEquals(out, [
+            'in', 'certname',
+            ['extract', 'certname',
+             ['select_resources',
+              ['and',
+               ['=', 'type', 'File'],
+               ['=', 'title', 'foo'],
+               ['=', 'exported', False],
+               ['or',
+                ['=', ['parameter', 'a'], 1],
+                ['=', ['parameter', 'b'], 2],
+                ['and',
+                 ['=', ['parameter', 'c'], 3],
+                 ['=', ['parameter', 'd'], 4]],
+                ['=', ['parameter', 'e'], 5]]]]]])
+
+    def test_flatten_resource_parameters(self):
+        out = self._parse('file[foo]{a=1 and (b=2 and c=3)}')
+        self.assertEquals(out, [
+            'in', 'certname',
+            ['extract', 'certname',
+             ['select_resources',
+              ['and',
+               ['=', 'type', 'File'],
+               ['=', 'title', 'foo'],
+               ['=', 'exported', False],
+               ['=', ['parameter', 'a'], 1],
+               ['=', ['parameter', 'b'], 2],
+               ['=', ['parameter', 'c'], 3]]]]])
+
+    def test_flatten_disabled(self):
+        self.evaluator = Evaluator(flatten=False)
+        out = self._parse('file[foo]{a=1 and (b=2 and c=3)}')
         self.assertEquals(out, [
             'in', 'certname',
             ['extract', 'certname',
@@ -275,10 +324,10 @@ class TestIntegration(unittest.TestCase):
                ['=', 'title', 'foo'],
                ['=', 'exported', False],
                ['and',
-                ['or',
-                 ['=', ['parameter', 'foo'], 1],
-                 ['=', ['parameter', 'bar'], 2]],
-                ['=', ['parameter', 'baz'], 3]]]]]])
+                ['=', ['parameter', 'a'], 1],
+                ['and',
+                 ['=', ['parameter', 'b'], 2],
+                 ['=', ['parameter', 'c'], 3]]]]]]])
 
     def test_capitalize_class_names(self):
         out = self._parse('class[foo::bar]')
@@ -448,3 +497,55 @@ class TestIntegration(unittest.TestCase):
               ['and',
                ['=', 'path', ['foo']],
                ['=', 'value', 1.024]]]]])
+
+    def test_fact_in_list(self):
+        out = self._parse('role in [web, "db", 1]')
+        self.assertEqual(out, [
+            'in', 'certname',
+            ['extract', 'certname',
+             ['select_fact_contents',
+              ['and',
+               ['=', 'path', ['role']],
+               ['in', 'value', ['array', ['web', 'db', 1]]]]]]])
+
+    def test_node_list(self):
+        out = self._parse('[web1.example.com, "db1.example.com"]')
+        self.assertEqual(out, [
+            'in', 'certname',
+            ['array', ['web1.example.com', 'db1.example.com']]])
+
+    def test_subquery_field_in_list(self):
+        out = self._parse('#node.catalog_environment in [production, test]')
+        self.assertEqual(out, [
+            'in', 'certname',
+            ['extract', 'certname',
+             ['select_nodes',
+              ['in', 'catalog_environment',
+               ['array', ['production', 'test']]]]]])
+
+    def test_resource_parameter_in_list(self):
+        out = self._parse('file[foo]{ensure in [present, latest] and '
+                          'tag in [a, b]}')
+        self.assertEqual(out, [
+            'in', 'certname',
+            ['extract', 'certname',
+             ['select_resources',
+              ['and',
+               ['=', 'type', 'File'],
+               ['=', 'title', 'foo'],
+               ['=', 'exported', False],
+               ['or',
+                ['=', ['parameter', 'ensure'], 'present'],
+                ['=', ['parameter', 'ensure'], 'latest']],
+               ['in', 'tag', ['array', ['a', 'b']]]]]]])
+
+
+class TestIntegrationPratt(TestIntegration):
+    """
+    Run the integration test cases using
+    :class:`pypuppetdbquery.pratt.PrattParser` in place of
+    :class:`pypuppetdbquery.parser.Parser`.
+    """
+    def setUp(self):
+        self.parser = PrattParser()
+        self.evaluator = Evaluator()
@@ -15,9 +15,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import pickle
 import unittest
 
-from pypuppetdbquery.lexer import Lexer, LexException
+from pypuppetdbquery.lexer import (
+    Lexer, LexException, Token, Tokenizer, tokenize)
 
 
 class TestLexer(unittest.TestCase):
@@ -25,10 +27,10 @@ class TestLexer(unittest.TestCase):
     Test cases for :class:`pypuppetdbquery.lexer.Lexer`.
     """
     def setUp(self):
-        self.lexer = Lexer(
-            debug=False,
-            optimize=False,
-        )
+        self.lexer = self._make_lexer()
+
+    def _make_lexer(self, **kwargs):
+        return Lexer(debug=False, optimize=False, **kwargs)
 
     def _lex(self, s):
         self.lexer.input(s)
@@ -41,7 +43,8 @@ class TestLexer(unittest.TestCase):
     def test_all_tokens(self):
         # The string below must contain all possible lexer tokens
         out = self._lex(
-            "(not)[and]{or}=true!=false~0!~1.024<=<>=>*#.@@foo@'bar'\"baz\"")
+            "(not)[and]{or}=true!=false~0!~1.024<=<>=>*#.@@foo@'bar'\"baz\""
+            "$qux in[,")
 
         # Expected result of lexing the above string
         expect = [
@@ -74,6 +77,10 @@ class TestLexer(unittest.TestCase):
             ('AT', '@', 1, 49),
             ('STRING', 'bar', 1, 50),
             ('STRING', 'baz', 1, 55),
+            ('PLACEHOLDER', 'qux', 1, 60),
+            ('IN', 'in', 1, 65),
+            ('LBRACK', '[', 1, 67),
+            ('COMMA', ',', 1, 68),
         ]
 
         # Ensure that every token in the lexer token list is included in the
@@ -90,3 +97,119 @@ class TestLexer(unittest.TestCase):
         def _should_raise():
             self._lex('$')
         self.assertRaises(LexException, _should_raise)
+
+    def test_invalid_input_position(self):
+        try:
+            self._lex('foo = "bar')
+        except LexException as e:
+            self.assertEqual(str(e), "Illegal character '\"'")
+            self.assertEqual(e.position, 6)
+        else:
+            self.fail('LexException not raised')
+
+    def test_exception_pickling(self):
+        e = LexException("Illegal character '$'", 3)
+        e = pickle.loads(pickle.dumps(e))
+        self.assertTrue(isinstance(e, LexException))
+        self.assertEqual((str(e), e.position), ("Illegal character '$'", 3))
+
+    def test_keyword_prefixes(self):
+        # Keywords are matched even at the start of a longer word
+        out = self._lex('nothing')
+        self.assertEqual(
+            [(x.type, x.value) for x in out],
+            [('NOT', 'not'), ('STRING', 'hing')])
+
+    def test_in_keyword(self):
+        # Unlike the other keywords, `in` is only matched before a list
+        out = self._lex('index in [in,inx] in=in\t[')
+        self.assertEqual(
+            [(x.type, x.value) for x in out],
+            [('STRING', 'index'), ('IN', 'in'), ('LBRACK', '['),
+             ('STRING', 'in'), ('COMMA', ','), ('STRING', 'inx'),
+             ('RBRACK', ']'), ('STRING', 'in'), ('EQUALS', '='),
+             ('IN', 'in'), ('LBRACK', '[')])
+
+    def test_escaped_quotes(self):
+        # Escape sequences are left in the string values
+        out = self._lex('"a\\"b" \'c\\\\\' "d\\\\"')
+        self.assertEqual(
+            [(x.type, x.value) for x in out],
+            [('STRING', 'a\\"b'), ('STRING', 'c\\\\'), ('STRING', 'd\\\\')])
+
+    def test_unterminated_strings(self):
+        for s in ['"', '"a\\"', '"abc\\', '"a\\\nb"', "'" + 'x' * 100000]:
+            try:
+                self._lex('foo = ' + s)
+            except LexException as e:
+                self.assertEqual(e.position, 6)
+            else:
+                self.fail('LexException not raised for {0!r}'.format(s))
+
+    def test_long_string(self):
+        value = 'x\\"' * 100000
+        out = self._lex('"{0}"'.format(value))
+        self.assertEqual([(x.type, x.value) for x in out], [('STRING', value)])
+
+    def test_placeholders(self):
+        out = self._lex('$role=$_x1.$y')
+        self.assertEqual(
+            [(x.type, x.value) for x in out],
+            [('PLACEHOLDER', 'role'), ('EQUALS', '='),
+             ('PLACEHOLDER', '_x1'), ('DOT', '.'), ('PLACEHOLDER', 'y')])
+
+        def _should_raise():
+            self._lex('$1')
+        self.assertRaises(LexException, _should_raise)
+
+    def test_max_length(self):
+        lexer = self._make_lexer(max_length=5)
+        lexer.input('a = 1')
+        self.assertEqual(len(list(lexer)), 3)
+        with self.assertRaises(LexException) as ctx:
+            lexer.input('a = 10')
+        self.assertEqual(ctx.exception.position, 5)
+
+    def test_max_tokens(self):
+        lexer = self._make_lexer(max_tokens=3)
+        lexer.input('a = 1')
+        self.assertEqual(len(list(lexer)), 3)
+        lexer.input('a = 1 and')
+        with self.assertRaises(LexException) as ctx:
+            list(lexer)
+        self.assertEqual(str(ctx.exception), 'Too many tokens (limit 3)')
+        self.assertEqual(ctx.exception.position, 6)
+
+
+class TestTokenizer(TestLexer):
+    """
+    Run the :class:`pypuppetdbquery.lexer.Lexer` test cases against
+    :class:`pypuppetdbquery.lexer.Tokenizer`.
+    """
+    def _make_lexer(self, **kwargs):
+        return Tokenizer(**kwargs)
+
+    def test_tokens_are_tuples(self):
+        out = self._lex('foo=1')
+        self.assertEqual(out, [
+            ('STRING', 'foo', 1, 0),
+            ('EQUALS', '=', 1, 3),
+            ('NUMBER', 1, 1, 4),
+        ])
+        self.assertTrue(isinstance(out[0], Token))
+
+    def test_trailing_whitespace(self):
+        out = self._lex(' foo \n')
+        self.assertEqual(out, [('STRING', 'foo', 1, 1)])
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('foo and 1'), [
+            ('STRING', 'foo', 1, 0),
+            ('AND', 'and', 1, 4),
+            ('NUMBER', 1, 1, 8),
+        ])
+
+    def test_tokenize_invalid_input(self):
+        with self.assertRaises(LexException) as ctx:
+            tokenize('foo = $-bar')
+        self.assertEqual(ctx.exception.position, 6)
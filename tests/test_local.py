@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypuppetdbquery import parser_pool
+from pypuppetdbquery.local import LocalEvaluator
+
+FACTS = {
+    'web1.example.com': {
+        'kernel': 'Linux',
+        'role': 'web',
+        'processorcount': 4,
+        'is_virtual': True,
+        'os': {'family': 'Debian', 'release': {'major': '11'}},
+        'disks': ['sda', 'sdb'],
+        'uptime_days': 10.5,
+    },
+    'web2.example.com': {
+        'kernel': 'Linux',
+        'role': 'web',
+        'processorcount': 8,
+        'is_virtual': False,
+        'os': {'family': 'RedHat', 'release': {'major': '9'}},
+        'disks': ['vda'],
+    },
+    'db1.example.com': {
+        'kernel': 'Linux',
+        'role': 'db',
+        'processorcount': 16,
+        'is_virtual': 1,
+        'os': {'family': 'Debian', 'release': {'major': '12'}},
+    },
+    'win1.example.com': {
+        'kernel': 'windows',
+        'processorcount': '4',
+        'os': {'family': 'windows'},
+    },
+}
+
+
+class TestLocalEvaluator(unittest.TestCase):
+    """
+    Test cases for :class:`pypuppetdbquery.local.LocalEvaluator`.
+    """
+    def setUp(self):
+        self.evaluator = LocalEvaluator(FACTS)
+
+    def _match(self, s):
+        tree = parser_pool.get().parse(s)
+        return sorted(x.split('.')[0] for x in self.evaluator.evaluate(tree))
+
+    def test_empty_query(self):
+        self.assertEqual(self._match(''), ['db1', 'web1', 'web2', 'win1'])
+
+    def test_comparisons(self):
+        self.assertEqual(self._match('kernel=Linux'), ['db1', 'web1', 'web2'])
+        self.assertEqual(self._match('kernel!=Linux'), ['win1'])
+        self.assertEqual(self._match('role!=web'), ['db1'])
+        self.assertEqual(self._match('kernel~"^win"'), ['win1'])
+        self.assertEqual(self._match('kernel!~"^win"'),
+                         ['db1', 'web1', 'web2'])
+        self.assertEqual(self._match('uptime_days>10'), ['web1'])
+
+    def test_value_types(self):
+        # Strings do not equal or compare with numbers, nor booleans with 1
+        self.assertEqual(self._match('processorcount=4'), ['web1'])
+        self.assertEqual(self._match('processorcount="4"'), ['win1'])
+        self.assertEqual(self._match('processorcount>=8'), ['db1', 'web2'])
+        self.assertEqual(self._match('processorcount<8'), ['web1'])
+        self.assertEqual(self._match('is_virtual=true'), ['web1'])
+        self.assertEqual(self._match('is_virtual=1'), ['db1'])
+
+    def test_boolean_expressions(self):
+        self.assertEqual(self._match('role=web and processorcount>4'),
+                         ['web2'])
+        self.assertEqual(self._match('role=db or kernel=windows'),
+                         ['db1', 'win1'])
+        self.assertEqual(self._match('not role=web'), ['db1', 'win1'])
+        self.assertEqual(
+            self._match('kernel=Linux and not (role=web and disks.1=sdb)'),
+            ['db1', 'web2'])
+
+    def test_fact_paths(self):
+        self.assertEqual(self._match('os.family=Debian'), ['db1', 'web1'])
+        self.assertEqual(self._match('os.release.major=9'), [])
+        self.assertEqual(self._match('os.release.major="9"'), ['web2'])
+        self.assertEqual(self._match('disks.0=vda'), ['web2'])
+        self.assertEqual(self._match('disks.*=sdb'), ['web1'])
+        self.assertEqual(self._match('os.~"^fam"~"^(Red|win)"'),
+                         ['web2', 'win1'])
+
+    def test_regexp_path_components_are_searched(self):
+        # As in PuppetDB, the other components of a path with a regular
+        # expression in it are matched anywhere within each element
+        self.assertEqual(self._match('s.~"rel.*"."or"="12"'), ['db1'])
+
+    def test_membership(self):
+        self.assertEqual(self._match('role in [db, web]'),
+                         ['db1', 'web1', 'web2'])
+        self.assertEqual(self._match('processorcount in [4, 16]'),
+                         ['db1', 'web1'])
+
+    def test_node_matches(self):
+        self.assertEqual(self._match('~web'), ['web1', 'web2'])
+        # The value is escaped, as it is for PuppetDB
+        self.assertEqual(self._match('~"^web"'), [])
+        self.assertEqual(self._match('~web1.example'), ['web1'])
+        self.assertEqual(
+            self._match('[web1.example.com, other.example.com]'), ['web1'])
+
+    def test_subqueries(self):
+        self.assertEqual(self._match('#node.certname~"^db"'), ['db1'])
+        self.assertEqual(self._match('#fact{name=role and value=db}'),
+                         ['db1'])
+        self.assertEqual(self._match('#node.report_timestamp<@"2020-01-01"'),
+                         [])
+        self.assertEqual(
+            self._match('#fact{name=kernel and not value=Linux}'), ['win1'])
+
+    def test_resources_are_not_supported(self):
+        with self.assertRaises(ValueError):
+            self._match('file["/etc/hosts"]')
+
+    def test_regexps_must_be_strings(self):
+        for s in ('role~1', 'role!~1', 'disks.*~2.5', '#fact.value!~true',
+                  # Rejected even though nothing matches the other operand
+                  'role=none and role!~1'):
+            with self.assertRaises(ValueError):
+                self._match(s)
+
+    def test_unsupported_mode(self):
+        with self.assertRaises(ValueError):
+            self.evaluator.evaluate(parser_pool.get().parse(''), mode='facts')
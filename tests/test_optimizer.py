@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypuppetdbquery.ast import (
+    AndExpression, Comparison, Identifier, IdentifierPath, Literal,
+    NotExpression, OrExpression, ParenthesizedExpression, Query)
+from pypuppetdbquery.evaluator import Evaluator
+from pypuppetdbquery.optimizer import Optimizer, Rewrite, Simplifier
+
+
+def _subquery(endpoint, condition):
+    return ['in', 'certname', ['extract', 'certname', [
+        'select_' + endpoint, condition]]]
+
+
+class TestOptimizer(unittest.TestCase):
+    """
+    Test cases for :class:`pypuppetdbquery.optimizer.Optimizer`.
+    """
+    def setUp(self):
+        self.optimizer = Optimizer()
+
+    def test_scalars(self):
+        self.assertEqual(self.optimizer.optimize(None), None)
+        self.assertEqual(self.optimizer.rewrites, [])
+
+    def test_merge_or(self):
+        query = ['or',
+                 _subquery('fact_contents', 'a'),
+                 ['=', 'certname', 'foo'],
+                 _subquery('resources', 'b'),
+                 _subquery('fact_contents', 'c')]
+        out = self.optimizer.optimize(query)
+        self.assertEqual(out, [
+            'or',
+            _subquery('fact_contents', ['or', 'a', 'c']),
+            ['=', 'certname', 'foo'],
+            _subquery('resources', 'b')])
+        self.assertEqual(self.optimizer.rewrites, [
+            Rewrite('merged', 'or', 'select_fact_contents', 2)])
+
+    def test_merge_or_to_single_subquery(self):
+        query = ['or',
+                 _subquery('fact_contents', ['or', 'a', 'b']),
+                 _subquery('fact_contents', 'c')]
+        out = self.optimizer.optimize(query)
+        self.assertEqual(
+            out, _subquery('fact_contents', ['or', 'a', 'b', 'c']))
+
+    def test_input_is_not_modified(self):
+        query = ['or',
+                 _subquery('fact_contents', ['or', 'a', 'b']),
+                 _subquery('fact_contents', 'c')]
+        self.optimizer.optimize(query)
+        self.assertEqual(query, [
+            'or',
+            _subquery('fact_contents', ['or', 'a', 'b']),
+            _subquery('fact_contents', 'c')])
+
+    def test_and_not_merged(self):
+        query = ['and',
+                 _subquery('fact_contents', 'a'),
+                 _subquery('fact_contents', 'b')]
+        out = self.optimizer.optimize(query)
+        self.assertEqual(out, query)
+        self.assertEqual(
+            [str(x) for x in self.optimizer.rewrites],
+            ["kept 2 select_fact_contents subqueries under 'and' apart, as "
+             "they must match different rows"])
+
+    def test_and_merged_for_nodes(self):
+        query = ['and',
+                 _subquery('nodes', 'a'),
+                 _subquery('nodes', 'b')]
+        out = self.optimizer.optimize(query)
+        self.assertEqual(out, _subquery('nodes', ['and', 'a', 'b']))
+        self.assertEqual(
+            [str(x) for x in self.optimizer.rewrites],
+            ["merged 2 select_nodes subqueries under 'and'"])
+
+    def test_nested(self):
+        query = ['not', ['and',
+                         ['or',
+                          _subquery('fact_contents', 'a'),
+                          _subquery('fact_contents', 'b')],
+                         _subquery('resources', 'c')]]
+        out = self.optimizer.optimize(query)
+        self.assertEqual(out, ['not', [
+            'and',
+            _subquery('fact_contents', ['or', 'a', 'b']),
+            _subquery('resources', 'c')]])
+
+    def test_deep_chains(self):
+        query = _subquery('fact_contents', 0)
+        for i in range(1, 10000):
+            query = ['or', query, _subquery('fact_contents', i)]
+        out = self.optimizer.optimize(query)
+        self.assertEqual(
+            out, _subquery('fact_contents', ['or'] + list(range(10000))))
+
+
+def _fact(name, value):
+    return Comparison('=', IdentifierPath([Identifier(name)]), Literal(value))
+
+
+class TestSimplifier(unittest.TestCase):
+    """
+    Test cases for :class:`pypuppetdbquery.optimizer.Simplifier`.
+    """
+    def setUp(self):
+        self.simplifier = Simplifier()
+
+    def _evaluate(self, tree):
+        return Evaluator().evaluate(Query(tree))
+
+    def test_unchanged(self):
+        tree = AndExpression(_fact('a', 1), _fact('b', 1))
+        out = self.simplifier.simplify(tree)
+        self.assertEqual(self._evaluate(out), self._evaluate(tree))
+        self.assertEqual(self.simplifier.rewrites, [])
+
+    def test_and_of_same_term(self):
+        out = self.simplifier.simplify(
+            AndExpression(_fact('a', 1), _fact('a', 1)))
+        self.assertEqual(self._evaluate(out), self._evaluate(_fact('a', 1)))
+        self.assertEqual(
+            [str(x) for x in self.simplifier.rewrites],
+            ["removed 1 duplicate operands of 'and'"])
+
+    def test_duplicates_in_chain(self):
+        tree = OrExpression(
+            OrExpression(_fact('a', 1), _fact('b', 2)),
+            ParenthesizedExpression(
+                OrExpression(_fact('a', 1), _fact('c', 3))))
+        out = self.simplifier.simplify(tree)
+        self.assertEqual(self._evaluate(out), self._evaluate(OrExpression(
+            OrExpression(_fact('a', 1), _fact('b', 2)), _fact('c', 3))))
+        self.assertEqual(self.simplifier.rewrites, [
+            Rewrite('deduplicated', 'or', None, 1)])
+
+    def test_distinct_values(self):
+        # Values of different types are not duplicates even where they
+        # compare equal in Python
+        tree = OrExpression(
+            OrExpression(_fact('a', 1), _fact('a', 1.0)),
+            OrExpression(_fact('a', True), _fact('a', '1')))
+        out = self.simplifier.simplify(tree)
+        self.assertEqual(self._evaluate(out), self._evaluate(tree))
+        self.assertEqual(self.simplifier.rewrites, [])
+
+    def test_double_negation(self):
+        out = self.simplifier.simplify(NotExpression(ParenthesizedExpression(
+            NotExpression(_fact('a', 1)))))
+        self.assertEqual(self._evaluate(out), self._evaluate(_fact('a', 1)))
+        self.assertEqual(self.simplifier.rewrites, [
+            Rewrite('folded', 'not', None, 1)])
+
+    def test_double_negation_in_chain(self):
+        # Folding "not not (a and b)" exposes duplicates in the outer chain
+        inner = ParenthesizedExpression(
+            AndExpression(_fact('a', 1), _fact('b', 1)))
+        tree = AndExpression(
+            NotExpression(NotExpression(inner)), inner.expression)
+        out = self.simplifier.simplify(tree)
+        self.assertEqual(self._evaluate(out), self._evaluate(inner))
+        self.assertEqual(self.simplifier.rewrites, [
+            Rewrite('folded', 'not', None, 1),
+            Rewrite('deduplicated', 'and', None, 2)])
+
+    def test_input_is_not_modified(self):
+        tree = AndExpression(_fact('a', 1), _fact('a', 1))
+        expect = self._evaluate(tree)
+        self.simplifier.simplify(tree)
+        self.assertEqual(self._evaluate(tree), expect)
+
+    def test_deep_chains(self):
+        tree = _fact('a', 0)
+        for i in range(1, 10000):
+            tree = OrExpression(tree, _fact('a', i % 100))
+        out = self.simplifier.simplify(tree)
+        self.assertEqual(len(self._evaluate(out)), 101)
+        self.assertEqual(self.simplifier.rewrites, [
+            Rewrite('deduplicated', 'or', None, 9900)])
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import threading
+import time
+import unittest
+
+from pypuppetdbquery.pages import fetch_pages
+
+
+class _FakeEndpoint(object):
+    """
+    Serves pages of the numbers up to `total`, recording the offsets asked
+    for and (if `delay` is set) answering after a random delay.
+    """
+    def __init__(self, total, delay=0):
+        self.total = total
+        self.delay = delay
+        self.offsets = []
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, limit, offset):
+        with self._lock:
+            self.offsets.append(offset)
+            self.threads.add(threading.current_thread().name)
+        if self.delay:
+            time.sleep(random.random() * self.delay)
+        # Pages are generators, as from pypuppetdb
+        return iter(range(offset, min(offset + limit, self.total)))
+
+
+class TestFetchPages(unittest.TestCase):
+    """
+    Test cases for :func:`pypuppetdbquery.pages.fetch_pages`.
+    """
+    def test_sequential(self):
+        fetch = _FakeEndpoint(25)
+        self.assertEqual(list(fetch_pages(fetch, 10)), list(range(25)))
+        self.assertEqual(fetch.offsets, [0, 10, 20])
+
+    def test_exact_number_of_pages(self):
+        fetch = _FakeEndpoint(20)
+        self.assertEqual(list(fetch_pages(fetch, 10)), list(range(20)))
+        self.assertEqual(fetch.offsets, [0, 10, 20])
+
+    def test_no_results(self):
+        fetch = _FakeEndpoint(0)
+        self.assertEqual(list(fetch_pages(fetch, 10, workers=4)), [])
+
+    def test_concurrent_pages_are_in_order(self):
+        fetch = _FakeEndpoint(1003, delay=0.005)
+        self.assertEqual(
+            list(fetch_pages(fetch, 10, workers=8)), list(range(1003)))
+        self.assertTrue(len(fetch.threads) > 1)
+
+        # Each page is fetched once, with at most workers - 1 extra pages
+        self.assertEqual(len(set(fetch.offsets)), len(fetch.offsets))
+        self.assertTrue(101 <= len(fetch.offsets) <= 108)
+
+    def test_stops_fetching_when_closed(self):
+        fetch = _FakeEndpoint(10000)
+        rows = fetch_pages(fetch, 10, workers=4)
+        self.assertEqual(next(rows), 0)
+        rows.close()
+        count = len(fetch.offsets)
+        self.assertTrue(count <= 5)
+        time.sleep(0.01)
+        self.assertEqual(len(fetch.offsets), count)
+
+    def test_errors_are_raised(self):
+        def fetch(limit, offset):
+            if offset:
+                raise IOError('page {0}'.format(offset))
+            return range(limit)
+
+        rows = fetch_pages(fetch, 10, workers=2)
+        self.assertEqual([next(rows) for _ in range(10)], list(range(10)))
+        with self.assertRaises(IOError) as ctx:
+            next(rows)
+        self.assertEqual(str(ctx.exception), 'page 10')
+
+    def test_invalid_arguments(self):
+        fetch = _FakeEndpoint(10)
+        with self.assertRaises(ValueError):
+            fetch_pages(fetch, 0)
+        with self.assertRaises(ValueError):
+            fetch_pages(fetch, 10, workers=0)
+        self.assertEqual(fetch.offsets, [])
@@ -15,10 +15,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import pickle
 import unittest
 
 from pypuppetdbquery import ast
+from pypuppetdbquery.lexer import Tokenizer
 from pypuppetdbquery.parser import Parser, ParseException
+from pypuppetdbquery.pratt import PrattParser
 
 
 class TestParster(unittest.TestCase):
@@ -185,6 +188,17 @@ class TestParster(unittest.TestCase):
                     ast.Date('Sep 9, 2014'))))
         self.assertEqual(repr(out), repr(expect))
 
+    def test_date_placeholders(self):
+        out = self._parse('#node.report_timestamp<@$since')
+        expect = ast.Query(
+            ast.Subquery(
+                'node',
+                ast.Comparison(
+                    '<',
+                    ast.IdentifierPath([ast.Identifier('report_timestamp')]),
+                    ast.Date(ast.Placeholder('since')))))
+        self.assertEqual(repr(out), repr(expect))
+
     def test_boolean_values(self):
         out = self._parse('foo=true')
         expect = ast.Query(
@@ -203,6 +217,59 @@ class TestParster(unittest.TestCase):
                 ast.Literal(1.024)))
         self.assertEqual(repr(out), repr(expect))
 
+    def test_placeholders(self):
+        out = self._parse('foo.$bar=$baz and file[$title]')
+        expect = ast.Query(
+            ast.AndExpression(
+                ast.Comparison(
+                    '=',
+                    ast.IdentifierPath([
+                        ast.Identifier('foo'),
+                        ast.Placeholder('bar')]),
+                    ast.Placeholder('baz')),
+                ast.Resource('file', ast.Placeholder('title'), False)))
+        self.assertEqual(out, expect)
+
+    def test_membership(self):
+        out = self._parse('foo in [bar, 1] or [a.example.com, b]')
+        expect = ast.Query(
+            ast.OrExpression(
+                ast.Membership(
+                    ast.IdentifierPath([ast.Identifier('foo')]),
+                    [ast.Literal('bar'), ast.Literal(1)]),
+                ast.NodeList(['a.example.com', 'b'])))
+        self.assertEqual(out, expect)
+
+    def test_in_as_string(self):
+        # `in` is only a keyword before a list
+        def comparison(path, value):
+            return ast.Query(ast.Comparison(
+                '=', ast.IdentifierPath([ast.Identifier(x) for x in path]),
+                ast.Literal(value)))
+
+        self.assertEqual(self._parse('country=in'),
+                         comparison(['country'], 'in'))
+        self.assertEqual(self._parse('in=1'), comparison(['in'], 1))
+        self.assertEqual(self._parse('foo.in=1'), comparison(['foo', 'in'], 1))
+        self.assertEqual(
+            self._parse('in in [in]'),
+            ast.Query(ast.Membership(
+                ast.IdentifierPath([ast.Identifier('in')]),
+                [ast.Literal('in')])))
+
+    def test_numeric_node_names(self):
+        # Numeric labels are kept as written, not as their values
+        out = self._parse('[10.0.0.1, db.2.example.com, a.007.b.1.50]')
+        expect = ast.Query(ast.NodeList(
+            ['10.0.0.1', 'db.2.example.com', 'a.007.b.1.50']))
+        self.assertEqual(out, expect)
+
+        # Labels starting with a number and followed by letters are two
+        # tokens, so such names need to be quoted
+        self.assertRaises(ParseException, self._parse, '[1password.com]')
+        self.assertEqual(self._parse('["1password.com"]'),
+                         ast.Query(ast.NodeList(['1password.com'])))
+
     def test_invalid_input(self):
         def _should_raise():
             self._parse('}')
@@ -212,3 +279,51 @@ class TestParster(unittest.TestCase):
         def _should_raise():
             self._parse('foo=')
         self.assertRaises(ParseException, _should_raise)
+
+
+class TestParserWithTokenizer(TestParster):
+    """
+    Run the :class:`pypuppetdbquery.parser.Parser` test cases using
+    :class:`pypuppetdbquery.lexer.Tokenizer` in place of
+    :class:`pypuppetdbquery.lexer.Lexer`.
+    """
+    def setUp(self):
+        self.parser = Parser(
+            yacc_options={
+                'debug': False,
+                'optimize': False,
+                'write_tables': False,
+            },
+            lexer=Tokenizer(),
+        )
+
+
+class TestPrattParser(TestParster):
+    """
+    Run the :class:`pypuppetdbquery.parser.Parser` test cases against
+    :class:`pypuppetdbquery.pratt.PrattParser`.
+    """
+    def setUp(self):
+        self.parser = PrattParser()
+
+    def test_identifier_path_start_symbol(self):
+        parser = PrattParser(yacc_options={'start': 'identifier_path'})
+        out = parser.parse('foo.*')
+        expect = ast.IdentifierPath([
+            ast.Identifier('foo'),
+            ast.RegexpIdentifier('.*')])
+        self.assertEqual(repr(out), repr(expect))
+
+    def test_error_position(self):
+        try:
+            self._parse('foo=bar baz')
+        except ParseException as e:
+            self.assertEqual(str(e), 'before: baz')
+            self.assertEqual(e.position, 8)
+        else:
+            self.fail('ParseException not raised')
+
+    def test_exception_pickling(self):
+        e = pickle.loads(pickle.dumps(ParseException('before: baz', 8)))
+        self.assertTrue(isinstance(e, ParseException))
+        self.assertEqual((str(e), e.position), ('before: baz', 8))
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+
+from ply.yacc import NullLogger
+
+from pypuppetdbquery.pool import ParserPool
+
+LEX_OPTIONS = {
+    'debug': False,
+    'optimize': False,
+}
+YACC_OPTIONS = {
+    'debug': False,
+    'optimize': False,
+    'write_tables': False,
+}
+
+
+class TestParserPool(unittest.TestCase):
+    """
+    Test cases for :class:`pypuppetdbquery.pool.ParserPool`.
+    """
+    def setUp(self):
+        self.pool = ParserPool()
+
+    def _get(self):
+        return self.pool.get(LEX_OPTIONS, YACC_OPTIONS)
+
+    def test_reuses_parser_in_same_thread(self):
+        self.assertTrue(self._get() is self._get())
+
+    def test_does_not_modify_options(self):
+        yacc_options = {'optimize': False, 'write_tables': False}
+        self.pool.get(LEX_OPTIONS, yacc_options)
+        self.assertEqual(
+            yacc_options, {'optimize': False, 'write_tables': False})
+
+    def test_separate_parser_per_options(self):
+        # Other start symbols leave parts of the grammar unreachable, which
+        # ply warns about
+        other = self.pool.get(LEX_OPTIONS, dict(
+            YACC_OPTIONS, start='expr', errorlog=NullLogger()))
+        self.assertFalse(self._get() is other)
+
+    def test_separate_parser_per_thread(self):
+        mine = self._get()
+        theirs = []
+        thread = threading.Thread(target=lambda: theirs.append(self._get()))
+        thread.start()
+        thread.join()
+        self.assertFalse(mine is theirs[0])
+
+    def test_clear(self):
+        first = self._get()
+        self.pool.clear()
+        self.assertFalse(first is self._get())
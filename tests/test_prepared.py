@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypuppetdbquery import parse, prepare
+
+
+class TestPrepare(unittest.TestCase):
+    """
+    Test cases for :func:`pypuppetdbquery.prepare` and
+    :class:`pypuppetdbquery.prepared.PreparedQuery`.
+    """
+    def _check(self, query, values, expect, **kwargs):
+        # Binding the prepared query must give the same result as parsing the
+        # query with the values written into it
+        for json in (True, False):
+            prepared = prepare(query, json=json, **kwargs)
+            self.assertEqual(
+                prepared.bind(values),
+                parse(expect, json=json, cache=False, **kwargs))
+
+    def test_literals(self):
+        prepared = prepare('role=$role and datacenter=$dc')
+        self.assertEqual(prepared.names, frozenset(['role', 'dc']))
+        self._check('role=$role and datacenter=$dc',
+                    {'role': 'web', 'dc': 'ams1'},
+                    'role=web and datacenter=ams1')
+        self._check('processorcount>$n or enabled=$b', {'n': 4, 'b': True},
+                    'processorcount>4 or enabled=true')
+
+    def test_dates(self):
+        for backend in ('ply', 'pratt'):
+            self._check('#node.report_timestamp<@$since and uptime>=@$up',
+                        {'since': 'Sep 9, 2014', 'up': '2014-09-10'},
+                        '#node.report_timestamp<@"Sep 9, 2014" and '
+                        'uptime>=@"2014-09-10"', backend=backend)
+
+    def test_values_are_not_reparsed(self):
+        out = prepare('role=$role', json=False).bind(role='web or foo=1')
+        self.assertEqual(out[2][2][1][2], ['=', 'value', 'web or foo=1'])
+
+    def test_identifiers(self):
+        self._check('facts.$name=1', {'name': 'os'}, 'facts.os=1')
+        self._check('file[$path]{ensure=$ensure}',
+                    {'path': '/etc/hosts', 'ensure': 'present'},
+                    'file["/etc/hosts"]{ensure=present}')
+        self._check('class[$name]', {'name': 'apache::mod'},
+                    'class[apache::mod]')
+        self._check('#resource.$name=1', {'name': 'tag'},
+                    '#resource.tag=1')
+
+    def test_regexp_escaping(self):
+        self._check('facts.$name.~"b.*"=1', {'name': 'a.b+'},
+                    'facts."a.b+".~"b.*"=1')
+        self._check('$host', {'host': 'web1.example.com'},
+                    '"web1.example.com"')
+
+    def test_membership(self):
+        self._check('role in [$a, $b]', {'a': 'web', 'b': 2},
+                    'role in [web, 2]')
+
+    def test_repeated_placeholders(self):
+        self._check('a=$x or b=$x', {'x': 'foo'}, 'a=foo or b=foo')
+        self._check('a=$x or a=$x or a=$y', {'x': 1, 'y': 2},
+                    'a=1 or a=2', optimize=True)
+
+    def test_options(self):
+        self._check('a=$x and b=$y', {'x': 1, 'y': 2}, 'a=1 and b=2',
+                    mode='facts', backend='pratt', optimize=False)
+
+    def test_empty_query(self):
+        self.assertEqual(prepare('').bind(), None)
+
+    def test_keyword_arguments(self):
+        prepared = prepare('a=$x and b=$y')
+        self.assertEqual(prepared.bind({'x': 1}, y=2),
+                         parse('a=1 and b=2', cache=False))
+
+    def test_missing_values(self):
+        prepared = prepare('a=$x and b=$y')
+        with self.assertRaises(ValueError) as ctx:
+            prepared.bind(x=1)
+        self.assertEqual(str(ctx.exception), "No value for placeholder '$y'")
+        with self.assertRaises(ValueError) as ctx:
+            prepared.bind(x=1, y=2, z=3)
+        self.assertEqual(str(ctx.exception), "Unknown placeholder '$z'")
+
+    def test_parameter_names(self):
+        def _should_raise():
+            prepare('file[foo]{$name=bar}')
+        self.assertRaises(ValueError, _should_raise)
+
+    def test_parse_rejects_placeholders(self):
+        def _should_raise():
+            parse('a=$x', cache=False)
+        self.assertRaises(ValueError, _should_raise)
+
+    def test_long_chains(self):
+        query = ' or '.join('a=$x{0}'.format(i) for i in range(5000))
+        values = dict(('x{0}'.format(i), i) for i in range(5000))
+        self.assertEqual(
+            prepare(query).bind(values),
+            parse(' or '.join('a={0}'.format(i) for i in range(5000)),
+                  cache=False))
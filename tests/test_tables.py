@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pypuppetdbquery.
+# Copyright © 2016  Chris Boot <bootc@bootc.net>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pypuppetdbquery import tables
+from pypuppetdbquery.parser import Parser
+
+
+class TestTables(unittest.TestCase):
+    """
+    Test cases for :mod:`pypuppetdbquery.tables`.
+    """
+    def test_shipped_tables_are_up_to_date(self):
+        # If this fails, run "python setup.py build_tables" and commit the
+        # regenerated lextab.py and parsetab.py.
+        self.assertEqual(tables.stale_tables(), [])
+
+    def test_default_parser_uses_shipped_tables(self):
+        lex_options = {'debug': False}
+        yacc_options = {'debug': False}
+        Parser(lex_options=lex_options, yacc_options=yacc_options)
+        self.assertTrue(lex_options['lextab'] is tables.load_lextab())
+        self.assertTrue(lex_options['optimize'])
+        self.assertTrue(yacc_options['tabmodule'] is tables.load_parsetab())
+        self.assertTrue(yacc_options['optimize'])
+        self.assertFalse(yacc_options['write_tables'])
+
+    def test_build_tables(self):
+        outputdir = tempfile.mkdtemp()
+        try:
+            tables.build_tables(outputdir)
+            self.assertEqual(
+                sorted(os.listdir(outputdir)), ['lextab.py', 'parsetab.py'])
+        finally:
+            shutil.rmtree(outputdir)